@@ -4,9 +4,10 @@ from flask_login import LoginManager, current_user
 from flask_migrate import Migrate
 from flask import render_template
 import os
+from .database import RoutingSession, init_database
 
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 migrate = Migrate()
 
@@ -18,22 +19,65 @@ def create_app():
         SECRET_KEY=os.environ.get('SECRET_KEY', 'dev'),
         SQLALCHEMY_DATABASE_URI=os.environ.get('DATABASE_URL', 'sqlite:///db.sqlite3'),
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        # Engine profile: 'auto' (from the URL), 'postgresql', 'sqlite' or 'default' (see database.py)
+        DB_PROFILE=os.environ.get('DB_PROFILE', 'auto'),
+        DB_POOL_SIZE=int(os.environ.get('DB_POOL_SIZE', 10)),
+        DB_MAX_OVERFLOW=int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        DB_POOL_TIMEOUT=int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        DB_POOL_RECYCLE=int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        DB_STATEMENT_TIMEOUT_MS=int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000)),
+        DB_BUSY_TIMEOUT_MS=int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000)),
+        # Read replica for firm reports and exports (PostgreSQL)
+        DATABASE_REPLICA_URL=os.environ.get('DATABASE_REPLICA_URL') or None,
+        # Plan cache: 'memory' (per process), 'local-redis' (offline stand-in) or 'redis'
+        PLAN_CACHE_BACKEND=os.environ.get('PLAN_CACHE_BACKEND', 'memory'),
+        PLAN_CACHE_URL=os.environ.get('PLAN_CACHE_URL', 'redis://localhost:6379/0'),
+        PLAN_CACHE_TTL=int(os.environ.get('PLAN_CACHE_TTL', 3600)),
+        PLAN_CACHE_SIZE=int(os.environ.get('PLAN_CACHE_SIZE', 1024)),
+        # Emails allowed to read firm-wide exports and reports
+        FIRM_ADMINS=[e.strip() for e in os.environ.get('FIRM_ADMINS', '').split(',') if e.strip()],
+        # React production build, indexed at startup (see static_assets.py)
+        FRONTEND_BUILD_DIR=os.environ.get('FRONTEND_BUILD_DIR', os.path.join(app.root_path, 'static', 'frontend')),
+        # current_user from the signed session ('session', see auth/identity.py) or a User query per request ('database')
+        LOGIN_IDENTITY=os.environ.get('LOGIN_IDENTITY', 'session'),
+        IDENTITY_TTL=int(os.environ.get('IDENTITY_TTL', 300)),
+        # First month of the fiscal year (1 = calendar years); fiscal years are named after the year they end in
+        FISCAL_YEAR_START_MONTH=int(os.environ.get('FISCAL_YEAR_START_MONTH', 1)),
+        # Background jobs such as dashboard snapshot recomputes: 'thread', 'local' or 'inline' (see jobs.py)
+        JOB_QUEUE_BACKEND=os.environ.get('JOB_QUEUE_BACKEND', 'thread'),
+        JOB_WORKERS=int(os.environ.get('JOB_WORKERS', 2)),
+        # Request/SQL/plan/template metrics at /metrics (see metrics.py); a token requires "Authorization: Bearer <token>"
+        METRICS_ENABLED=os.environ.get('METRICS_ENABLED', '1') == '1',
+        METRICS_TOKEN=os.environ.get('METRICS_TOKEN') or None,
+        # Log requests slower than this, with their SQL statements, to the app.slow_requests logger (0 = off)
+        SLOW_REQUEST_MS=int(os.environ.get('SLOW_REQUEST_MS', 0)),
     )
 
     # Load instance config if exists
     app.config.from_pyfile('config.py', silent=True)
 
     # Initialize extensions
-    db.init_app(app)
+    init_database(app, db)
     login_manager.init_app(app)
     migrate.init_app(app, db)
+    from .planner.cache import plan_cache
+    plan_cache.init_app(app)
+    from .planner.snapshots import snapshots
+    snapshots.init_app(app)
+    from .jobs import jobs
+    jobs.init_app(app)
+    from .metrics import metrics
+    metrics.init_app(app)
 
     # Setup Flask-Login
     from .models import User
+    from .auth.identity import load_identity
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        if app.config['LOGIN_IDENTITY'] == 'session':
+            return load_identity(int(user_id))
+        return db.session.get(User, int(user_id))
 
     login_manager.login_view = 'auth.login'
 
@@ -42,14 +86,22 @@ def create_app():
     app.register_blueprint(auth_bp, url_prefix='/auth')
     from .planner import planner_bp
     app.register_blueprint(planner_bp, url_prefix='/planner')
+    from .api import api_bp
+    app.register_blueprint(api_bp, url_prefix='/api/v1')
+    from .planner.cli import calendars_cli, logs_cli, rollups_cli
+    app.cli.add_command(logs_cli)
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(calendars_cli)
 
-    import mimetypes
-    from flask import send_from_directory, request
+    from .static_assets import static_assets
+    static_assets.init_app(app)
+    from .cli import assets_cli
+    app.cli.add_command(assets_cli)
 
-    # Serve React build static files
+    # Serve React build static files from the startup index of the build directory
     @app.route('/static/frontend/<path:filename>')
     def frontend_static(filename):
-        return send_from_directory(os.path.join(app.root_path, 'static', 'frontend'), filename)
+        return static_assets.send(filename)
 
     # Root route redirects to dashboard or login
     @app.route('/')
@@ -66,12 +118,10 @@ def create_app():
         if path.startswith('auth') or path.startswith('planner') or path.startswith('api'):
             return ('Not Found', 404)
         
-        static_dir = os.path.join(app.root_path, 'static', 'frontend')
-        file_path = os.path.join(static_dir, path)
-        if path != "" and os.path.exists(file_path) and not os.path.isdir(file_path):
+        if path in static_assets:
             # Serve static asset
-            return send_from_directory(static_dir, path)
+            return static_assets.send(path)
         # Otherwise, serve index.html for SPA routing
-        return send_from_directory(static_dir, 'index.html')
+        return static_assets.send('index.html')
 
     return app
@@ -0,0 +1,67 @@
+import datetime
+import gzip
+import hashlib
+from functools import wraps
+from flask import current_app, jsonify, request
+from flask_login import current_user
+
+# Conditional, compressed JSON responses.
+# The ETag is the user's data version plus a digest of the resource, its query
+# arguments and today's date (resources that show "today" change at midnight),
+# so a matching If-None-Match is answered with 304 before the view runs.
+
+MIN_COMPRESS_SIZE = 512
+
+
+def _validators(resource):
+    today = datetime.date.today()
+    key = f'{resource}|{sorted(request.view_args.items())}|{sorted(request.args.items(multi=True))}|{today}'
+    digest = hashlib.blake2s(key.encode(), digest_size=8).hexdigest()
+    etag = f'{current_user.id}-{current_user.data_version}-{digest}'
+    # Never older than midnight, when day-relative values roll over
+    last_modified = max(current_user.data_updated_at or datetime.datetime.min,
+                        datetime.datetime.combine(today, datetime.time()))
+    return etag, last_modified
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    return request.if_modified_since is not None and last_modified <= request.if_modified_since.replace(tzinfo=None)
+
+
+def compress(response):
+    """gzip a response body in place when the client accepts it and it is worth it."""
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or not request.accept_encodings['gzip'] or response.content_length < MIN_COMPRESS_SIZE):
+        return response
+    response.set_data(gzip.compress(response.get_data(), compresslevel=current_app.config.get('API_GZIP_LEVEL', 6)))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def conditional_json(resource):
+    """Serve a view's dict as JSON with ETag/Last-Modified validators and 304 answers.
+
+    The view may return a (body, status) tuple for errors, which are sent
+    without validators.
+    """
+    def decorator(view):
+        @wraps(view)
+        def decorated(*args, **kwargs):
+            etag, last_modified = _validators(resource)
+            if _not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                result = view(*args, **kwargs)
+                if isinstance(result, tuple):
+                    return jsonify(result[0]), result[1]
+                response = jsonify(result)
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return compress(response)
+        return decorated
+    return decorator
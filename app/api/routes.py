@@ -0,0 +1,162 @@
+import datetime
+from flask import current_app, request
+from flask_login import login_required, current_user
+from . import api_bp
+from .conditional import conditional_json
+from ..planner import batch, resources
+from ..planner.comparisons import Period, compare_periods, standard_periods
+from ..planner.forecast import DEFAULT_PATHS, year_forecast
+from ..planner.ranges import GROUPS, fiscal_year_range
+from ..planner.snapshots import refresh
+from ..planner.trends import DEFAULT_SPANS, DEFAULT_WINDOWS, trend_stats
+
+# Version 1 of the dashboard data API. Resources are small and cacheable by
+# the client: each answers If-None-Match/If-Modified-Since with 304 until the
+# user's data changes. POST /logs writes a batch of days and answers with
+# what changed, so the calendar can update in place.
+
+SETUP_INCOMPLETE = ({'error': 'Setup incomplete'}, 400)
+MAX_RECENT_DAYS = 31
+
+
+def _valid(year, month=1):
+    return datetime.MINYEAR <= year <= datetime.MAXYEAR and 1 <= month <= 12
+
+
+def _year_month():
+    today = datetime.date.today()
+    year = request.args.get('year', today.year, type=int)
+    month = request.args.get('month', today.month, type=int)
+    return (year, month) if _valid(year, month) else (today.year, today.month)
+
+
+@api_bp.route('/summary', methods=['GET'])
+@login_required
+@conditional_json('summary')
+def summary():
+    year, month = _year_month()
+    return resources.summary(current_user.id, year, month) or SETUP_INCOMPLETE
+
+
+@api_bp.route('/calendar/<int:year>/<int:month>', methods=['GET'])
+@login_required
+@conditional_json('calendar')
+def month_calendar(year, month):
+    if not _valid(year, month):
+        return {'error': 'No such month'}, 404
+    return resources.month_calendar(current_user.id, year, month, datetime.date.today()) or SETUP_INCOMPLETE
+
+
+@api_bp.route('/series/<int:year>', methods=['GET'])
+@login_required
+@conditional_json('series')
+def year_series(year):
+    if not _valid(year):
+        return {'error': 'No such year'}, 404
+    return resources.year_series(current_user.id, year) or SETUP_INCOMPLETE
+
+
+@api_bp.route('/recent', methods=['GET'])
+@login_required
+@conditional_json('recent')
+def recent_days():
+    count = min(max(request.args.get('days', 4, type=int), 1), MAX_RECENT_DAYS)
+    return resources.recent_days(current_user.id, datetime.date.today(), count) or SETUP_INCOMPLETE
+
+
+@api_bp.route('/range', methods=['GET'])
+@login_required
+@conditional_json('range')
+def date_range():
+    # ?start=YYYY-MM-DD&end=YYYY-MM-DD or ?fiscal_year=YYYY, plus group= and series=1
+    fiscal_start_month = current_app.config['FISCAL_YEAR_START_MONTH']
+    group = request.args.get('group', 'month')
+    if group not in GROUPS:
+        return {'error': f'group must be one of {", ".join(GROUPS)}'}, 400
+    try:
+        if 'fiscal_year' in request.args:
+            start, end = fiscal_year_range(int(request.args['fiscal_year']), fiscal_start_month)
+        else:
+            start = datetime.date.fromisoformat(request.args['start'])
+            end = datetime.date.fromisoformat(request.args['end'])
+        data = resources.date_range(current_user.id, start, end, group, fiscal_start_month,
+                                    series=request.args.get('series') == '1')
+    except KeyError:
+        return {'error': 'Pass start and end, or fiscal_year'}, 400
+    except (TypeError, ValueError, OverflowError) as e:
+        return {'error': str(e)}, 400
+    return data or SETUP_INCOMPLETE
+
+
+@api_bp.route('/compare', methods=['GET'])
+@login_required
+@conditional_json('compare')
+def compare():
+    # ?start=&end= (default: this month to date) against the same days last year and the previous quarter;
+    # period=name,YYYY-MM-DD,YYYY-MM-DD adds a named period (repeatable), series=1 adds daily series
+    today = datetime.date.today()
+    try:
+        start = datetime.date.fromisoformat(request.args.get('start', today.replace(day=1).isoformat()))
+        end = datetime.date.fromisoformat(request.args.get('end', today.isoformat()))
+        periods = standard_periods(start, end)
+        for spec in request.args.getlist('period'):
+            parts = spec.split(',')
+            if len(parts) != 3:
+                raise ValueError('period must be name,YYYY-MM-DD,YYYY-MM-DD')
+            periods.append(Period(parts[0].strip(), datetime.date.fromisoformat(parts[1]),
+                                  datetime.date.fromisoformat(parts[2])))
+        return compare_periods(current_user.id, periods, series=request.args.get('series') == '1')
+    except (TypeError, ValueError, OverflowError) as e:
+        return {'error': str(e)}, 400
+
+
+@api_bp.route('/trends', methods=['GET'])
+@login_required
+@conditional_json('trends')
+def trends():
+    # ?start=&end= (default: this year to date); window=N and span=N repeat
+    # (default 7, 30 and 90-day windows and 10 and 30-workday spans); series=1 adds daily values
+    today = datetime.date.today()
+    try:
+        start = datetime.date.fromisoformat(request.args.get('start', today.replace(month=1, day=1).isoformat()))
+        end = datetime.date.fromisoformat(request.args.get('end', today.isoformat()))
+        windows = request.args.getlist('window', type=int) or DEFAULT_WINDOWS
+        spans = request.args.getlist('span', type=int) or DEFAULT_SPANS
+        data = trend_stats(current_user.id, start, end, windows, spans, series=request.args.get('series') == '1')
+    except (TypeError, ValueError, OverflowError) as e:
+        return {'error': str(e)}, 400
+    return data or SETUP_INCOMPLETE
+
+
+@api_bp.route('/forecast', methods=['GET'])
+@login_required
+@conditional_json('forecast')
+def forecast():
+    # Year-end forecast for this year; ?paths=N sets the number of simulated paths
+    paths = request.args.get('paths', DEFAULT_PATHS, type=int)
+    try:
+        data = year_forecast(current_user.id, datetime.date.today(), paths)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    return data or SETUP_INCOMPLETE
+
+
+@api_bp.route('/logs', methods=['POST'])
+@login_required
+def log_hours():
+    # {"entries": [{"date": "YYYY-MM-DD", "hours": 7.5 or null to clear, "version": as read}, ...]}
+    # A JSON body only, which cross-site forms cannot send without a CORS preflight
+    if not request.is_json:
+        return {'error': 'Expected application/json'}, 415
+    body = request.get_json(silent=True)
+    try:
+        edits = batch.parse_edits(body.get('entries') if isinstance(body, dict) else None)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    try:
+        written = batch.apply_edits(current_user.id, edits)
+    except batch.VersionConflict as e:
+        conflicts = [{'date': d.isoformat(), 'logged': hours, 'version': version} for d, hours, version in e.conflicts]
+        return {'error': str(e), 'conflicts': conflicts}, 409
+    refresh(current_user.id, *(d for d, _, _ in written))
+    return resources.log_deltas(current_user.id, written, datetime.date.today(), current_user.data_version)
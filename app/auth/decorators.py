@@ -0,0 +1,17 @@
+from functools import wraps
+from flask import current_app, jsonify
+from flask_login import current_user
+
+
+def is_firm_admin(user):
+    # Firm-wide data is limited to the emails listed in the FIRM_ADMINS config
+    return user.is_authenticated and user.email in current_app.config.get('FIRM_ADMINS', ())
+
+
+def firm_admin_required(view):
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        if not is_firm_admin(current_user):
+            return jsonify({'error': 'Firm admin access required'}), 403
+        return view(*args, **kwargs)
+    return decorated
@@ -0,0 +1,65 @@
+import time
+from flask import current_app, session
+from flask_login import UserMixin
+from sqlalchemy import select
+from .. import db
+from ..models import User
+
+# Session identity for Flask-Login.
+# The few user fields requests need (id and email) are kept in the signed
+# session cookie at login, so loading current_user costs no query. They are
+# re-read from the database once they are older than IDENTITY_TTL seconds, or
+# when the session was restored from a remember-me cookie. The data version
+# behind API validators changes with every write and is read on first use.
+
+IDENTITY_KEY = '_identity'
+
+
+class SessionUser(UserMixin):
+    """current_user in session identity mode; not an ORM object."""
+
+    def __init__(self, id, email):
+        self.id = id
+        self.email = email
+        self._version = None
+
+    def _load_version(self):
+        if self._version is None:
+            self._version = db.session.execute(
+                select(User.data_version, User.data_updated_at).where(User.id == self.id)
+            ).one()
+        return self._version
+
+    @property
+    def data_version(self):
+        return self._load_version()[0]
+
+    @property
+    def data_updated_at(self):
+        return self._load_version()[1]
+
+    def __repr__(self):
+        return f'<SessionUser {self.email}>'
+
+
+def store_identity(user):
+    session[IDENTITY_KEY] = {'id': user.id, 'email': user.email, 'loaded': int(time.time())}
+
+
+def forget_identity():
+    session.pop(IDENTITY_KEY, None)
+
+
+def load_identity(user_id):
+    """The user for Flask-Login's user_loader, from the session when it is fresh enough."""
+    identity = session.get(IDENTITY_KEY)
+    if identity and identity['id'] == user_id \
+            and time.time() - identity['loaded'] < current_app.config['IDENTITY_TTL']:
+        return SessionUser(identity['id'], identity['email'])
+    row = db.session.execute(select(User.id, User.email).where(User.id == user_id)).first()
+    if row is None:
+        forget_identity()
+        return None
+    user = SessionUser(row.id, row.email)
+    store_identity(user)
+    return user
@@ -3,6 +3,7 @@ from flask_login import login_user, logout_user, login_required
 from werkzeug.security import generate_password_hash, check_password_hash
 from .. import db
 from ..models import User
+from .identity import forget_identity, store_identity
 from . import auth_bp
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
@@ -47,6 +48,7 @@ def login():
             return redirect(url_for('auth.login'))
         
         login_user(user, remember=remember)
+        store_identity(user)
         next_page = request.args.get('next')
         return redirect(next_page if next_page else url_for('planner.dashboard'))
     
@@ -56,4 +58,5 @@ def login():
 @login_required
 def logout():
     logout_user()
+    forget_identity()
     return redirect('/')
@@ -0,0 +1,23 @@
+import click
+from flask.cli import AppGroup
+from .static_assets import brotli, static_assets
+
+assets_cli = AppGroup('assets', help='Precompress the React build and generate web server config for it.')
+
+
+@assets_cli.command('precompress')
+def precompress_command():
+    """Write .gz (and .br, with brotli installed) copies of the build's text files."""
+    written = static_assets.precompress()
+    click.echo(f'{written} compressed files written to {static_assets.directory}'
+               + ('' if brotli else ' (install brotli for .br variants)'))
+
+
+@assets_cli.command('nginx-config')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default='-')
+@click.option('--upstream', default='127.0.0.1:5000', show_default=True, help='Address the Flask app listens on.')
+@click.option('--brotli-static', is_flag=True, help='Also serve .br files (needs the ngx_brotli module).')
+def nginx_config_command(path, upstream, brotli_static):
+    """Emit an nginx server block that serves the build without going through Flask."""
+    with click.open_file(path, 'w') as f:
+        f.write(static_assets.nginx_config(upstream=upstream, brotli_static=brotli_static))
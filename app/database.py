@@ -0,0 +1,125 @@
+from contextlib import contextmanager
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Engine profiles, chosen with DB_PROFILE.
+#   postgresql  sized connection pool with pre-ping and recycling, a
+#               server-side statement timeout, and an optional read replica
+#               (DATABASE_REPLICA_URL) for read-only analytics
+#   sqlite      WAL journal (readers no longer wait for the writer),
+#               synchronous=NORMAL (durable at checkpoints rather than every
+#               commit, safe with WAL) and a busy timeout for writers
+#   default     SQLAlchemy's defaults
+#   auto        postgresql or sqlite from the database URL, else default
+# Reads go to the replica only inside replica_reads(); everything else,
+# including every write and anything cached under the primary's data
+# version, stays on the primary.
+
+PROFILES = ('auto', 'default', 'sqlite', 'postgresql')
+REPLICA = 'replica'
+REPLICA_READS = 'replica_reads'
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica bind while replica_reads() is active."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get(REPLICA_READS) and not self._flushing:
+            replica = self._db.engines.get(REPLICA)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def _route_reads(to_replica):
+    session = current_app.extensions['sqlalchemy'].session
+    previous = session.info.get(REPLICA_READS, False)
+    session.info[REPLICA_READS] = to_replica
+    try:
+        yield
+    finally:
+        session.info[REPLICA_READS] = previous
+
+
+def replica_reads():
+    """Send the block's queries to the read replica, when one is configured."""
+    return _route_reads(True)
+
+
+def primary_reads():
+    """Keep the block's queries on the primary, inside a replica_reads() block too."""
+    return _route_reads(False)
+
+
+def resolve_profile(config):
+    profile = config['DB_PROFILE']
+    if profile not in PROFILES:
+        raise ValueError(f'DB_PROFILE must be one of {", ".join(PROFILES)}, not {profile!r}')
+    if profile == 'auto':
+        backend = make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+        profile = backend if backend in ('sqlite', 'postgresql') else 'default'
+    return profile
+
+
+def postgresql_options(config, replica=False):
+    options = [f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"]
+    if replica:
+        options.append('-c default_transaction_read_only=on')
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+        'connect_args': {
+            'connect_timeout': 10,
+            'application_name': 'billable-hours' + ('-replica' if replica else ''),
+            'options': ' '.join(options),
+        },
+    }
+
+
+def sqlite_options(config):
+    # pysqlite's timeout is SQLite's busy timeout, in seconds
+    return {'connect_args': {'timeout': config['DB_BUSY_TIMEOUT_MS'] / 1000}}
+
+
+def _sqlite_pragmas(busy_timeout_ms, wal):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if wal:
+            cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+        cursor.close()
+    return on_connect
+
+
+def init_database(app, db):
+    """Apply the engine profile to the app config, then initialise `db`."""
+    config = app.config
+    profile = resolve_profile(config)
+    config['DB_PROFILE_ACTIVE'] = profile
+    if profile == 'postgresql':
+        options = postgresql_options(config)
+    elif profile == 'sqlite':
+        options = sqlite_options(config)
+    else:
+        options = {}
+    # Options set explicitly in the config win over the profile's
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {**options, **config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    if config.get('DATABASE_REPLICA_URL'):
+        replica = postgresql_options(config, replica=True) if profile == 'postgresql' else {}
+        config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA] = {'url': config['DATABASE_REPLICA_URL'], **replica}
+    db.init_app(app)
+    if profile == 'sqlite':
+        with app.app_context():
+            for engine in db.engines.values():
+                if engine.dialect.name != 'sqlite':
+                    continue
+                # WAL needs a database file; in-memory databases keep their journal
+                wal = engine.url.database not in (None, '', ':memory:')
+                event.listen(engine, 'connect', _sqlite_pragmas(config['DB_BUSY_TIMEOUT_MS'], wal))
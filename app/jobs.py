@@ -0,0 +1,142 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import current_app
+
+# Background jobs.
+# enqueue() hands a function and its arguments to the configured queue, which
+# runs it later in its own app context (and so its own database session).
+# Jobs are keyed: while a job is waiting, enqueueing the same key again is a
+# no-op, so a burst of writes for one user costs one run. Enqueue after the
+# writing transaction commits, so the job sees the new data.
+#   thread  a thread pool in this process (JOB_WORKERS threads)
+#   local   one worker thread draining a FIFO queue, so jobs run in order
+#   inline  run at once in the caller, for scripts and debugging
+
+log = logging.getLogger('app.jobs')
+
+
+class ThreadPoolQueue:
+    def __init__(self, workers=2):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self.futures = set()
+        self.lock = threading.Lock()
+
+    def submit(self, run):
+        future = self.executor.submit(run)
+        with self.lock:
+            self.futures.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        with self.lock:
+            self.futures.discard(future)
+
+    def join(self):
+        with self.lock:
+            futures = list(self.futures)
+        wait(futures)
+
+
+class LocalQueue:
+    """FIFO queue drained by one daemon worker thread."""
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.worker = threading.Thread(target=self._drain, name='job-worker', daemon=True)
+        self.worker.start()
+
+    def _drain(self):
+        while True:
+            run = self.queue.get()
+            try:
+                run()
+            finally:
+                self.queue.task_done()
+
+    def submit(self, run):
+        self.queue.put(run)
+
+    def join(self):
+        self.queue.join()
+
+
+class InlineQueue:
+    def submit(self, run):
+        run()
+
+    def join(self):
+        pass
+
+
+def make_queue(config):
+    kind = config.get('JOB_QUEUE_BACKEND', 'thread')
+    if kind == 'thread':
+        return ThreadPoolQueue(workers=config.get('JOB_WORKERS', 2))
+    if kind == 'local':
+        return LocalQueue()
+    if kind == 'inline':
+        return InlineQueue()
+    raise ValueError(f'Unknown JOB_QUEUE_BACKEND: {kind}')
+
+
+class Jobs:
+    def __init__(self, app=None):
+        self.queue = None
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.enqueued = 0
+        self.coalesced = 0
+        self.completed = 0
+        self.failed = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.queue = make_queue(app.config)
+        app.extensions['jobs'] = self
+
+    def enqueue(self, key, fn, *args):
+        """Run fn(*args) in the background unless a job with the same key is still waiting."""
+        with self.lock:
+            if key in self.pending:
+                self.coalesced += 1
+                return False
+            self.pending.add(key)
+            self.enqueued += 1
+        app = current_app._get_current_object()
+
+        def run():
+            # Taken off the pending set before running, so writes during the run queue another one
+            with self.lock:
+                self.pending.discard(key)
+            try:
+                with app.app_context():
+                    fn(*args)
+            except Exception:
+                log.exception('job %r failed', key)
+                with self.lock:
+                    self.failed += 1
+            else:
+                with self.lock:
+                    self.completed += 1
+        self.queue.submit(run)
+        return True
+
+    def wait(self):
+        """Block until every job queued so far has run (scripts and benchmarks)."""
+        self.queue.join()
+
+    def stats(self):
+        return {
+            'backend': type(self.queue).__name__,
+            'enqueued': self.enqueued,
+            'coalesced': self.coalesced,
+            'completed': self.completed,
+            'failed': self.failed,
+            'pending': len(self.pending),
+        }
+
+
+jobs = Jobs()
@@ -0,0 +1,240 @@
+import bisect
+import hmac
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import Response, abort, before_render_template, current_app, g, has_app_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .planner.cache import plan_cache
+
+# Request, SQL, plan and template timings, exposed at /metrics in the
+# Prometheus text format.
+# Each request collects its numbers in a small RequestStats on `g`; SQL time
+# comes from engine cursor events, template time from Flask's render signals
+# and plan time from the timed_plan() blocks around plan computation. When the
+# request ends they are folded into per-endpoint histograms under one lock,
+# so the cost per request is a few dict lookups and no allocation per
+# statement unless the slow-request log is on. Numbers are per process, like
+# the plan cache stats: scrape every worker, or run one.
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+MAX_LOGGED_STATEMENTS = 50
+MAX_STATEMENT_CHARS = 500
+
+slow_log = logging.getLogger('app.slow_requests')
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label tuple."""
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}  # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, values, amount):
+        row = self.series.get(values)
+        if row is None:
+            row = self.series[values] = [0] * (len(self.buckets) + 1) + [0.0]
+        row[bisect.bisect_left(self.buckets, amount)] += 1
+        row[-1] += amount
+
+    def lines(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        for values, row in sorted(self.series.items()):
+            labels = _labels(self.labels, values)
+            cumulative = 0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                yield f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+            cumulative += row[len(self.buckets)]
+            yield f'{self.name}_bucket{{{labels},le="+Inf"}} {cumulative}'
+            yield f'{self.name}_sum{{{labels}}} {row[-1]:.6f}'
+            yield f'{self.name}_count{{{labels}}} {cumulative}'
+
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = {}
+
+    def inc(self, values, amount=1):
+        self.series[values] = self.series.get(values, 0) + amount
+
+    def lines(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        for values, total in sorted(self.series.items()):
+            yield f'{self.name}{{{_labels(self.labels, values)}}} {total:g}'
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+class RequestStats:
+    __slots__ = ('started', 'sql_count', 'sql_seconds', 'statements', 'plan_seconds', 'render_seconds', 'render_started')
+
+    def __init__(self, keep_statements):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.statements = [] if keep_statements else None
+        self.plan_seconds = 0.0
+        self.render_seconds = 0.0
+        self.render_started = None
+
+
+def _current():
+    return g.get('_request_stats') if has_app_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current()
+    started = getattr(context, '_metrics_started', None)
+    if stats is None or started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats.sql_count += 1
+    stats.sql_seconds += elapsed
+    if stats.statements is not None and len(stats.statements) < MAX_LOGGED_STATEMENTS:
+        stats.statements.append((elapsed, statement))
+
+
+@contextmanager
+def timed_plan():
+    """Count the block's time as plan computation of the current request."""
+    stats = _current()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.plan_seconds += time.perf_counter() - started
+
+
+def plan_timer(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with timed_plan():
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+class Metrics:
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.slow_request_ms = 0
+        self.requests = Counter('bht_http_requests_total', 'Requests by endpoint, method and status.',
+                                ('endpoint', 'method', 'status'))
+        self.latency = Histogram('bht_http_request_duration_seconds', 'Request latency.', ('endpoint',),
+                                 SECONDS_BUCKETS)
+        self.sql_statements = Histogram('bht_sql_statements_per_request', 'SQL statements executed per request.',
+                                        ('endpoint',), STATEMENT_BUCKETS)
+        self.sql_seconds = Histogram('bht_sql_duration_seconds', 'Time in SQL statements per request.',
+                                     ('endpoint',), SECONDS_BUCKETS)
+        self.plan_seconds = Histogram('bht_plan_compute_seconds', 'Time computing plans per request, cache misses only.',
+                                      ('endpoint',), SECONDS_BUCKETS)
+        self.render_seconds = Histogram('bht_template_render_seconds', 'Template rendering time per request.',
+                                        ('endpoint',), SECONDS_BUCKETS)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_TOKEN', None)
+        app.config.setdefault('SLOW_REQUEST_MS', 0)
+        app.extensions['metrics'] = self
+        if not app.config['METRICS_ENABLED']:
+            return
+        self.slow_request_ms = app.config['SLOW_REQUEST_MS']
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        before_render_template.connect(self._render_started, app)
+        template_rendered.connect(self._render_finished, app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.add_url_rule('/metrics', 'metrics', self.endpoint)
+
+    def _start(self):
+        g._request_stats = RequestStats(keep_statements=self.slow_request_ms > 0)
+
+    def _render_started(self, sender, template, context, **extra):
+        stats = _current()
+        if stats is not None:
+            stats.render_started = time.perf_counter()
+
+    def _render_finished(self, sender, template, context, **extra):
+        stats = _current()
+        if stats is not None and stats.render_started is not None:
+            stats.render_seconds += time.perf_counter() - stats.render_started
+            stats.render_started = None
+
+    def _finish(self, response):
+        stats = g.pop('_request_stats', None)
+        if stats is None:
+            return response
+        # Streamed responses are counted up to their first byte
+        elapsed = time.perf_counter() - stats.started
+        endpoint = request.endpoint or 'unmatched'
+        with self.lock:
+            self.requests.inc((endpoint, request.method, str(response.status_code)))
+            self.latency.observe((endpoint,), elapsed)
+            self.sql_statements.observe((endpoint,), stats.sql_count)
+            self.sql_seconds.observe((endpoint,), stats.sql_seconds)
+            self.plan_seconds.observe((endpoint,), stats.plan_seconds)
+            self.render_seconds.observe((endpoint,), stats.render_seconds)
+        if self.slow_request_ms and elapsed * 1e3 >= self.slow_request_ms:
+            self._log_slow(response, elapsed, stats)
+        return response
+
+    def _log_slow(self, response, elapsed, stats):
+        lines = [f'{request.method} {request.full_path.rstrip("?")} {response.status_code} {elapsed * 1e3:.1f} ms: '
+                 f'{stats.sql_count} SQL statements {stats.sql_seconds * 1e3:.1f} ms, '
+                 f'plan {stats.plan_seconds * 1e3:.1f} ms, render {stats.render_seconds * 1e3:.1f} ms']
+        for seconds, statement in stats.statements:
+            lines.append(f'  {seconds * 1e3:8.2f} ms  {" ".join(statement.split())[:MAX_STATEMENT_CHARS]}')
+        if stats.sql_count > len(stats.statements):
+            lines.append(f'  ... {stats.sql_count - len(stats.statements)} more')
+        slow_log.warning('\n'.join(lines))
+
+    def render(self):
+        cache = plan_cache.stats()
+        lines = []
+        with self.lock:
+            for metric in (self.requests, self.latency, self.sql_statements, self.sql_seconds, self.plan_seconds,
+                           self.render_seconds):
+                lines += metric.lines()
+        for name in ('hits', 'misses'):
+            lines += [f'# HELP bht_plan_cache_{name}_total Plan cache {name}.',
+                      f'# TYPE bht_plan_cache_{name}_total counter',
+                      f'bht_plan_cache_{name}_total {cache[name]}']
+        return '\n'.join(lines) + '\n'
+
+    def endpoint(self):
+        token = current_app.config['METRICS_TOKEN']
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            abort(401)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+metrics = Metrics()
@@ -5,10 +5,17 @@ class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
-    goals = db.relationship('BillableHourGoal', backref='user', lazy=True)
-    holidays = db.relationship('Holiday', backref='user', lazy=True)
-    vacation_days = db.relationship('VacationDay', backref='user', lazy=True)
-    daily_logs = db.relationship('DailyLog', backref='user', lazy=True)
+    # Bumped in the same transaction as any change to the user's logs or planning inputs;
+    # API responses derive their ETag and Last-Modified from it (see planner/versions.py)
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    data_updated_at = db.Column(db.DateTime)
+    # Shared firm calendar; the user's Holiday rows are personal overrides of it
+    holiday_calendar_id = db.Column(db.Integer, db.ForeignKey('holiday_calendar.id'))
+    # Never loaded implicitly: query the child tables by user_id, or use selectinload() where a view needs them
+    goals = db.relationship('BillableHourGoal', backref='user', lazy='raise')
+    holidays = db.relationship('Holiday', backref='user', lazy='raise')
+    vacation_days = db.relationship('VacationDay', backref='user', lazy='raise')
+    daily_logs = db.relationship('DailyLog', backref='user', lazy='raise')
 
     def __repr__(self):
         return f'<User {self.email}>'
@@ -17,23 +24,76 @@ class BillableHourGoal(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     year = db.Column(db.Integer, nullable=False)
     annual_goal = db.Column(db.Integer, nullable=False)
-    workload_weights = db.Column(db.PickleType, nullable=False)  # Dict of {month: weight}
+    # {month name: weight} as JSON; plain column reads, so reports load every goal's weights in one query
+    workload_weights = db.Column(db.JSON, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+class HolidayCalendar(db.Model):
+    # Named firm calendar: holidays are generated from the rules for any year (see planner/calendars.py)
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), unique=True, nullable=False)
+    rules = db.Column(db.JSON, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped when the rules change
+
 class Holiday(db.Model):
+    # A user's override of their calendar: an extra day off, or with observed=False a calendar holiday they work
+    __table_args__ = (db.Index('ix_holiday_user_date', 'user_id', 'date'),)
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False)
     name = db.Column(db.String(120))
     is_firm = db.Column(db.Boolean, default=False)  # True if firm-wide, False if personal
+    observed = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
 class VacationDay(db.Model):
+    __table_args__ = (db.Index('ix_vacation_day_user_date', 'user_id', 'date'),)
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
 class DailyLog(db.Model):
+    # One log per user and day; the constraint's index also serves (user_id, date) range queries.
+    # Firm-wide reports aggregate a date range across all users from the covering index.
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'date', name='uq_daily_log_user_date'),
+        db.Index('ix_daily_log_date_user_hours', 'date', 'user_id', 'hours'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False)
     hours = db.Column(db.Float, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Incremented by every write to the row; clients send back the version they read
+    # so a stale edit is refused instead of overwriting a newer one (see planner/batch.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
+
+# Rollups of daily_log, kept up to date by planner/rollups.py whenever logs are written.
+# Rebuild or check them against the raw logs with `flask rollups rebuild|verify`.
+
+class MonthlyRollup(db.Model):
+    __table_args__ = (db.UniqueConstraint('user_id', 'year', 'month', name='uq_monthly_rollup_user_year_month'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)  # 1-12
+    hours = db.Column(db.Float, nullable=False, default=0)
+    days = db.Column(db.Integer, nullable=False, default=0)  # Days with a log
+
+class WeekdayRollup(db.Model):
+    __table_args__ = (db.UniqueConstraint('user_id', 'year', 'weekday', name='uq_weekday_rollup_user_year_weekday'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    weekday = db.Column(db.Integer, nullable=False)  # 0=Monday
+    hours = db.Column(db.Float, nullable=False, default=0)
+    days = db.Column(db.Integer, nullable=False, default=0)
+
+class ActivityRollup(db.Model):
+    # Day-of-year bitmaps (366 bits): days with a log, and days with more than zero hours.
+    # Streaks are runs of set bits, measured against whichever days the plan counts.
+    __table_args__ = (db.UniqueConstraint('user_id', 'year', name='uq_activity_rollup_user_year'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    logged_days = db.Column(db.LargeBinary, nullable=False)
+    active_days = db.Column(db.LargeBinary, nullable=False)
@@ -0,0 +1,263 @@
+import datetime
+from calendar import monthrange
+import numpy as np
+from .. import db
+from ..models import DailyLog
+
+# Dashboard analytics kernel.
+# Logs and plan are laid out once on a dense day axis (one float per day) and
+# every dashboard metric is computed from slices of those arrays.
+# Totals shown verbatim in the template are accumulated with np.cumsum, which
+# adds sequentially, so they match the values the old per-day loops produced.
+# When the view passes the user's rollups, hours to date, the weekday
+# distribution and the streak are read from them instead of the day arrays.
+# Month and year actuals count planned days only, so they always come from
+# the day arrays: rollup totals include hours logged on weekends, holidays
+# and vacation days.
+
+WEEKDAY_LABELS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def load_log_arrays(user_id, start, end):
+    # One range query for every log the dashboard needs, as (datetime64[D], float64) arrays
+    rows = db.session.query(DailyLog.date, DailyLog.hours).filter(
+        DailyLog.user_id == user_id,
+        DailyLog.date >= start,
+        DailyLog.date <= end
+    ).order_by(DailyLog.date, DailyLog.id).all()
+    dates = np.array([r[0] for r in rows], dtype='datetime64[D]')
+    hours = np.array([r[1] for r in rows], dtype=np.float64)
+    return dates, hours
+
+
+def pace(annual_goal, year_target, year_actual, days_left, today):
+    # (hours per remaining planned day to reach the goal, status against the straight-line pace)
+    hours_left = max(annual_goal - year_actual, 0)
+    catchup_per_day = round(hours_left / days_left, 2) if days_left > 0 else 0
+    expected_pace = year_target * (today.timetuple().tm_yday / 365)
+    pace_status = 'on track'
+    if year_actual > expected_pace:
+        pace_status = f'{round(year_actual - expected_pace, 1)} hours ahead'
+    elif year_actual < expected_pace:
+        pace_status = f'{round(expected_pace - year_actual, 1)} hours behind'
+    return catchup_per_day, pace_status
+
+
+def dashboard_range(today, year, compare_start=None, compare_end=None):
+    # First and last day any dashboard metric looks at
+    start = min(datetime.date(year, 1, 1), datetime.date(today.year, 1, 1), today - datetime.timedelta(days=29))
+    end = max(datetime.date(year, 12, 31), today)
+    if compare_start and compare_end and compare_start <= compare_end:
+        start = min(start, compare_start)
+        end = max(end, compare_end)
+    return start, end
+
+
+def _total(values):
+    # Sequential sum, identical to the builtin sum() over the same floats
+    return np.cumsum(values)[-1].item() if len(values) else 0
+
+
+def _avg_workdays(actual, weekdays, lo, hi):
+    workdays = weekdays[lo:hi]
+    count = int(np.count_nonzero(workdays))
+    if not count:
+        return 0
+    return _total(actual[lo:hi][workdays]) / count
+
+
+def _max_run(flags):
+    # Longest run of True values
+    if not flags.any():
+        return 0
+    padded = np.concatenate(([0], flags.astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(padded))
+    return int((edges[1::2] - edges[0::2]).max())
+
+
+def percent_change(new, old):
+    if old == 0:
+        return None if new == 0 else 100.0
+    return ((new - old) / old) * 100
+
+
+def dashboard_metrics(ledger, log_dates, log_hours, today, year, month, annual_goal, compare_start=None, compare_end=None,
+                      rollups=None):
+    """Compute every value the dashboard template needs in one pass.
+
+    ledger is the YearLedger of `year`'s plan, or None; log_dates/log_hours
+    come from load_log_arrays() over dashboard_range(). rollups is an optional
+    {year: YearRollup} from load_rollups() covering `year` and today's year.
+    """
+    start, end = dashboard_range(today, year, compare_start, compare_end)
+    origin = np.datetime64(start, 'D')
+    n = (end - start).days + 1
+    days = origin + np.arange(n)
+
+    def idx(d):
+        return (d - start).days
+
+    # Dense, aligned day arrays
+    in_axis = (log_dates >= origin) & (log_dates < origin + n)
+    log_idx = (log_dates[in_axis] - origin).astype(np.int64)
+    actual = np.zeros(n)
+    actual[log_idx] = log_hours[in_axis]
+    logged = np.zeros(n, dtype=bool)
+    logged[log_idx] = True
+    target = np.zeros(n)
+    planned = np.zeros(n, dtype=bool)
+    if ledger is not None:
+        # dashboard_range() always covers the whole of `year`
+        plan_slice = slice(idx(ledger.origin), idx(ledger.origin) + len(ledger))
+        target[plan_slice] = ledger.targets()
+        planned[plan_slice] = ledger.planned_mask()
+    weekday = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday; 0=Monday
+    weekdays = weekday < 5
+
+    # Selected month and year
+    first_day = datetime.date(year, month, 1)
+    last_day = datetime.date(year, month, monthrange(year, month)[1])
+    m0, m1 = idx(first_day), idx(last_day) + 1
+    y0, y1 = idx(datetime.date(year, 1, 1)), idx(datetime.date(year, 12, 31)) + 1
+    month_planned = planned[m0:m1]
+    year_planned = planned[y0:y1]
+    month_target = _total(target[m0:m1][month_planned])
+    year_target = _total(target[y0:y1][year_planned])
+    month_actual = _total(actual[m0:m1][month_planned])
+    year_actual = _total(actual[y0:y1][year_planned])
+
+    # Pace/catch-up logic
+    today_i = idx(today)
+    days_left = int(np.count_nonzero(year_planned[max(today_i - y0, 0):])) if today_i < y1 else 0
+    catchup_per_day, pace_status = pace(annual_goal, year_target, year_actual, days_left, today)
+
+    # Calendar structure for the selected month
+    month_days = days[m0:m1].tolist()
+    month_logs = actual[m0:m1].tolist()
+    month_targets = target[m0:m1].tolist()
+    month_logged = logged[m0:m1]
+    daily_plan = {d: t for d, t, p in zip(month_days, month_targets, month_planned) if p}
+    logs_by_date = {d: a for d, a, l in zip(month_days, month_logs, month_logged) if l}
+    status = np.select(
+        [~month_planned, days[m0:m1] == np.datetime64(today, 'D'), ~month_logged,
+         actual[m0:m1] >= target[m0:m1], actual[m0:m1] > 0],
+        ['nonwork', 'today', 'no-log', 'on-track', 'partial'],
+        default='no-log'
+    ).tolist()
+    calendar_days = [{
+        'date': d,
+        'target': daily_plan.get(d),
+        'logged': logs_by_date.get(d),
+        'status': s
+    } for d, s in zip(month_days, status)]
+
+    # Cumulative series
+    year_days = days[y0:y1][year_planned].tolist()
+    year_logs_arr = actual[y0:y1][year_planned]
+    year_targets_arr = target[y0:y1][year_planned]
+
+    # Weekday distribution over the year's logs
+    if rollups:
+        weekday_totals = rollups[year].weekday_hours
+        order = rollups[year].weekday_order()
+        # Positions in the year slice are days of the year
+        streak = _max_run(rollups[year].active[np.flatnonzero(year_planned)])
+    else:
+        year_logged = logged[y0:y1]
+        year_weekday = weekday[y0:y1][year_logged]
+        weekday_totals = np.bincount(year_weekday, weights=actual[y0:y1][year_logged], minlength=7)
+        present, first_seen = np.unique(year_weekday, return_index=True)
+        order = present[np.argsort(first_seen)]
+        streak = _max_run(year_logs_arr > 0)
+    weekday_data = weekday_totals.tolist()
+    most_productive_day = None
+    if len(order):
+        # Ties go to the weekday logged first, as max() over insertion order did
+        most_productive_day = WEEKDAY_LABELS[order[np.argmax(weekday_totals[order])]]
+
+    # Comparison period
+    cmp_month_days = []
+    cmp_month_logs = []
+    cmp_month_targets = []
+    cmp_month_cum_actual = []
+    cmp_month_cum_target = []
+    cmp_avg = None
+    if compare_start and compare_end and compare_start <= compare_end:
+        c0, c1 = idx(compare_start), idx(compare_end) + 1
+        cmp_month_days = days[c0:c1].tolist()
+        cmp_month_logs = actual[c0:c1].tolist()
+        cmp_month_targets = target[c0:c1].tolist()
+        cmp_month_cum_actual = np.cumsum(actual[c0:c1]).tolist()
+        cmp_month_cum_target = np.cumsum(target[c0:c1]).tolist()
+        cmp_avg = _avg_workdays(actual, weekdays, c0, c1)
+
+    # Key statistics
+    ytd0 = idx(datetime.date(today.year, 1, 1))
+    primary_avg = _avg_workdays(actual, weekdays, m0, m1)
+    avg_14 = _avg_workdays(actual, weekdays, today_i - 13, today_i + 1)
+    avg_30 = _avg_workdays(actual, weekdays, today_i - 29, today_i + 1)
+    avg_ytd = _avg_workdays(actual, weekdays, ytd0, today_i + 1)
+
+    # Goal progress & projections
+    if rollups:
+        # Months through today's, less anything already logged for later this month
+        month_end = idx(datetime.date(today.year, today.month, monthrange(today.year, today.month)[1])) + 1
+        actual_ytd = rollups[today.year].total(today.month) - _total(actual[today_i + 1:month_end])
+    else:
+        actual_ytd = _total(actual[ytd0:today_i + 1])
+    pct_complete = (actual_ytd / annual_goal * 100) if annual_goal else 0
+    year_end = datetime.date(today.year, 12, 31) + datetime.timedelta(days=1)
+    remaining_workdays = int(np.busday_count(today, year_end))
+    total_workdays = int(np.busday_count(datetime.date(today.year, 1, 1), year_end))
+    req_avg = (max(annual_goal - actual_ytd, 0) / remaining_workdays) if remaining_workdays else 0
+    projected_total = (avg_ytd * total_workdays) if avg_ytd else actual_ytd
+    expected_as_of_today = _total(target[ytd0:today_i + 1])
+    avg_day_target = (annual_goal / total_workdays) if total_workdays else 0
+    days_ahead_behind = ((actual_ytd - expected_as_of_today) / avg_day_target) if avg_day_target else 0
+
+    return {
+        'daily_plan': daily_plan,
+        'first_day': first_day,
+        'calendar_days': calendar_days,
+        'logs_by_date': logs_by_date,
+        'month_actual': month_actual,
+        'month_target': month_target,
+        'year_actual': year_actual,
+        'year_target': year_target,
+        'pace_status': pace_status,
+        'catchup_per_day': catchup_per_day,
+        'month_days': month_days,
+        'month_logs': month_logs,
+        'month_targets': month_targets,
+        'month_cum_actual': np.cumsum(actual[m0:m1]).tolist(),
+        'month_cum_target': np.cumsum(target[m0:m1]).tolist(),
+        'year_days': year_days,
+        'year_logs': year_logs_arr.tolist(),
+        'year_targets': year_targets_arr.tolist(),
+        'year_cum_actual': np.cumsum(year_logs_arr).tolist(),
+        'year_cum_target': np.cumsum(year_targets_arr).tolist(),
+        'weekday_labels': WEEKDAY_LABELS,
+        'weekday_data': weekday_data,
+        'most_productive_day': most_productive_day,
+        'streak': streak,
+        'cmp_month_days': cmp_month_days,
+        'cmp_month_logs': cmp_month_logs,
+        'cmp_month_targets': cmp_month_targets,
+        'cmp_month_cum_actual': cmp_month_cum_actual,
+        'cmp_month_cum_target': cmp_month_cum_target,
+        'primary_avg': primary_avg,
+        'cmp_avg': cmp_avg,
+        'avg_14': avg_14,
+        'avg_30': avg_30,
+        'avg_ytd': avg_ytd,
+        'stat_pct_cmp': percent_change(primary_avg, cmp_avg) if cmp_avg is not None else None,
+        'stat_pct_14_30': percent_change(avg_14, avg_30) if avg_30 else None,
+        'stat_pct_14_ytd': percent_change(avg_14, avg_ytd) if avg_ytd else None,
+        'stat_pct_30_ytd': percent_change(avg_30, avg_ytd) if avg_ytd else None,
+        'annual_goal': annual_goal,
+        'actual_ytd': actual_ytd,
+        'pct_complete': pct_complete,
+        'req_avg': req_avg,
+        'projected_total': projected_total,
+        'days_ahead_behind': days_ahead_behind,
+    }
@@ -0,0 +1,138 @@
+from sqlalchemy import bindparam, select, tuple_
+from .. import db
+from ..models import DailyLog
+from .imports import validate_row
+from .rollups import record_changes
+from .versions import bump_data_version
+
+# Batched hour logging with optimistic concurrency.
+# An edit is (date, hours, version): the hours to store, or None to clear the
+# day, and the version of the day's log the client last read (0 for a day
+# without one). A batch is written in one transaction, with one upsert for
+# the stored days and one delete for the cleared ones, each conditional on
+# the row still having the version the client read. If any edit misses, the
+# whole batch is rolled back and VersionConflict reports the server's rows,
+# so a stale calendar never overwrites a newer entry from another tab.
+
+MAX_BATCH_DAYS = 366
+
+
+class VersionConflict(Exception):
+    def __init__(self, conflicts):
+        super().__init__(f'{len(conflicts)} day(s) changed since they were read')
+        self.conflicts = conflicts  # [(date, hours or None, version)] as stored now
+
+
+def parse_edits(entries):
+    """[(date, hours or None, version)] from a request's entries; raises ValueError."""
+    if not isinstance(entries, list) or not entries:
+        raise ValueError('entries must be a non-empty list')
+    if len(entries) > MAX_BATCH_DAYS:
+        raise ValueError(f'at most {MAX_BATCH_DAYS} entries per request')
+    edits, seen = [], set()
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            raise ValueError(f'entry {i}: expected an object')
+        version = entry.get('version', 0)
+        try:
+            if entry.get('hours') is None:
+                date, hours = validate_row({'date': entry.get('date'), 'hours': 0})[0], None
+            else:
+                date, hours = validate_row(entry)
+            if not isinstance(version, int) or isinstance(version, bool) or version < 0:
+                raise ValueError('version must be a non-negative integer')
+            if date in seen:
+                raise ValueError(f'{date} appears more than once')
+        except ValueError as e:
+            raise ValueError(f'entry {i}: {e}') from None
+        seen.add(date)
+        edits.append((date, hours, version))
+    return edits
+
+
+def _stored(user_id, dates, lock=False):
+    # {date: (hours, version)}; lock takes row locks where the database has them (FOR UPDATE)
+    table = DailyLog.__table__
+    query = select(table.c.date, table.c.hours, table.c.version).where(
+        table.c.user_id == user_id, table.c.date.in_(dates))
+    if lock:
+        query = query.with_for_update()
+    return {d: (h, v) for d, h, v in db.session.execute(query)}
+
+
+def _write(user_id, writes):
+    # Upsert (date, hours, version) rows whose stored version is still `version`; returns the rows written
+    if not writes:
+        return 0
+    table = DailyLog.__table__
+    rows = [{'user_id': user_id, 'date': d, 'hours': h, 'version': v + 1} for d, h, v in writes]
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'date'],
+            set_={'hours': stmt.excluded.hours, 'version': stmt.excluded.version},
+            where=table.c.version + 1 == stmt.excluded.version,
+        ).returning(table.c.date)
+        return len(db.session.execute(stmt, rows).all())
+    # Generic fallback: conditional updates, then inserts for the days that had no log
+    written = 0
+    for row in rows:
+        if row['version'] > 1:
+            written += db.session.execute(
+                table.update().where(table.c.user_id == user_id, table.c.date == row['date'],
+                                     table.c.version == row['version'] - 1)
+                .values(hours=row['hours'], version=row['version'])
+            ).rowcount
+        else:
+            db.session.execute(table.insert(), row)
+            written += 1
+    return written
+
+
+def _clear(user_id, clears):
+    # Delete the (date, version) rows that still have that version; returns the rows deleted
+    if not clears:
+        return 0
+    table = DailyLog.__table__
+    if db.session.get_bind().dialect.name in ('sqlite', 'postgresql'):
+        return len(db.session.execute(
+            table.delete().where(table.c.user_id == user_id, tuple_(table.c.date, table.c.version).in_(clears))
+            .returning(table.c.date)
+        ).all())
+    return db.session.execute(
+        table.delete().where(table.c.user_id == user_id, table.c.date == bindparam('b_date'),
+                             table.c.version == bindparam('b_version')),
+        [{'b_date': d, 'b_version': v} for d, v in clears]
+    ).rowcount
+
+
+def _conflicts(user_id, edits):
+    db.session.rollback()
+    stored = _stored(user_id, [d for d, _, _ in edits])
+    return [(d, *stored.get(d, (None, 0))) for d, _, v in edits if stored.get(d, (None, 0))[1] != v]
+
+
+def apply_edits(user_id, edits):
+    """Write the edits in one transaction; returns [(date, hours or None, version)] as now stored.
+
+    Raises VersionConflict, with nothing written, when any edit's version is
+    not the stored one. Clearing a day that has no log is a no-op.
+    """
+    stored = _stored(user_id, [d for d, _, _ in edits], lock=True)
+    if any(stored.get(d, (None, 0))[1] != v for d, _, v in edits):
+        raise VersionConflict(_conflicts(user_id, edits))
+    writes = [(d, h, v) for d, h, v in edits if h is not None]
+    clears = [(d, v) for d, h, v in edits if h is None and v]
+    # A concurrent writer can still slip in between the read and the writes; the conditional statements catch it
+    if _write(user_id, writes) != len(writes) or _clear(user_id, clears) != len(clears):
+        raise VersionConflict(_conflicts(user_id, edits) or [(d, None, 0) for d, _, _ in edits])
+    record_changes([(user_id, d, stored[d][0] if d in stored else None, h)
+                    for d, h, v in edits if h is not None or v])
+    bump_data_version(user_id)
+    db.session.commit()
+    return [(d, h, v + 1 if h is not None else 0) for d, h, v in edits]
@@ -0,0 +1,182 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+# Per-user plan cache.
+# Entries are keyed by (user_id, year, data version). The version is the
+# user's User.data_version, which every write to their goal, holidays,
+# calendar, vacation days or logs bumps in its own transaction. Every process
+# and worker therefore sees a change as soon as it commits, and old entries
+# are never read again and simply age out of the backend.
+# PAYLOAD_FORMAT is part of the key too, so shared backends never hand a new
+# release an entry of an older shape.
+
+PAYLOAD_FORMAT = 6
+
+
+class MemoryBackend:
+    """In-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class LocalRedis:
+    """Offline stand-in for the subset of the redis-py client used by RedisBackend."""
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def _expired(self, name):
+        expires = self._expires.get(name)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(name, None)
+            self._expires.pop(name, None)
+            return True
+        return False
+
+    def get(self, name):
+        with self._lock:
+            if self._expired(name):
+                return None
+            return self._data.get(name)
+
+    def set(self, name, value, ex=None):
+        if isinstance(value, str):
+            value = value.encode()
+        with self._lock:
+            self._data[name] = value
+            if ex:
+                self._expires[name] = time.monotonic() + ex
+            else:
+                self._expires.pop(name, None)
+        return True
+
+    def delete(self, *names):
+        with self._lock:
+            removed = 0
+            for name in names:
+                if self._data.pop(name, None) is not None:
+                    removed += 1
+                self._expires.pop(name, None)
+            return removed
+
+    def flushdb(self):
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+
+
+class RedisBackend:
+    """Backend for a redis-py compatible client (redis.Redis or LocalRedis)."""
+
+    def __init__(self, client, ttl=3600, prefix='bht:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=self.ttl or None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        if hasattr(self.client, 'flushdb'):
+            self.client.flushdb()
+
+
+def make_backend(config):
+    kind = config.get('PLAN_CACHE_BACKEND', 'memory')
+    ttl = config.get('PLAN_CACHE_TTL', 3600)
+    if kind == 'memory':
+        return MemoryBackend(max_entries=config.get('PLAN_CACHE_SIZE', 1024), ttl=ttl)
+    if kind == 'local-redis':
+        return RedisBackend(LocalRedis(), ttl=ttl)
+    if kind == 'redis':
+        import redis  # optional dependency, only needed for this backend
+        return RedisBackend(redis.Redis.from_url(config['PLAN_CACHE_URL']), ttl=ttl)
+    raise ValueError(f'Unknown PLAN_CACHE_BACKEND: {kind}')
+
+
+class PlanCache:
+    """Caches computed plans per (user_id, year, data version).
+
+    Hit/miss counters are kept per process and exposed through stats().
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.backend = make_backend(app.config)
+        app.extensions['plan_cache'] = self
+
+    def key(self, user_id, year, version):
+        return f'plan:{user_id}:{year}:v{version}:f{PAYLOAD_FORMAT}'
+
+    def get_or_compute(self, user_id, year, version, compute):
+        # `version` must be read before compute() reads the data; compute() returning None
+        # (e.g. no goal yet) is not cached
+        key = self.key(user_id, year, version)
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute()
+        if value is not None:
+            self.backend.set(key, value)
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+plan_cache = PlanCache()
@@ -0,0 +1,207 @@
+import datetime
+from calendar import monthrange
+import numpy as np
+from sqlalchemy import select, update
+from .. import db
+from ..models import Holiday, HolidayCalendar, User
+from .cache import MemoryBackend
+from .engine import year_days
+from .versions import bump_data_version, bump_data_versions
+
+# Shared firm holiday calendars.
+# A calendar is a named list of rules, so it covers every year without
+# per-year rows. Each (calendar, version, year) is generated once per process
+# and kept as a read-only day-of-year bitmap shared by every subscriber; a
+# user's plan copies that bitmap and applies the user's own Holiday rows:
+# observed rows are extra days off, unobserved rows are calendar holidays the
+# user works. Changing a calendar's rules bumps its version, so cached years
+# of the old rules are never read again.
+#
+# Rules (JSON objects):
+#   {"name": ..., "month": 7, "day": 4, "observed": true}   fixed date; observed moves
+#                                                             Saturday to Friday, Sunday to Monday
+#   {"name": ..., "month": 11, "weekday": 3, "nth": 4}      nth weekday (0=Monday) of the month,
+#                                                             nth=-1 for the last one;
+#                                                             "offset": 1 for the day after
+#   {"name": ..., "date": "2026-12-24"}                     one-off closure
+
+DEFAULT_CALENDAR = 'US Federal'
+US_FEDERAL_RULES = [
+    {'name': "New Year's Day", 'month': 1, 'day': 1, 'observed': True},
+    {'name': 'Martin Luther King Jr. Day', 'month': 1, 'weekday': 0, 'nth': 3},
+    {'name': "Presidents' Day", 'month': 2, 'weekday': 0, 'nth': 3},
+    {'name': 'Memorial Day', 'month': 5, 'weekday': 0, 'nth': -1},
+    {'name': 'Independence Day', 'month': 7, 'day': 4, 'observed': True},
+    {'name': 'Labor Day', 'month': 9, 'weekday': 0, 'nth': 1},
+    {'name': 'Columbus Day', 'month': 10, 'weekday': 0, 'nth': 2},
+    {'name': 'Veterans Day', 'month': 11, 'day': 11, 'observed': True},
+    {'name': 'Thanksgiving Day', 'month': 11, 'weekday': 3, 'nth': 4},
+    {'name': 'Christmas Day', 'month': 12, 'day': 25, 'observed': True},
+]
+
+_years = MemoryBackend(max_entries=256, ttl=0)
+
+
+def rule_date(rule, year):
+    """The date a rule falls on in `year`, or None when it does not occur that year."""
+    if 'date' in rule:
+        date = datetime.date.fromisoformat(rule['date'])
+        return date if date.year == year else None
+    month = rule['month']
+    if 'weekday' in rule:
+        nth = rule.get('nth', 1)
+        if nth > 0:
+            first = datetime.date(year, month, 1)
+            date = first + datetime.timedelta(days=(rule['weekday'] - first.weekday()) % 7 + 7 * (nth - 1))
+        else:
+            last = datetime.date(year, month, monthrange(year, month)[1])
+            date = last - datetime.timedelta(days=(last.weekday() - rule['weekday']) % 7 + 7 * (-nth - 1))
+        if date.month != month:
+            return None
+    else:
+        if rule['day'] > monthrange(year, month)[1]:
+            return None  # February 29 outside leap years
+        date = datetime.date(year, month, rule['day'])
+        if rule.get('observed'):
+            date += datetime.timedelta(days={5: -1, 6: 1}.get(date.weekday(), 0))
+    return date + datetime.timedelta(days=rule.get('offset', 0))
+
+
+def validate_rules(rules):
+    """Raise ValueError unless every rule can be evaluated."""
+    if not isinstance(rules, list):
+        raise ValueError('rules must be a list')
+    for rule in rules:
+        if not isinstance(rule, dict) or not rule.get('name'):
+            raise ValueError(f'every rule needs a name: {rule!r}')
+        if 'weekday' in rule and not (rule['weekday'] in range(7) and rule.get('nth', 1) in (1, 2, 3, 4, 5, -1, -2)):
+            raise ValueError(f'invalid rule {rule!r}: weekday must be 0-6 and nth 1-5 or -1/-2')
+        try:
+            rule_date(rule, 2000)
+        except (KeyError, TypeError, ValueError, OverflowError) as e:
+            raise ValueError(f'invalid rule {rule!r}: {e}') from None
+
+
+def generate_holidays(rules, year):
+    """Sorted [(date, name)] of the rules' holidays that fall in `year`."""
+    found = {}
+    # Observed dates can cross into the neighbouring year (January 1 on a Saturday)
+    for rule_year in (year - 1, year, year + 1):
+        for rule in rules:
+            date = rule_date(rule, rule_year)
+            if date is not None and date.year == year:
+                found.setdefault(date, rule['name'])
+    return sorted(found.items())
+
+
+class CalendarYear:
+    """One calendar's holidays in one year; mask is a read-only bitmap over the year's days."""
+
+    __slots__ = ('year', 'dates', 'names', 'mask')
+
+    def __init__(self, year, holidays):
+        self.year = year
+        self.dates = [d for d, _ in holidays]
+        self.names = [n for _, n in holidays]
+        days = year_days(year)
+        self.mask = np.isin(days, np.array(self.dates, dtype='datetime64[D]'))
+        self.mask.setflags(write=False)
+
+
+def calendar_year(calendar_id, version, rules, year):
+    """Cached CalendarYear of a calendar at `version`; `rules` are only read on a miss."""
+    key = (calendar_id, version, year)
+    cached = _years.get(key)
+    if cached is None:
+        cached = CalendarYear(year, generate_holidays(rules, year))
+        _years.set(key, cached)
+    return cached
+
+
+def _subscription(user_id):
+    # (id, version, rules) of the user's calendar, or None
+    return db.session.execute(
+        select(HolidayCalendar.id, HolidayCalendar.version, HolidayCalendar.rules)
+        .join(User, User.holiday_calendar_id == HolidayCalendar.id)
+        .where(User.id == user_id)
+    ).first()
+
+
+def _overrides(user_id, start, end):
+    return db.session.execute(
+        select(Holiday.date, Holiday.observed)
+        .where(Holiday.user_id == user_id, Holiday.date >= start, Holiday.date <= end)
+    ).all()
+
+
+def user_calendar_year(user_id, year):
+    """The user's subscribed CalendarYear, or None."""
+    calendar = _subscription(user_id)
+    return calendar_year(*calendar, year) if calendar else None
+
+
+def apply_overrides(mask, year, overrides):
+    """Copy of a year's holiday mask with (date, observed) overrides applied.
+
+    A personal day off wins over a worked calendar holiday on the same date.
+    """
+    mask = mask.copy() if mask is not None else np.zeros(len(year_days(year)), dtype=bool)
+    start = datetime.date(year, 1, 1)
+    for date, observed in sorted(overrides, key=lambda o: o[1]):
+        if date.year == year:
+            mask[(date - start).days] = observed
+    return mask
+
+
+def user_holiday_mask(user_id, year):
+    """Bool mask over the days of `year`: the subscribed calendar with the user's overrides."""
+    calendar = user_calendar_year(user_id, year)
+    overrides = _overrides(user_id, datetime.date(year, 1, 1), datetime.date(year, 12, 31))
+    return apply_overrides(calendar.mask if calendar else None, year, overrides)
+
+
+def user_holiday_dates(user_id, start, end):
+    """The user's holidays from start to end, calendar and personal, as datetime.date objects."""
+    calendar = _subscription(user_id)
+    overrides = _overrides(user_id, start, end)
+    dates = []
+    for year in range(start.year, end.year + 1):
+        shared = calendar_year(*calendar, year).mask if calendar else None
+        mask = apply_overrides(shared, year, overrides)
+        dates += [d for d in year_days(year)[mask].tolist() if start <= d <= end]
+    return dates
+
+
+def default_calendar():
+    """The US federal calendar new users are subscribed to, created on first use."""
+    calendar = HolidayCalendar.query.filter_by(name=DEFAULT_CALENDAR).first()
+    if calendar is None:
+        calendar = HolidayCalendar(name=DEFAULT_CALENDAR, rules=US_FEDERAL_RULES)
+        db.session.add(calendar)
+        db.session.flush()
+    return calendar
+
+
+def save_calendar(name, rules):
+    """Create the calendar `name` or replace its rules; commits.
+
+    Replacing the rules bumps every subscriber's data version in the same
+    transaction, which retires their cached plans in every process.
+    """
+    validate_rules(rules)
+    calendar = HolidayCalendar.query.filter_by(name=name).first()
+    if calendar is None:
+        calendar = HolidayCalendar(name=name, rules=rules)
+        db.session.add(calendar)
+    else:
+        calendar.rules = rules
+        calendar.version += 1
+        bump_data_versions(User.holiday_calendar_id == calendar.id)
+    db.session.commit()
+    return calendar
+
+
+def subscribe(user_id, calendar_id):
+    """Point the user at another calendar; commits with the caller's transaction."""
+    db.session.execute(update(User).where(User.id == user_id).values(holiday_calendar_id=calendar_id))
+    bump_data_version(user_id)
@@ -0,0 +1,133 @@
+import datetime
+import math
+import numpy as np
+from .engine import _to_datetime64
+
+# Catch-up plan optimizer.
+# The horizon from the start date to the finish date is one datetime64[D]
+# array with a capacity per day: the workday cap on weekdays, the weekend cap
+# (0 unless weekends are allowed) on Saturdays and Sundays, and 0 on holidays,
+# vacation and other blackout dates. Hours are allocated in whole hundredths
+# of an hour, so every plan sums to exactly hours_needed whenever the horizon
+# has room for it.
+#   earliest finish: fill each day up to its cap, in date order
+#   minimum peak:    the lowest daily level that still fits by the finish date
+#                    (water-filling over the capacities)
+
+UNITS = 100  # Allocations are whole multiples of 0.01 h
+MAX_HORIZON_DAYS = 5 * 366
+MAX_DAY_HOURS = 24
+
+
+def _units(hours):
+    return int(round(float(hours) * UNITS))
+
+
+def day_capacities(start, finish, max_workday_hours, weekend_hours=0, blackout_dates=(), day_caps=None):
+    """Days from start to finish (inclusive) and each day's capacity in UNITS.
+
+    day_caps maps dates to a cap that replaces the default for that day;
+    blackout dates always get 0.
+    """
+    days = np.arange(np.datetime64(start, 'D'), np.datetime64(finish, 'D') + 1)
+    caps = np.where(np.is_busday(days), _units(max_workday_hours), _units(weekend_hours)).astype(np.int64)
+    if day_caps:
+        dates = _to_datetime64(list(day_caps))
+        inside = (dates >= days[0]) & (dates <= days[-1])
+        values = np.array([_units(v) for v in day_caps.values()], dtype=np.int64)
+        caps[(dates[inside] - days[0]).astype(np.int64)] = values[inside]
+    if len(blackout_dates):
+        caps[np.isin(days, _to_datetime64(blackout_dates))] = 0
+    return days, np.maximum(caps, 0)
+
+
+def earliest_finish(caps, needed):
+    # Every day filled to its cap, in order, until `needed` units are placed
+    before = np.cumsum(caps) - caps
+    return np.clip(needed - before, 0, caps)
+
+
+def minimum_peak(caps, needed):
+    # Lowest possible daily maximum: min(cap, level) on every day, with the
+    # units left over by rounding the level down given to the earliest days with room
+    if caps.sum() <= needed:
+        return caps.copy()
+    ordered = np.sort(caps)
+    n = len(ordered)
+    below = np.concatenate(([0], np.cumsum(ordered)))[:-1]
+    # Units placed when the level equals each sorted cap
+    placed = below + ordered * (n - np.arange(n))
+    k = int(np.searchsorted(placed, needed))
+    level = (needed - below[k]) // (n - k)
+    alloc = np.minimum(caps, level)
+    room = np.flatnonzero(caps > alloc)
+    alloc[room[:needed - alloc.sum()]] += 1
+    return alloc
+
+
+def _describe(label, strategy, days, alloc, needed):
+    used = np.flatnonzero(alloc)
+    if not len(used):
+        return None
+    dates = days[used]
+    weekend_days = int(np.count_nonzero(~np.is_busday(dates)))
+    placed = int(alloc.sum())
+    iso = np.datetime_as_string(dates).tolist()
+    return {
+        'label': label,
+        'strategy': strategy,
+        'plan': [{'date': d, 'hours': h} for d, h in zip(iso, (alloc[used] / UNITS).tolist())],
+        'duration': int((dates[-1] - dates[0]).astype(np.int64)) + 1,
+        'end_date': iso[-1],
+        'weekend_days': weekend_days,
+        'workdays': len(used) - weekend_days,
+        'total_hours': placed / UNITS,
+        'peak_hours': int(alloc.max()) / UNITS,
+        'feasible': placed == needed,
+        'shortfall': (needed - placed) / UNITS,
+    }
+
+
+def suggest_catchup_plans(hours_needed, max_workday_hours, weekend_policy, start=None, finish_by=None,
+                          blackout_dates=(), day_caps=None):
+    """
+    Suggest 3 plans to catch up or get ahead, all within [start, finish_by]:
+    Gentle (lowest daily peak by finish_by), Moderate (lowest peak by halfway
+    between the earliest finish and finish_by) and Aggressive (earliest finish).
+    weekend_policy: dict with keys 'allow', 'max_hours' (e.g., {'allow': True, 'max_hours': 4})
+    Returns: list of dicts {label, strategy, plan: [{date, hours}], duration, end_date, weekend_days,
+    workdays, total_hours, peak_hours, feasible, shortfall}
+    Raises ValueError for hours that are not finite, negative or more than a day (or, for
+    hours_needed, the longest horizon) can hold, and for an empty or overlong horizon.
+    """
+    start = start or datetime.date.today()
+    finish_by = finish_by or datetime.date(start.year, 12, 31)
+    if finish_by < start:
+        raise ValueError('finish_by must not be before the start date')
+    if (finish_by - start).days >= MAX_HORIZON_DAYS:
+        raise ValueError(f'the plan horizon is limited to {MAX_HORIZON_DAYS} days')
+    caps = [max_workday_hours, weekend_policy.get('max_hours', 0), *(day_caps or {}).values()]
+    if not all(math.isfinite(h) for h in [hours_needed, *caps]):
+        raise ValueError('hours must be finite numbers')
+    if not 0 <= hours_needed <= MAX_DAY_HOURS * MAX_HORIZON_DAYS:
+        raise ValueError(f'hours_needed must be between 0 and {MAX_DAY_HOURS * MAX_HORIZON_DAYS}')
+    if not all(0 <= h <= MAX_DAY_HOURS for h in caps):
+        raise ValueError(f'daily hours must be between 0 and {MAX_DAY_HOURS}')
+    weekend_hours = weekend_policy.get('max_hours', 0) if weekend_policy.get('allow') else 0
+    days, caps = day_capacities(start, finish_by, max_workday_hours, weekend_hours, blackout_dates, day_caps)
+    needed = _units(hours_needed)
+
+    aggressive = earliest_finish(caps, needed)
+    used = np.flatnonzero(aggressive)
+    earliest_end = int(used[-1]) if len(used) else 0
+    midpoint = earliest_end + (len(days) - 1 - earliest_end) // 2
+    moderate = np.zeros_like(caps)
+    moderate[:midpoint + 1] = minimum_peak(caps[:midpoint + 1], needed)
+    gentle = minimum_peak(caps, needed)
+
+    plans = [
+        _describe('Gentle', 'minimum-peak', days, gentle, needed),
+        _describe('Moderate', 'minimum-peak-midpoint', days, moderate, needed),
+        _describe('Aggressive', 'earliest-finish', days, aggressive, needed),
+    ]
+    return [p for p in plans if p]
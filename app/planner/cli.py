@@ -0,0 +1,121 @@
+import datetime
+import json
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func
+from .. import db
+from ..models import HolidayCalendar, User
+from .imports import CHUNK_SIZE, detect_format, import_logs
+from .export import FORMATS, stream_export
+from . import calendars, rollups
+
+logs_cli = AppGroup('logs', help='Bulk import and export of daily hour logs.')
+rollups_cli = AppGroup('rollups', help='Check or rebuild the monthly, weekday and streak rollups.')
+calendars_cli = AppGroup('calendars', help='Shared firm holiday calendars.')
+
+
+def _get_user(email):
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        raise click.BadParameter(f'no user with email {email}', param_hint='--user')
+    return user
+
+
+@logs_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--user', 'email', required=True, help='Email of the user the hours belong to.')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=CHUNK_SIZE, show_default=True, help='Rows validated and upserted per statement.')
+def import_command(path, email, fmt, chunk_size):
+    """Import (date, hours[, matter]) rows from a CSV or NDJSON file."""
+    user = _get_user(email)
+    fmt = fmt or detect_format(filename=path)
+    with click.open_file(path, 'rb') as f:
+        result = import_logs(user.id, f, fmt, chunk_size=chunk_size)
+    for error in result.errors:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    click.echo(f'{result.rows_imported}/{result.rows_read} rows imported into {result.days_written} days, '
+               f'{result.error_count} errors')
+
+
+@logs_cli.command('export')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True, allow_dash=True))
+@click.option('--user', 'email', help='Email of the user to export.')
+@click.option('--all', 'all_users', is_flag=True, help='Export every user (firm-wide).')
+@click.option('--start', type=click.DateTime(['%Y-%m-%d']), help='First day, defaults to January 1 of this year.')
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), help='Last day, defaults to December 31 of this year.')
+@click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), default='csv', show_default=True)
+def export_command(path, email, all_users, start, end, fmt):
+    """Export plan-versus-actual rows to a CSV, NDJSON or columnar .npz file."""
+    if bool(email) == all_users:
+        raise click.UsageError('pass exactly one of --user or --all')
+    user_ids = None if all_users else [_get_user(email).id]
+    year = datetime.date.today().year
+    start = start.date() if start else datetime.date(year, 1, 1)
+    end = end.date() if end else datetime.date(year, 12, 31)
+    mode = 'wb' if fmt == 'npz' else 'w'
+    with click.open_file(path, mode) as f:
+        for chunk in stream_export(fmt, start, end, user_ids):
+            f.write(chunk)
+
+
+def _report_drift(drift):
+    for user_id, year, field in drift:
+        click.echo(f'user {user_id} {year}: {field} drifted', err=True)
+
+
+@rollups_cli.command('verify')
+@click.option('--user', 'email', help='Only check this user.')
+def verify_command(email):
+    """Recompute the rollups from the raw logs and report any drift."""
+    drift = rollups.verify([_get_user(email).id] if email else None)
+    _report_drift(drift)
+    click.echo(f'{len(drift)} drifted rollup fields')
+    if drift:
+        raise SystemExit(1)
+
+
+@rollups_cli.command('rebuild')
+@click.option('--user', 'email', help='Only rebuild this user.')
+def rebuild_command(email):
+    """Replace the rollups with values recomputed from the raw logs."""
+    drift = rollups.rebuild([_get_user(email).id] if email else None)
+    _report_drift(drift)
+    click.echo(f'rollups rebuilt, {len(drift)} drifted fields corrected')
+
+
+@calendars_cli.command('list')
+def list_calendars_command():
+    """List the calendars with their rule count and subscribers."""
+    subscribers = dict(db.session.query(User.holiday_calendar_id, func.count(User.id)).group_by(User.holiday_calendar_id))
+    for calendar in HolidayCalendar.query.order_by(HolidayCalendar.name):
+        click.echo(f'{calendar.name}: {len(calendar.rules)} rules, version {calendar.version}, '
+                   f'{subscribers.get(calendar.id, 0)} subscribers')
+
+
+@calendars_cli.command('show')
+@click.argument('name')
+@click.option('--year', type=int, help='Defaults to this year.')
+def show_calendar_command(name, year):
+    """Print the holidays a calendar generates for a year."""
+    calendar = HolidayCalendar.query.filter_by(name=name).first()
+    if not calendar:
+        raise click.BadParameter(f'no calendar named {name}', param_hint='NAME')
+    year = year or datetime.date.today().year
+    days = calendars.calendar_year(calendar.id, calendar.version, calendar.rules, year)
+    for date, holiday in zip(days.dates, days.names):
+        click.echo(f'{date.isoformat()}  {date.strftime("%a")}  {holiday}')
+
+
+@calendars_cli.command('load')
+@click.argument('name')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+def load_calendar_command(name, path):
+    """Create a calendar or replace its rules from a JSON list of rules."""
+    with click.open_file(path) as f:
+        try:
+            rules = json.load(f)
+            calendar = calendars.save_calendar(name, rules)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='PATH')
+    click.echo(f'{calendar.name}: {len(rules)} rules, version {calendar.version}')
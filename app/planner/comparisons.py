@@ -0,0 +1,156 @@
+import datetime
+import numpy as np
+from sqlalchemy import and_, or_
+from .. import db
+from ..models import DailyLog
+from .analytics import _avg_workdays, _total, percent_change
+from .plans import load_plan
+from .ranges import MAX_RANGE_DAYS
+
+# Multi-period comparisons.
+# A comparison is a list of named periods, e.g. this month, the same month a
+# year earlier, the previous quarter and a custom range, reported against
+# the first one. The logs of all periods are read with one query (an OR of
+# the merged ranges, so periods years apart do not read the years between)
+# and cut into per-period slices with one searchsorted over the sorted
+# dates; targets come from the cached YearLedgers. Each further period
+# costs a few array slices, not a query.
+
+MAX_PERIODS = 8
+
+
+class Period:
+    __slots__ = ('name', 'start', 'end')
+
+    def __init__(self, name, start, end):
+        if end < start:
+            raise ValueError(f'{name}: end must not be before start')
+        if (end - start).days >= MAX_RANGE_DAYS:
+            raise ValueError(f'{name}: periods are limited to {MAX_RANGE_DAYS} days')
+        self.name = name
+        self.start = start
+        self.end = end
+
+    @property
+    def days(self):
+        return (self.end - self.start).days + 1
+
+
+def shift_years(day, years):
+    # The same calendar day `years` later; February 29 becomes February 28
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:
+        return day.replace(year=day.year + years, day=28)
+
+
+def standard_periods(start, end):
+    """start..end, the same days a year earlier and the quarter before the one start falls in."""
+    quarter = datetime.date(start.year, 3 * ((start.month - 1) // 3) + 1, 1)
+    previous = datetime.date(quarter.year - (quarter.month == 1), (quarter.month - 4) % 12 + 1, 1)
+    return [
+        Period('current', start, end),
+        Period('last_year', shift_years(start, -1), shift_years(end, -1)),
+        Period('previous_quarter', previous, quarter - datetime.timedelta(days=1)),
+    ]
+
+
+def _merged(periods):
+    # The periods' ranges with overlapping and adjacent ones joined
+    merged = []
+    for start, end in sorted((p.start, p.end) for p in periods):
+        if merged and start <= merged[-1][1] + datetime.timedelta(days=1):
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def load_period_logs(user_id, periods):
+    # One query for the logs of every period, as date-sorted (datetime64[D], float64) arrays
+    ranges = _merged(periods)
+    rows = db.session.query(DailyLog.date, DailyLog.hours).filter(
+        DailyLog.user_id == user_id,
+        or_(*(and_(DailyLog.date >= start, DailyLog.date <= end) for start, end in ranges))
+    ).order_by(DailyLog.date).all()
+    dates = np.array([r[0] for r in rows], dtype='datetime64[D]')
+    hours = np.array([r[1] for r in rows], dtype=np.float64)
+    return dates, hours
+
+
+def _targets(period, ledgers):
+    # (target, planned) arrays over the period's days from the ledgers of the years it spans
+    target = np.zeros(period.days)
+    planned = np.zeros(period.days, dtype=bool)
+    for year in range(period.start.year, period.end.year + 1):
+        ledger = ledgers.get(year)
+        if ledger is None:
+            continue
+        lo, hi = max(period.start, ledger.origin), min(period.end, datetime.date(year, 12, 31))
+        src = ledger.range(lo, hi)
+        dst = slice((lo - period.start).days, (hi - period.start).days + 1)
+        target[dst] = ledger.targets(src)
+        planned[dst] = ledger.planned_mask(src)
+    return target, planned
+
+
+def compare_periods(user_id, periods, series=False):
+    """Totals, averages and changes against the first period for each period.
+
+    series adds each period's daily actuals and cumulative actual and target.
+    """
+    if not periods:
+        raise ValueError('at least one period is required')
+    if len(periods) > MAX_PERIODS:
+        raise ValueError(f'at most {MAX_PERIODS} periods')
+    if len({p.name for p in periods}) != len(periods):
+        raise ValueError('period names must be unique')
+    log_dates, log_hours = load_period_logs(user_id, periods)
+    years = {y for p in periods for y in range(p.start.year, p.end.year + 1)}
+    ledgers = {}
+    for year in sorted(years):
+        cached = load_plan(user_id, year)
+        if cached:
+            ledgers[year] = cached['ledger']
+
+    # Every period's slice of the sorted logs at once
+    starts = np.array([p.start for p in periods], dtype='datetime64[D]')
+    ends = np.array([p.end for p in periods], dtype='datetime64[D]')
+    lo = np.searchsorted(log_dates, starts, side='left')
+    hi = np.searchsorted(log_dates, ends, side='right')
+
+    results = []
+    for period, first, last, origin in zip(periods, lo.tolist(), hi.tolist(), starts):
+        actual = np.zeros(period.days)
+        actual[(log_dates[first:last] - origin).astype(np.int64)] = log_hours[first:last]
+        target, planned = _targets(period, ledgers)
+        weekdays = np.is_busday(origin + np.arange(period.days))
+        actual_total, target_total = _total(actual), _total(target[planned])
+        logged_days = last - first
+        result = {
+            'name': period.name,
+            'start': period.start.isoformat(),
+            'end': period.end.isoformat(),
+            'days': period.days,
+            'actual': actual_total,
+            'target': target_total,
+            'progress': round(actual_total / target_total * 100, 1) if target_total else 0,
+            'loggedDays': logged_days,
+            'plannedDays': int(np.count_nonzero(planned)),
+            'avgPerWorkday': _avg_workdays(actual, weekdays, 0, period.days),
+            'avgPerLoggedDay': actual_total / logged_days if logged_days else 0,
+        }
+        if series:
+            result['series'] = {
+                'actual': actual.tolist(),
+                'cumActual': np.cumsum(actual).tolist(),
+                'cumTarget': np.cumsum(target).tolist(),
+            }
+        results.append(result)
+
+    base = results[0]
+    for result in results:
+        result['change'] = None if result is base else {
+            key: percent_change(base[key], result[key]) for key in ('actual', 'avgPerWorkday', 'progress')
+        }
+    return {'base': base['name'], 'periods': results}
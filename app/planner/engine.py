@@ -0,0 +1,132 @@
+import numpy as np
+
+# Calendar/plan engine built on numpy datetime64[D] arrays.
+# A year is represented as one array of days plus boolean masks for weekends,
+# holidays and vacation, so the plan is computed with array operations instead
+# of per-day Python loops.
+
+MONTHS = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December"
+]
+
+MAX_DAILY_HOURS = 10
+
+
+def _to_datetime64(dates):
+    # Accepts model rows with a .date attribute, datetime.date objects or ISO strings
+    values = [getattr(d, 'date', d) for d in dates]
+    return np.array(values, dtype='datetime64[D]')
+
+
+def year_days(year):
+    start = np.datetime64(f'{year:04d}-01-01', 'D')
+    end = np.datetime64(f'{year + 1:04d}-01-01', 'D')
+    return np.arange(start, end, dtype='datetime64[D]')
+
+
+def month_index(days):
+    # 0-based month (0=January) for each day in the array
+    return days.astype('datetime64[M]').astype(np.int64) % 12
+
+
+def working_day_mask(days, holidays, vacation_days, calendar_mask=None):
+    # True for Mon-Fri days that are neither holidays nor vacation;
+    # calendar_mask marks further holidays, aligned with days (a shared calendar's bitmap)
+    weekday = np.is_busday(days)
+    holiday_mask = np.isin(days, _to_datetime64(holidays))
+    if calendar_mask is not None:
+        holiday_mask |= calendar_mask
+    vacation_mask = np.isin(days, _to_datetime64(vacation_days))
+    return weekday & ~holiday_mask & ~vacation_mask
+
+
+class YearPlan:
+    """Plan for one year as aligned arrays.
+
+    days: datetime64[D] array of every day in the year
+    workdays: boolean mask of working days
+    planned: working days that carry a target (months weighted 0 are left out)
+    daily_targets: target hours per day (0 on unplanned days)
+    monthly_targets: list of 12 monthly targets, in MONTHS order
+    """
+    __slots__ = ('year', 'days', 'workdays', 'planned', 'daily_targets', 'monthly_targets')
+
+    def __init__(self, year, days, workdays, planned, daily_targets, monthly_targets):
+        self.year = year
+        self.days = days
+        self.workdays = workdays
+        self.planned = planned
+        self.daily_targets = daily_targets
+        self.monthly_targets = monthly_targets
+
+    def working_dates(self):
+        return self.days[self.workdays].tolist()
+
+    def as_dict(self):
+        # {datetime.date: hours} for planned days, as returned by generate_plan
+        return dict(zip(self.days[self.planned].tolist(), self.daily_targets[self.planned].tolist()))
+
+
+def compute_year_plan(year, annual_goal, workload_weights, holidays, vacation_days, calendar_mask=None):
+    days = year_days(year)
+    workdays = working_day_mask(days, holidays, vacation_days, calendar_mask)
+    months = month_index(days)
+    counts = np.bincount(months[workdays], minlength=12)
+
+    weights = np.array([workload_weights.get(m, 1.0) for m in MONTHS], dtype=np.float64)
+    weighted = counts * weights
+    # Sequential accumulation keeps the total bit-identical to the original loop
+    total_weighted = np.cumsum(weighted)[-1]
+
+    monthly_targets = []
+    month_daily = np.zeros(12, dtype=np.float64)
+    for i in range(12):
+        if weighted[i] == 0:
+            monthly_targets.append(0)
+            continue
+        month_goal = (float(weighted[i]) / float(total_weighted)) * annual_goal
+        daily_target = month_goal / int(counts[i]) if counts[i] else 0
+        if daily_target > MAX_DAILY_HOURS:
+            daily_target = MAX_DAILY_HOURS
+        month_daily[i] = round(daily_target, 2)
+        monthly_targets.append(round(month_goal, 1))
+
+    planned = workdays & (weighted != 0)[months]
+    daily_targets = np.where(planned, month_daily[months], 0.0)
+    return YearPlan(year, days, workdays, planned, daily_targets, monthly_targets)
+
+
+def compute_year_plans(year, annual_goals, weights, off_users, off_days, holiday_masks=None):
+    """Plans for many users at once, as (users x days) matrices.
+
+    annual_goals: (U,) goals; weights: (U, 12) monthly weights;
+    off_users/off_days: parallel index arrays of holiday and vacation days
+    (row in annual_goals, day of year starting at 0);
+    holiday_masks: optional (U, days) boolean matrix of further holidays.
+    Returns (days, planned, daily_targets, monthly_targets). Targets follow
+    compute_year_plan; rounding is done with numpy, which can differ from the
+    builtin round() by 0.01 on exact ties.
+    """
+    days = year_days(year)
+    months = month_index(days)
+    annual_goals = np.asarray(annual_goals, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64).reshape(len(annual_goals), 12)
+    workdays = np.repeat(np.is_busday(days)[None, :], len(annual_goals), axis=0)
+    if holiday_masks is not None:
+        workdays &= ~holiday_masks
+    workdays[np.asarray(off_users, dtype=np.int64), np.asarray(off_days, dtype=np.int64)] = False
+
+    month_starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    counts = np.add.reduceat(workdays, month_starts, axis=1).astype(np.float64)
+    weighted = counts * weights
+    total_weighted = np.cumsum(weighted, axis=1)[:, -1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        month_goal = np.where(weighted != 0, weighted / total_weighted * annual_goals[:, None], 0.0)
+        daily = np.where(counts > 0, month_goal / counts, 0.0)
+    daily = np.round(np.minimum(daily, MAX_DAILY_HOURS), 2)
+    monthly_targets = np.round(month_goal, 1)
+
+    planned = workdays & (weighted != 0)[:, months]
+    daily_targets = np.where(planned, daily[:, months], 0.0)
+    return days, planned, daily_targets, monthly_targets
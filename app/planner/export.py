@@ -0,0 +1,174 @@
+import csv
+import io
+import json
+import zipfile
+import numpy as np
+from .. import db
+from ..database import replica_reads
+from ..models import DailyLog, User
+from .plans import load_plan
+
+# Streaming export of plan-versus-actual rows.
+# Logs are read with yield_per (a server-side cursor on PostgreSQL) ordered by
+# (user_id, date) and merged with each user's cached plan, so memory stays flat
+# however many users or years are exported.
+# The columnar format is a .npz archive written as row groups: every group of
+# ROW_GROUP_SIZE rows is stored as its own set of column arrays.
+# Logs are read from the read replica when one is configured.
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'npz': ('application/octet-stream', 'npz'),
+}
+COLUMNS = ('user_id', 'date', 'target', 'actual')
+YIELD_PER = 2000
+TEXT_BATCH = 1000
+ROW_GROUP_SIZE = 65536
+
+
+def _plan_items(user_id, start, end):
+    # Sorted (date, target) pairs of the user's plans that fall inside the range
+    items = []
+    for year in range(start.year, end.year + 1):
+        cached = load_plan(user_id, year)
+        if cached:
+            ledger = cached['ledger']
+            items.extend(zip(*ledger.planned_dates(ledger.range(start, end))))
+    items.sort()
+    return items
+
+
+def _merge(user_id, plan_items, logs):
+    # Merge two date-sorted sequences into (user_id, date, target, actual) rows
+    i = 0
+    for date, hours in logs:
+        while i < len(plan_items) and plan_items[i][0] < date:
+            yield user_id, plan_items[i][0], plan_items[i][1], None
+            i += 1
+        if i < len(plan_items) and plan_items[i][0] == date:
+            yield user_id, date, plan_items[i][1], hours
+            i += 1
+        else:
+            yield user_id, date, None, hours
+    for date, target in plan_items[i:]:
+        yield user_id, date, target, None
+
+
+def iter_rows(start, end, user_ids=None):
+    """Yield (user_id, date, target, actual) for every day with a target or a log.
+
+    user_ids=None exports every user. target/actual are None when the day has
+    no plan entry or no log.
+    """
+    if user_ids is None:
+        user_ids = [uid for (uid,) in db.session.query(User.id).order_by(User.id)]
+    logs = db.session.query(DailyLog.user_id, DailyLog.date, DailyLog.hours).filter(
+        DailyLog.date >= start,
+        DailyLog.date <= end
+    )
+    if len(user_ids) == 1:
+        logs = logs.filter(DailyLog.user_id == user_ids[0])
+    logs = iter(logs.order_by(DailyLog.user_id, DailyLog.date).yield_per(YIELD_PER))
+    pending = next(logs, None)
+    for user_id in sorted(user_ids):
+        # Skip logs of users that are not being exported
+        while pending is not None and pending[0] < user_id:
+            pending = next(logs, None)
+        user_logs = []
+        while pending is not None and pending[0] == user_id:
+            user_logs.append((pending[1], pending[2]))
+            pending = next(logs, None)
+        yield from _merge(user_id, _plan_items(user_id, start, end), user_logs)
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_csv(rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    for batch in _batches(rows, TEXT_BATCH):
+        writer.writerows((u, d.isoformat(), '' if t is None else t, '' if a is None else a) for u, d, t, a in batch)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def stream_ndjson(rows):
+    for batch in _batches(rows, TEXT_BATCH):
+        yield ''.join(
+            json.dumps({'user_id': u, 'date': d.isoformat(), 'target': t, 'actual': a}) + '\n'
+            for u, d, t, a in batch
+        )
+
+
+class _ChunkSink:
+    # Write-only file object; zipfile falls back to streaming mode when tell/seek are missing
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_npz(rows, row_group_size=ROW_GROUP_SIZE):
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for group, batch in enumerate(_batches(rows, row_group_size)):
+            columns = {
+                'user_id': np.fromiter((r[0] for r in batch), dtype=np.int32, count=len(batch)),
+                'date': np.array([r[1] for r in batch], dtype='datetime64[D]'),
+                'target': np.fromiter((np.nan if r[2] is None else r[2] for r in batch), dtype=np.float32, count=len(batch)),
+                'actual': np.fromiter((np.nan if r[3] is None else r[3] for r in batch), dtype=np.float32, count=len(batch)),
+            }
+            for name, values in columns.items():
+                with zf.open(f'rg{group:05d}/{name}.npy', 'w', force_zip64=True) as member:
+                    np.lib.format.write_array(member, values, allow_pickle=False)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _on_replica(chunks):
+    # The logs are read while the response streams, so routing has to wrap the iteration
+    with replica_reads():
+        yield from chunks
+
+
+def stream_export(fmt, start, end, user_ids=None):
+    rows = iter_rows(start, end, user_ids)
+    if fmt == 'csv':
+        return _on_replica(stream_csv(rows))
+    if fmt == 'ndjson':
+        return _on_replica(stream_ndjson(rows))
+    if fmt == 'npz':
+        return _on_replica(stream_npz(rows))
+    raise ValueError(f'Unsupported export format: {fmt}')
+
+
+def read_npz(path_or_file):
+    """Load a columnar export back into one array per column."""
+    with np.load(path_or_file, allow_pickle=False) as archive:
+        groups = sorted({key.split('/')[0] for key in archive.files})
+        return {name: np.concatenate([archive[f'{g}/{name}'] for g in groups]) if groups else np.array([])
+                for name in COLUMNS}
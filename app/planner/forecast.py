@@ -0,0 +1,178 @@
+import datetime
+import numpy as np
+from .plans import load_plan
+from .ranges import load_range
+
+# Monte Carlo year-end forecasts.
+# A user's logging habit is the empirical distribution of hours logged over
+# hours planned on each planned day of the year so far, skipped days
+# included as 0. Each remaining planned day of a path draws one of those
+# ratios and scales it by the day's target. The targets carry the workload
+# weights, holidays and vacations, so the paths follow the plan's
+# seasonality and the spread of past days.
+# The draws for all paths form one (days x users x paths) matrix, built
+# block by block to bound memory. Running sums over the days give the
+# year-end totals, and the first day a path's running sum reaches the goal
+# gives the date. Users with fewer than MIN_HISTORY_DAYS of history are
+# assumed to log exactly their targets.
+
+DEFAULT_PATHS = 10000
+FIRM_PATHS = 1000
+MAX_PATHS = 50000
+MIN_HISTORY_DAYS = 10
+BLOCK_ELEMENTS = 1 << 21  # Draws per block; about 30 MB of working arrays
+PERCENTILES = (10, 50, 90)
+
+
+class Forecast:
+    """Year-end forecasts of several users as parallel arrays (one entry per user).
+
+    p10/p50/p90 are year-end totals; goal_day is the position in the
+    user's remaining planned days at which the median path reaches the goal,
+    -1 when it does not and None when the goal is already met.
+    """
+
+    __slots__ = ('paths', 'history_days', 'probability', 'p10', 'p50', 'p90', 'goal_day')
+
+    def __init__(self, paths, history_days, probability, p10, p50, p90, goal_day):
+        self.paths = paths
+        self.history_days = history_days
+        self.probability = probability
+        self.p10 = p10
+        self.p50 = p50
+        self.p90 = p90
+        self.goal_day = goal_day
+
+    def summary(self, i, remaining_dates):
+        goal_day = self.goal_day[i]
+        return {
+            'paths': self.paths,
+            'historyDays': int(self.history_days[i]),
+            'probability': round(float(self.probability[i]), 3),
+            'p10': round(float(self.p10[i]), 1),
+            'p50': round(float(self.p50[i]), 1),
+            'p90': round(float(self.p90[i]), 1),
+            'goalMet': goal_day is None,
+            'goalDate': remaining_dates[goal_day].isoformat() if goal_day is not None and goal_day >= 0 else None,
+        }
+
+
+def _pad(rows, fill=0.0):
+    # Ragged 1-D arrays as one float32 matrix, with their lengths
+    lengths = np.array([len(r) for r in rows], dtype=np.int64)
+    matrix = np.full((len(rows), max(lengths.max(initial=0), 1)), fill, dtype=np.float32)
+    for i, row in enumerate(rows):
+        matrix[i, :len(row)] = row
+    return matrix, lengths
+
+
+def simulate(targets, ratios, counts, need, paths, rng):
+    """Remaining hours and goal-reaching days of `paths` paths per user.
+
+    targets: (users x days) remaining planned targets in date order, 0 past
+    a user's last day; ratios: (users x history) with counts[u] valid entries
+    per row, each at least 1; need: (users,) hours still to log.
+    Returns (totals, reach), both (users x paths); reach is the position of
+    the day the running sum reaches need, or `days` when it never does.
+    """
+    users, days = targets.shape
+    totals = np.zeros((users, paths))
+    reach = np.full((users, paths), days, dtype=np.int32)
+    if not users or not days:
+        return totals, reach
+    by_day = np.ascontiguousarray(targets.T)
+    flat = ratios.ravel()
+    offsets = np.arange(users, dtype=np.intp)[:, None] * ratios.shape[1]
+    counts = counts.astype(np.intp)[:, None]
+    path_block = min(paths, max(BLOCK_ELEMENTS // days, 1))
+    user_block = max(BLOCK_ELEMENTS // (path_block * days), 1)
+    for u0 in range(0, users, user_block):
+        u1 = min(u0 + user_block, users)
+        goal = need[u0:u1, None]
+        for p0 in range(0, paths, path_block):
+            p1 = min(p0 + path_block, paths)
+            shape = (days, u1 - u0, p1 - p0)
+            # 16 random bits per draw, mapped onto 0..count-1 by a multiply and shift; no entry is
+            # drawn more than count / 65536 more or less often than the others
+            index = np.frombuffer(rng.bytes(2 * int(np.prod(shape))), dtype=np.uint16).reshape(shape).astype(np.intp)
+            index *= counts[u0:u1]
+            index >>= 16
+            index += offsets[u0:u1]
+            hours = flat.take(index)
+            hours *= by_day[:, u0:u1, None]
+            # Day by day over all paths at once: the running totals and the days still short of the goal
+            running = np.zeros(shape[1:])
+            short = np.zeros(shape[1:], dtype=np.int32)
+            for day in hours:
+                running += day
+                short += running < goal
+            totals[u0:u1, p0:p1] = running
+            reach[u0:u1, p0:p1] = short
+    return totals, reach
+
+
+def forecast(actual, goals, histories, remaining, paths=DEFAULT_PATHS, rng=None):
+    """Forecast of each user's year-end total.
+
+    actual: (users,) hours logged so far; goals: (users,) annual goals;
+    histories: per user, the hours/target ratios of the planned days so far;
+    remaining: per user, the targets of the planned days still to come.
+    """
+    if not 1 <= paths <= MAX_PATHS:
+        raise ValueError(f'paths must be from 1 to {MAX_PATHS}')
+    rng = rng if rng is not None else np.random.default_rng()
+    actual = np.asarray(actual, dtype=np.float64)
+    goals = np.asarray(goals, dtype=np.float64)
+    history_days = np.array([len(h) for h in histories], dtype=np.int64)
+    histories = [h if len(h) >= MIN_HISTORY_DAYS else np.ones(1) for h in histories]
+    ratios, counts = _pad(histories)
+    targets, _ = _pad(remaining)
+    need = goals - actual
+    totals, reach = simulate(targets, ratios, counts, need, paths, rng)
+    final = actual[:, None] + totals
+    p10, p50, p90 = np.percentile(final, PERCENTILES, axis=1)
+    # The median path's day, with "never" (position `days`) sorted last
+    never = targets.shape[1]
+    middle = np.partition(reach, (paths - 1) // 2, axis=1)[:, (paths - 1) // 2]
+    goal_day = [None if n <= 0 else (int(m) if m < never else -1) for n, m in zip(need.tolist(), middle.tolist())]
+    return Forecast(paths, history_days, np.mean(final >= goals[:, None], axis=1), p10, p50, p90, goal_day)
+
+
+def split_year(targets, planned, actual, done):
+    """(history ratios, remaining targets, remaining positions) of one user's year arrays.
+
+    The first `done` days are over; the last of them may be partly logged
+    and is left out of the history.
+    """
+    seen = max(done - 1, 0)
+    past = planned[:seen] & (targets[:seen] > 0)
+    ahead = np.flatnonzero(planned[done:]) + done
+    return actual[:seen][past] / targets[:seen][past], targets[ahead], ahead
+
+
+def year_forecast(user_id, today, paths=DEFAULT_PATHS, seed=None, version=None):
+    """Forecast of the user's total for today's year, or None without a plan.
+
+    Logs up to and including today count as done. Today itself is not part
+    of the history, since it may still be partly logged. The generator is
+    seeded by user and day unless `seed` is given, so a day's forecast does
+    not move between page loads.
+    """
+    cached = load_plan(user_id, today.year, version)
+    if not cached:
+        return None
+    start = datetime.date(today.year, 1, 1)
+    plan = load_range(user_id, start, datetime.date(today.year, 12, 31), version=version)
+    done = (today - start).days + 1
+    history, remaining, ahead = split_year(plan.targets, plan.planned, plan.actual, done)
+    actual = float(plan.actual[:done].sum())
+    rng = np.random.default_rng(seed if seed is not None else [user_id, today.toordinal()])
+    result = forecast([actual], [cached['annual_goal']], [history], [remaining], paths, rng)
+    return {
+        'year': today.year,
+        'asOf': today.isoformat(),
+        'annualGoal': cached['annual_goal'],
+        'actual': round(actual, 1),
+        'remainingDays': len(ahead),
+        **result.summary(0, plan.days[ahead].tolist()),
+    }
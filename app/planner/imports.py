@@ -0,0 +1,194 @@
+import csv
+import datetime
+import io
+import json
+import math
+from itertools import islice
+from sqlalchemy import bindparam, select
+from .. import db
+from ..models import DailyLog
+from .rollups import record_changes
+from .versions import bump_data_version
+
+# Bulk time-entry import.
+# Rows are (date, hours[, matter]) read from CSV or NDJSON as a stream, validated
+# in chunks and upserted into daily_log with one statement per chunk.
+# Billing exports have one row per matter, so rows for the same day are summed:
+# the first chunk that touches a day replaces the stored value, later chunks add to it.
+# The rollups are updated from the chunk's old and new values in the same transaction.
+
+CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+MAX_DAILY_HOURS = 24
+
+
+class ImportResult:
+    __slots__ = ('rows_read', 'rows_imported', 'days_written', 'errors', 'error_count')
+
+    def __init__(self):
+        self.rows_read = 0
+        self.rows_imported = 0
+        self.days_written = 0
+        self.errors = []
+        self.error_count = 0
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        return {
+            'rows_read': self.rows_read,
+            'rows_imported': self.rows_imported,
+            'days_written': self.days_written,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'errors_truncated': self.error_count > len(self.errors),
+        }
+
+
+def detect_format(filename=None, content_type=None):
+    name = (filename or '').lower()
+    ctype = (content_type or '').lower()
+    if name.endswith(('.ndjson', '.jsonl', '.json')) or 'ndjson' in ctype or 'json' in ctype:
+        return 'ndjson'
+    return 'csv'
+
+
+def iter_rows(stream, fmt):
+    # Yields (line_number, row) pairs from a binary (or text) file object;
+    # row is a dict, or None for an unparseable line
+    text = stream if isinstance(stream, io.TextIOBase) else io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        if reader.fieldnames:
+            reader.fieldnames = [f.strip().lower() for f in reader.fieldnames]
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'ndjson':
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_no, None
+                continue
+            yield line_no, row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f'Unsupported import format: {fmt}')
+
+
+def validate_row(row):
+    # Returns (date, hours) or raises ValueError with a message for the caller's error report
+    if row is None:
+        raise ValueError('unparseable row')
+    raw_date = row.get('date')
+    raw_hours = row.get('hours')
+    if raw_date in (None, ''):
+        raise ValueError('missing date')
+    if raw_hours in (None, ''):
+        raise ValueError('missing hours')
+    try:
+        date = datetime.date.fromisoformat(str(raw_date).strip())
+    except ValueError:
+        raise ValueError(f'invalid date {raw_date!r}, expected YYYY-MM-DD')
+    if isinstance(raw_hours, bool):
+        # JSON true/false would otherwise pass as 1.0/0.0
+        raise ValueError(f'invalid hours {raw_hours!r}')
+    try:
+        hours = float(raw_hours)
+    except (TypeError, ValueError):
+        raise ValueError(f'invalid hours {raw_hours!r}')
+    # NaN and infinities ('nan', 'inf' or 1e400 in a CSV) would poison the rollup sums
+    if not math.isfinite(hours) or hours < 0 or hours > MAX_DAILY_HOURS:
+        raise ValueError(f'hours must be between 0 and {MAX_DAILY_HOURS}')
+    return date, hours
+
+
+def _existing_hours(user_id, dates):
+    if not dates:
+        return {}
+    table = DailyLog.__table__
+    return dict(db.session.execute(
+        select(table.c.date, table.c.hours).where(table.c.user_id == user_id, table.c.date.in_(list(dates)))
+    ).all())
+
+
+def _upsert(user_id, hours_by_date, accumulate, existing):
+    # existing: the stored hours of the chunk's dates, from _existing_hours()
+    rows = [{'user_id': user_id, 'date': d, 'hours': h} for d, h in hours_by_date.items()]
+    if not rows:
+        return
+    table = DailyLog.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        new_hours = table.c.hours + stmt.excluded.hours if accumulate else stmt.excluded.hours
+        stmt = stmt.on_conflict_do_update(index_elements=['user_id', 'date'],
+                                          set_={'hours': new_hours, 'version': table.c.version + 1})
+        db.session.execute(stmt, rows)
+        return
+    # Generic fallback: executemany updates and inserts
+    updates = [{'b_date': r['date'], 'b_hours': r['hours'] + (existing[r['date']] if accumulate else 0)}
+               for r in rows if r['date'] in existing]
+    inserts = [r for r in rows if r['date'] not in existing]
+    if updates:
+        db.session.execute(
+            table.update().where(table.c.user_id == user_id, table.c.date == bindparam('b_date'))
+            .values(hours=bindparam('b_hours'), version=table.c.version + 1),
+            updates
+        )
+    if inserts:
+        db.session.execute(table.insert(), inserts)
+
+
+def import_logs(user_id, stream, fmt='csv', chunk_size=CHUNK_SIZE):
+    """Stream rows from a CSV/NDJSON file object into the user's daily logs.
+
+    Invalid rows are reported in the result and skipped; every valid chunk is
+    committed on its own, so one bad row never aborts the import.
+    """
+    result = ImportResult()
+    written_dates = set()
+    rows = iter_rows(stream, fmt)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        fresh = {}
+        repeat = {}
+        valid = 0
+        for line_no, row in chunk:
+            result.rows_read += 1
+            try:
+                date, hours = validate_row(row)
+            except ValueError as e:
+                result.add_error(line_no, str(e))
+                continue
+            target = repeat if date in written_dates else fresh
+            target[date] = target.get(date, 0) + hours
+            valid += 1
+        try:
+            existing = _existing_hours(user_id, fresh.keys() | repeat.keys())
+            _upsert(user_id, fresh, accumulate=False, existing=existing)
+            _upsert(user_id, repeat, accumulate=True, existing=existing)
+            record_changes(
+                [(user_id, d, existing.get(d), h) for d, h in fresh.items()] +
+                [(user_id, d, existing.get(d), existing.get(d, 0) + h) for d, h in repeat.items()]
+            )
+            bump_data_version(user_id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            result.add_error(chunk[0][0], f'chunk ending at line {chunk[-1][0]} not saved: {e}')
+            continue
+        written_dates.update(fresh)
+        result.rows_imported += valid
+        result.days_written += len(fresh)
+    return result
@@ -0,0 +1,173 @@
+import datetime
+import struct
+from calendar import isleap
+from functools import lru_cache
+import numpy as np
+from .engine import year_days
+
+# Compact per-year plan representation.
+# A YearLedger holds one user's year as day-of-year arrays: float32 targets,
+# packed bitmasks of working and planned days and, when loaded, float64
+# actuals. That is about 1.6 KB a year instead of a {date: float} dict of
+# several hundred entries, and a day, month or range is an index or a slice.
+# Targets are planned in hundredths of an hour, which float32 holds exactly
+# enough that rounding back to two decimals restores the original float64
+# values, so totals and rendered targets come out unchanged. Logged hours
+# are arbitrary, so actuals stay float64.
+# to_bytes() is the cache format; from_bytes() wraps the buffer without
+# copying, so ledgers read back from a cache are read-only.
+# Each instance unpacks once, when it is built: the float64 targets and the
+# boolean masks are kept alongside the compact arrays, so lookups and totals
+# index them directly and sum in float64.
+
+TARGET_DECIMALS = 2
+_MAGIC = b'YLG1'
+_HEADER = struct.Struct('<4sHB9x')  # Magic, year, flags; 16 bytes keeps the arrays aligned
+_HAS_ACTUAL = 1
+
+
+def _frozen(array):
+    array.flags.writeable = False
+    return array
+
+
+@lru_cache(maxsize=64)
+def month_bounds(year):
+    # Day-of-year offsets where each month starts, plus the year's length
+    first = datetime.date(year, 1, 1)
+    return tuple((datetime.date(year, m, 1) - first).days for m in range(1, 13)) + (365 + isleap(year),)
+
+
+class YearLedger:
+    """One year of a plan, and optionally its actuals, indexed by day of year (0 = January 1)."""
+
+    __slots__ = ('year', 'origin', 'target', 'workdays', 'planned', 'actual',
+                 '_targets', '_workday_mask', '_planned_mask', '_total')
+
+    def __init__(self, year, target, workdays, planned, actual=None):
+        self.year = year
+        self.origin = datetime.date(year, 1, 1)
+        self.target = target  # float32
+        self.workdays = workdays  # Packed bits, little-endian
+        self.planned = planned  # Packed bits, little-endian
+        self.actual = actual  # float64 or None
+        # Unpacked once; read-only, since targets() and the masks hand out views
+        self._targets = _frozen(np.round(target.astype(np.float64), TARGET_DECIMALS))
+        self._workday_mask = _frozen(np.unpackbits(workdays, count=len(target), bitorder='little').view(bool))
+        self._planned_mask = _frozen(np.unpackbits(planned, count=len(target), bitorder='little').view(bool))
+        self._total = None
+
+    @classmethod
+    def from_year_plan(cls, year_plan):
+        return cls(year_plan.year, year_plan.daily_targets.astype(np.float32),
+                   np.packbits(year_plan.workdays, bitorder='little'),
+                   np.packbits(year_plan.planned, bitorder='little'))
+
+    def __len__(self):
+        return len(self.target)
+
+    # Indexing
+
+    def index(self, day):
+        """Day of year of `day`, or None outside the year."""
+        i = (day - self.origin).days
+        return i if 0 <= i < len(self.target) else None
+
+    def month(self, month):
+        bounds = month_bounds(self.year)
+        return slice(bounds[month - 1], bounds[month])
+
+    def range(self, start, end):
+        """Slice of the days from start to end, clipped to the year."""
+        n = len(self.target)
+        return slice(min(max((start - self.origin).days, 0), n), min(max((end - self.origin).days + 1, 0), n))
+
+    # Values; each takes an optional slice from month() or range()
+
+    def days(self, sl=slice(None)):
+        return year_days(self.year)[sl]
+
+    def targets(self, sl=slice(None)):
+        # float64 targets exactly as planned
+        return self._targets[sl]
+
+    def planned_mask(self, sl=slice(None)):
+        return self._planned_mask[sl]
+
+    def workday_mask(self, sl=slice(None)):
+        return self._workday_mask[sl]
+
+    def target_on(self, day):
+        """The day's target, or None when the day is not planned (like dict.get on the old plan)."""
+        i = self.index(day)
+        if i is None or not self._planned_mask[i]:
+            return None
+        return float(self._targets[i])
+
+    def total(self, sl=slice(None)):
+        # Sum of the planned targets, added in date order like sum() over the old dict; 0 when none are planned
+        if sl == slice(None):
+            if self._total is None:
+                self._total = self._sum_planned(self._targets)
+            return self._total
+        return self._sum_planned(self._targets[sl], sl)
+
+    def _sum_planned(self, values, sl=slice(None)):
+        values = values[self._planned_mask[sl]]
+        return float(np.cumsum(values)[-1]) if len(values) else 0
+
+    def actual_total(self, sl=slice(None)):
+        # Sum of the actuals on planned days, in date order like total(); needs with_actuals()
+        return self._sum_planned(self.actual[sl], sl)
+
+    def planned_days(self, sl=slice(None)):
+        return int(np.count_nonzero(self.planned_mask(sl)))
+
+    def planned_dates(self, sl=slice(None)):
+        # datetime.date objects of the planned days, with their targets
+        mask = self.planned_mask(sl)
+        return self.days(sl)[mask].tolist(), self.targets(sl)[mask].tolist()
+
+    def as_dict(self):
+        """{date: target} of the planned days, the shape generate_plan returns."""
+        return dict(zip(*self.planned_dates()))
+
+    def with_actuals(self, log_dates, log_hours):
+        """A ledger sharing this plan with actuals from datetime64[D]/float64 log arrays."""
+        actual = np.zeros(len(self.target))
+        offsets = (log_dates - np.datetime64(self.origin, 'D')).astype(np.int64)
+        inside = (offsets >= 0) & (offsets < len(self.target))
+        actual[offsets[inside]] = log_hours[inside]
+        return YearLedger(self.year, self.target, self.workdays, self.planned, actual)
+
+    # Serialization
+
+    def to_bytes(self):
+        flags = _HAS_ACTUAL if self.actual is not None else 0
+        parts = [_HEADER.pack(_MAGIC, self.year, flags)]
+        if self.actual is not None:
+            parts.append(self.actual.tobytes())
+        parts += [self.target.tobytes(), self.workdays.tobytes(), self.planned.tobytes()]
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, year, flags = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError('not a YearLedger')
+        n = month_bounds(year)[-1]
+        packed = (n + 7) // 8
+        offset = _HEADER.size
+        actual = None
+        if flags & _HAS_ACTUAL:
+            actual = np.frombuffer(data, dtype=np.float64, count=n, offset=offset)
+            offset += n * 8
+        target = np.frombuffer(data, dtype=np.float32, count=n, offset=offset)
+        offset += n * 4
+        workdays = np.frombuffer(data, dtype=np.uint8, count=packed, offset=offset)
+        planned = np.frombuffer(data, dtype=np.uint8, count=packed, offset=offset + packed)
+        return cls(year, target, workdays, planned, actual)
+
+    def __reduce__(self):
+        # Pickles (e.g. for the Redis cache backend) as the compact bytes
+        return YearLedger.from_bytes, (self.to_bytes(),)
@@ -0,0 +1,40 @@
+from ..models import BillableHourGoal, VacationDay
+from .engine import MONTHS, compute_year_plan, working_day_mask, year_days
+from .cache import plan_cache
+from .calendars import user_holiday_mask
+from .versions import data_version
+from .ledger import YearLedger
+from ..database import primary_reads
+from ..metrics import plan_timer, timed_plan
+
+def get_working_days(year, holidays, vacation_days):
+    # Returns a list of all working dates for the year, excluding weekends, holidays, and vacation
+    days = year_days(year)
+    return days[working_day_mask(days, holidays, vacation_days)].tolist()
+
+@plan_timer
+def generate_plan(goal, holidays, vacation_days, workload_weights, calendar_mask=None):
+    # calendar_mask: holidays of goal.year as a day mask, e.g. calendars.user_holiday_mask()
+    year_plan = compute_year_plan(goal.year, goal.annual_goal, workload_weights, holidays, vacation_days, calendar_mask)
+    return YearLedger.from_year_plan(year_plan).as_dict(), dict(zip(MONTHS, year_plan.monthly_targets))
+
+def load_plan(user_id, year, version=None):
+    # Cached plan for the user's goal year, or None when the setup wizard has not been completed.
+    # The plan itself is a YearLedger (see ledger.py). `version` is the user's data version when
+    # the caller has already read it (it must be read before the data), else it is read here.
+    if version is None:
+        version = data_version(user_id)
+    def compute():
+        # Read from the primary, even for a report on the replica: the plan is cached under the primary's data version
+        with primary_reads():
+            goal = BillableHourGoal.query.filter_by(user_id=user_id, year=year).first()
+            if not goal:
+                return None
+            # The shared calendar's cached bitmap with the user's own holiday overrides applied
+            holiday_mask = user_holiday_mask(user_id, year)
+            vacation_days = VacationDay.query.filter_by(user_id=user_id).all()
+        with timed_plan():
+            year_plan = compute_year_plan(year, goal.annual_goal, goal.workload_weights, (), vacation_days, holiday_mask)
+        return {'annual_goal': goal.annual_goal, 'ledger': YearLedger.from_year_plan(year_plan),
+                'monthly_targets': dict(zip(MONTHS, year_plan.monthly_targets))}
+    return plan_cache.get_or_compute(user_id, year, version, compute)
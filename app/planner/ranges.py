@@ -0,0 +1,176 @@
+import datetime
+from calendar import monthrange
+import numpy as np
+from sqlalchemy import select
+from .. import db
+from ..models import MonthlyRollup
+from .analytics import load_log_arrays
+from .plans import load_plan
+
+# Plans and actuals over any date range.
+# A range is cut at calendar-year boundaries into segments. Each segment is a
+# slice of that year's cached day arrays (load_plan), copied into one dense
+# day axis, so a three-year range costs three cache reads and one log query
+# and no year is recomputed. Fiscal years are ranges that start on the first
+# of FISCAL_YEAR_START_MONTH and are named after the calendar year they end in.
+# Totals by month or coarser periods do not need daily actuals: whole months
+# come from the monthly rollups and only the months cut by the range ends
+# from the raw logs, so the cost of a range hardly grows with its length.
+
+MAX_RANGE_DAYS = 10 * 366
+GROUPS = ('day', 'week', 'month', 'quarter', 'year', 'fiscal_year')
+DAILY_GROUPS = ('day', 'week')
+
+
+def fiscal_year_range(fiscal_year, start_month=1):
+    """First and last day of a fiscal year."""
+    if start_month == 1:
+        return datetime.date(fiscal_year, 1, 1), datetime.date(fiscal_year, 12, 31)
+    return (datetime.date(fiscal_year - 1, start_month, 1),
+            datetime.date(fiscal_year, start_month, 1) - datetime.timedelta(days=1))
+
+
+def fiscal_year_of(date, start_month=1):
+    return date.year + 1 if start_month > 1 and date.month >= start_month else date.year
+
+
+class RangePlan:
+    """Plan and actuals over [start, end] as aligned day arrays.
+
+    targets: planned hours per day (0 on unplanned days); planned: days with a
+    target; actual/logged: logged hours and number of days with a log, per
+    day when daily is True, otherwise per month on the month's first day in
+    the range; plan_years: calendar years of the range that have a plan.
+    """
+
+    __slots__ = ('start', 'end', 'days', 'targets', 'planned', 'actual', 'logged', 'daily', 'plan_years',
+                 'fiscal_start_month')
+
+    def __init__(self, start, end, fiscal_start_month=1, daily=True):
+        self.start = start
+        self.end = end
+        self.fiscal_start_month = fiscal_start_month
+        self.daily = daily
+        n = (end - start).days + 1
+        self.days = np.datetime64(start, 'D') + np.arange(n)
+        self.targets = np.zeros(n)
+        self.planned = np.zeros(n, dtype=bool)
+        self.actual = np.zeros(n)
+        self.logged = np.zeros(n, dtype=np.int64)
+        self.plan_years = []
+
+    def __len__(self):
+        return len(self.days)
+
+    def _period_keys(self, group):
+        # One integer per day, equal for the days of a period and increasing with time
+        if group == 'day':
+            return self.days.astype(np.int64)
+        if group == 'week':
+            return (self.days.astype(np.int64) + 3) // 7  # Weeks start on Monday; 1970-01-01 was a Thursday
+        months = self.days.astype('datetime64[M]').astype(np.int64)
+        if group == 'month':
+            return months
+        if group == 'quarter':
+            return months // 3
+        if group == 'year':
+            return months // 12
+        if group == 'fiscal_year':
+            return (months - (self.fiscal_start_month - 1)) // 12
+        raise ValueError(f'group must be one of {", ".join(GROUPS)}')
+
+    def _label(self, group, first):
+        if group in ('day', 'week'):
+            return first.isoformat()
+        if group == 'month':
+            return f'{first.year:04d}-{first.month:02d}'
+        if group == 'quarter':
+            return f'{first.year:04d}-Q{(first.month - 1) // 3 + 1}'
+        if group == 'year':
+            return f'{first.year:04d}'
+        return f'FY{fiscal_year_of(first, self.fiscal_start_month)}'
+
+    def totals(self, group='month'):
+        """Target and actual per period; periods cut by the range ends are partial."""
+        if group in DAILY_GROUPS and not self.daily:
+            raise ValueError(f'{group} totals need daily actuals')
+        keys = self._period_keys(group)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)] - 1
+        target = np.add.reduceat(self.targets, starts)
+        actual = np.add.reduceat(self.actual, starts)
+        planned_days = np.add.reduceat(self.planned, starts)
+        logged_days = np.add.reduceat(self.logged, starts)
+        firsts = self.days[starts].tolist()
+        lasts = self.days[ends].tolist()
+        return [{
+            'period': self._label(group, first),
+            'start': first.isoformat(),
+            'end': last.isoformat(),
+            'target': round(float(t), 2),
+            'actual': round(float(a), 2),
+            'plannedDays': int(p),
+            'loggedDays': int(l),
+        } for first, last, t, a, p, l in zip(firsts, lasts, target, actual, planned_days, logged_days)]
+
+
+def _add_logs(result, user_id, start, end):
+    log_dates, log_hours = load_log_arrays(user_id, start, end)
+    offsets = (log_dates - np.datetime64(result.start, 'D')).astype(np.int64)
+    np.add.at(result.actual, offsets, log_hours)
+    np.add.at(result.logged, offsets, 1)
+
+
+def _add_monthly_actuals(result, user_id):
+    # Whole months from the monthly rollups, booked on each month's first day;
+    # months cut by the range ends from the raw logs
+    start, end = result.start, result.end
+    first_full = start if start.day == 1 else (start.replace(day=1) + datetime.timedelta(days=31)).replace(day=1)
+    last_full = end if end.day == monthrange(end.year, end.month)[1] else end.replace(day=1) - datetime.timedelta(days=1)
+    if first_full > last_full:
+        _add_logs(result, user_id, start, end)
+        return
+    if start < first_full:
+        _add_logs(result, user_id, start, first_full - datetime.timedelta(days=1))
+    if last_full < end:
+        _add_logs(result, user_id, last_full + datetime.timedelta(days=1), end)
+    month_number = MonthlyRollup.year * 12 + MonthlyRollup.month
+    for year, month, hours, days in db.session.execute(
+            select(MonthlyRollup.year, MonthlyRollup.month, MonthlyRollup.hours, MonthlyRollup.days)
+            .where(MonthlyRollup.user_id == user_id,
+                   month_number >= first_full.year * 12 + first_full.month,
+                   month_number <= last_full.year * 12 + last_full.month)):
+        offset = (datetime.date(year, month, 1) - start).days
+        result.actual[offset] += hours
+        result.logged[offset] += days
+
+
+def load_range(user_id, start, end, fiscal_start_month=1, daily=True, version=None):
+    """RangePlan of the user's cached year plans and logged hours from start to end.
+
+    daily=False reads actuals by month (enough for month, quarter and year
+    totals). version is the user's data version, if already read (see
+    load_plan). Raises ValueError for an empty or overlong range.
+    """
+    if end < start:
+        raise ValueError('end must not be before start')
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise ValueError(f'ranges are limited to {MAX_RANGE_DAYS} days')
+    result = RangePlan(start, end, fiscal_start_month, daily)
+    for year in range(start.year, end.year + 1):
+        cached = load_plan(user_id, year, version)
+        if not cached:
+            continue
+        result.plan_years.append(year)
+        year_start = datetime.date(year, 1, 1)
+        # Overlap of the range and the year, as offsets into each
+        lo, hi = max(start, year_start), min(end, datetime.date(year, 12, 31))
+        src = slice((lo - year_start).days, (hi - year_start).days + 1)
+        dst = slice((lo - start).days, (hi - start).days + 1)
+        result.targets[dst] = cached['ledger'].targets(src)
+        result.planned[dst] = cached['ledger'].planned_mask(src)
+    if daily:
+        _add_logs(result, user_id, start, end)
+    else:
+        _add_monthly_actuals(result, user_id)
+    return result
@@ -0,0 +1,280 @@
+import datetime
+from calendar import monthrange
+import numpy as np
+from sqlalchemy import func, select, tuple_, union
+from .. import db
+from ..models import BillableHourGoal, DailyLog, Holiday, HolidayCalendar, MonthlyRollup, User, VacationDay
+from .calendars import calendar_year
+from .engine import MONTHS, compute_year_plans, month_index, year_days
+from .forecast import forecast, split_year
+
+# Firm-wide reporting.
+# Every user's plan for the year is computed as one (users x days) matrix and
+# actuals come from the monthly rollups (plus one GROUP BY for a partial month),
+# so a report costs a fixed handful of queries however many users the firm has.
+# Actuals count planned days only, as on the dashboard and in the API, so the
+# logs that can fall outside a plan (weekends, holidays, vacation days) are
+# read as well and the ones on unplanned days are taken off the monthly sums.
+# With forecast_paths, one more query reads the year's daily logs and every
+# user's year-end total is simulated in one batch (see forecast.py).
+
+SORT_KEYS = ('email', 'annual_goal', 'actual', 'target_to_date', 'utilization', 'pace',
+             'projected_total', 'required_per_day', 'goal_probability', 'forecast_p50')
+FORECAST_KEYS = ('goal_probability', 'forecast_p10', 'forecast_p50', 'forecast_p90')
+DEFAULT_AT_RISK_TOLERANCE = 0.05
+MAX_PER_PAGE = 500
+
+
+class FirmReport:
+    """Per-user metrics for one plan year as parallel arrays (one entry per user with a goal).
+
+    actual and monthly_actual are hours logged on the user's planned days.
+    The forecast fields are None unless the report was built with forecast_paths.
+    """
+
+    __slots__ = ('year', 'as_of', 'user_ids', 'emails', 'annual_goal', 'monthly_actual', 'actual',
+                 'target_to_date', 'utilization', 'pace', 'remaining_days', 'required_per_day',
+                 'projected_total', 'at_risk') + FORECAST_KEYS + ('goal_date',)
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def summary(self):
+        actual = float(self.actual.sum())
+        target = float(self.target_to_date.sum())
+        return {
+            'users': len(self),
+            'actual': round(actual, 1),
+            'target_to_date': round(target, 1),
+            'utilization': round(actual / target * 100, 1) if target else None,
+            'at_risk': int(self.at_risk.sum()),
+        }
+
+    def order(self, sort='utilization', descending=False, at_risk_only=False):
+        # Row positions in the requested order; ties keep user_id order and missing values go last
+        rows = np.flatnonzero(self.at_risk) if at_risk_only else np.arange(len(self))
+        if sort == 'email':
+            order = np.argsort(self.emails[rows], kind='stable')
+            return rows[order[::-1] if descending else order]
+        keys = getattr(self, sort)[rows].astype(np.float64)
+        if descending:
+            keys = -keys
+        keys = np.where(np.isnan(keys), np.inf, keys)
+        return rows[np.lexsort((rows, keys))]
+
+    def row(self, i):
+        forecast_fields = {}
+        if self.goal_probability is not None:
+            forecast_fields = {
+                'goal_probability': round(float(self.goal_probability[i]), 3),
+                'forecast_p10': round(float(self.forecast_p10[i]), 1),
+                'forecast_p50': round(float(self.forecast_p50[i]), 1),
+                'forecast_p90': round(float(self.forecast_p90[i]), 1),
+                'goal_date': self.goal_date[i],
+            }
+        return {
+            'user_id': int(self.user_ids[i]),
+            'email': str(self.emails[i]),
+            'annual_goal': float(self.annual_goal[i]),
+            'actual': round(float(self.actual[i]), 1),
+            'target_to_date': round(float(self.target_to_date[i]), 1),
+            'utilization': None if np.isnan(self.utilization[i]) else round(float(self.utilization[i]), 1),
+            'pace': round(float(self.pace[i]), 1),
+            'remaining_days': int(self.remaining_days[i]),
+            'required_per_day': round(float(self.required_per_day[i]), 2),
+            'projected_total': round(float(self.projected_total[i]), 1),
+            'at_risk': bool(self.at_risk[i]),
+            'monthly_actual': [round(float(h), 1) for h in self.monthly_actual[i]],
+            **forecast_fields,
+        }
+
+
+def _day_offset(column, start):
+    # Days between `start` and a date column, computed by the database
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return func.cast(func.julianday(column) - func.julianday(start.isoformat()), db.Integer)
+    return column - start
+
+
+def _day_pairs(model, positions, start, end, *criteria):
+    # (row, day-of-year) index arrays for holiday/vacation rows of the report's users
+    rows = db.session.execute(
+        select(model.user_id, _day_offset(model.date, start)).where(model.date >= start, model.date <= end, *criteria)
+    ).all()
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    pairs = np.array([(uid, offset) for uid, offset in rows], dtype=np.int64)
+    users = _report_rows(positions, pairs[:, 0])
+    keep = users >= 0
+    return users[keep], pairs[keep, 1]
+
+
+def _report_rows(positions, uids):
+    # Report row of each user id in uids, -1 for users without a goal this year
+    lookup = np.full(int(uids.max()) + 1, -1, dtype=np.int64)
+    known = [uid for uid in positions if uid < len(lookup)]
+    lookup[known] = [positions[uid] for uid in known]
+    return lookup[uids]
+
+
+def _holiday_masks(year, user_ids, positions, start, end):
+    # (users x days) holidays: each subscribed calendar's cached bitmap, then the users' overrides;
+    # also returns the days of year that are a holiday in any of the calendars
+    masks = np.zeros((len(user_ids), len(year_days(year))), dtype=bool)
+    subscribed = db.session.execute(
+        select(User.id, User.holiday_calendar_id).where(User.holiday_calendar_id.isnot(None))
+    ).all()
+    by_calendar = {}
+    for uid, calendar_id in subscribed:
+        if uid in positions:
+            by_calendar.setdefault(calendar_id, []).append(positions[uid])
+    if by_calendar:
+        for calendar_id, version, rules in db.session.execute(
+                select(HolidayCalendar.id, HolidayCalendar.version, HolidayCalendar.rules)
+                .where(HolidayCalendar.id.in_(list(by_calendar)))):
+            masks[by_calendar[calendar_id]] = calendar_year(calendar_id, version, rules, year).mask
+    calendar_days = np.flatnonzero(masks.any(axis=0))
+    masks[_day_pairs(Holiday, positions, start, end, Holiday.observed.is_(False))] = False
+    masks[_day_pairs(Holiday, positions, start, end, Holiday.observed.is_(True))] = True
+    return masks, calendar_days
+
+
+def _monthly_sums(start, as_of):
+    # (user_id, month, hours) up to as_of: whole months from the monthly rollups,
+    # a month cut short by as_of from one date-range GROUP BY user_id over the raw logs
+    full_months = as_of.month if as_of.day == monthrange(as_of.year, as_of.month)[1] else as_of.month - 1
+    rows = db.session.execute(
+        select(MonthlyRollup.user_id, MonthlyRollup.month, MonthlyRollup.hours)
+        .where(MonthlyRollup.year == start.year, MonthlyRollup.month <= full_months)
+    ).all()
+    if full_months < as_of.month:
+        rows += [(uid, as_of.month, hours) for uid, hours in db.session.execute(
+            select(DailyLog.user_id, func.sum(DailyLog.hours))
+            .where(DailyLog.date >= as_of.replace(day=1), DailyLog.date <= as_of)
+            .group_by(DailyLog.user_id)
+        )]
+    return rows
+
+
+def _log_arrays(positions, query):
+    # (row, day-of-year, hours) arrays of the report users' logs selected by query
+    rows = db.session.execute(query).all()
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    users = _report_rows(positions, np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows)))
+    offsets = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+    hours = np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows))
+    keep = users >= 0
+    return users[keep], offsets[keep], hours[keep]
+
+
+def _off_plan_logs(positions, start, as_of, off_days):
+    # Logs from start to as_of that may fall on a day outside the user's plan: logs on off_days
+    # (weekends and calendar holidays, by the date index) and logs on one of the user's vacation
+    # days or holiday overrides (by the (user_id, date) index). A log is unique per user and day,
+    # so the UNION reads each one once.
+    def logs(*criteria):
+        return select(DailyLog.user_id, _day_offset(DailyLog.date, start), DailyLog.hours) \
+            .where(DailyLog.date >= start, DailyLog.date <= as_of, *criteria)
+
+    def on_days_of(model):
+        return tuple_(DailyLog.user_id, DailyLog.date).in_(
+            select(model.user_id, model.date).where(model.date >= start, model.date <= as_of))
+    return _log_arrays(positions, union(
+        logs(DailyLog.date.in_([start + datetime.timedelta(days=int(d)) for d in off_days])),
+        logs(on_days_of(VacationDay)),
+        logs(on_days_of(Holiday)),
+    ))
+
+
+def _daily_actuals(positions, users, start, as_of):
+    # (users x days) logged hours from start to as_of
+    actual = np.zeros((users, len(year_days(start.year))))
+    rows, offsets, hours = _log_arrays(positions, select(
+        DailyLog.user_id, _day_offset(DailyLog.date, start), DailyLog.hours
+    ).where(DailyLog.date >= start, DailyLog.date <= as_of))
+    np.add.at(actual, (rows, offsets), hours)
+    return actual
+
+
+def _forecast(report, planned, daily_targets, positions, paths):
+    # Year-end forecasts of every user in one batch, seeded by year and date so a report is repeatable
+    start = datetime.date(report.year, 1, 1)
+    done = (report.as_of - start).days + 1
+    daily_actual = _daily_actuals(positions, len(report), start, report.as_of)
+    splits = [split_year(daily_targets[i], planned[i], daily_actual[i], done) for i in range(len(report))]
+    rng = np.random.default_rng([report.year, report.as_of.toordinal()])
+    result = forecast(report.actual, report.annual_goal, [s[0] for s in splits], [s[1] for s in splits], paths, rng)
+    days = year_days(report.year)
+    report.goal_probability = result.probability
+    report.forecast_p10, report.forecast_p50, report.forecast_p90 = result.p10, result.p50, result.p90
+    report.goal_date = [str(days[ahead[d]]) if d is not None and d >= 0 else None
+                        for d, (_, _, ahead) in zip(result.goal_day, splits)]
+
+
+def build_firm_report(year, as_of=None, at_risk_tolerance=DEFAULT_AT_RISK_TOLERANCE, forecast_paths=0):
+    """Compute the firm report for `year` with actuals up to and including `as_of`.
+
+    forecast_paths > 0 adds Monte Carlo year-end forecasts with that many paths per user.
+    """
+    start, end = datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+    as_of = min(max(as_of or datetime.date.today(), start - datetime.timedelta(days=1)), end)
+
+    goals = db.session.query(BillableHourGoal.user_id, BillableHourGoal.annual_goal, BillableHourGoal.workload_weights, User.email) \
+        .join(User, User.id == BillableHourGoal.user_id) \
+        .filter(BillableHourGoal.year == year) \
+        .order_by(BillableHourGoal.user_id).all()
+    # A user with several goals for the year uses the first, as load_plan does
+    seen = set()
+    goals = [g for g in goals if not (g[0] in seen or seen.add(g[0]))]
+    user_ids = np.array([g[0] for g in goals], dtype=np.int64)
+    positions = {uid: i for i, uid in enumerate(user_ids.tolist())}
+    annual_goal = np.array([g[1] for g in goals], dtype=np.float64)
+    weights = np.array([[(g[2] or {}).get(m, 1.0) for m in MONTHS] for g in goals], dtype=np.float64).reshape(len(goals), 12)
+
+    vac_users, vac_days = _day_pairs(VacationDay, positions, start, end)
+    holiday_masks, calendar_days = _holiday_masks(year, user_ids, positions, start, end)
+    days, planned, daily_targets, _ = compute_year_plans(
+        year, annual_goal, weights, vac_users, vac_days, holiday_masks
+    )
+
+    monthly_actual = np.zeros((len(goals), 12))
+    if len(goals) and as_of >= start:
+        for uid, m, hours in _monthly_sums(start, as_of):
+            if uid in positions:
+                monthly_actual[positions[uid], m - 1] = hours
+        # Inside a month with planned days, a day is off the plan only on a weekend, holiday or vacation day
+        months = month_index(days)
+        off_days = np.flatnonzero(~np.is_busday(days))
+        rows, offsets, hours = _off_plan_logs(positions, start, as_of, np.union1d(off_days, calendar_days))
+        off_plan = ~planned[rows, offsets]
+        np.subtract.at(monthly_actual, (rows[off_plan], months[offsets[off_plan]]), hours[off_plan])
+        month_starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+        monthly_actual[np.add.reduceat(planned, month_starts, axis=1) == 0] = 0.0
+
+    cut = (as_of - start).days + 1
+    actual = monthly_actual.sum(axis=1)
+    target_to_date = daily_targets[:, :cut].sum(axis=1)
+    elapsed_days = planned[:, :cut].sum(axis=1)
+    remaining_days = planned[:, cut:].sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        utilization = np.where(target_to_date > 0, actual / target_to_date * 100, np.nan)
+        required_per_day = np.where(remaining_days > 0, np.maximum(annual_goal - actual, 0) / remaining_days, 0.0)
+        projected_total = np.where(elapsed_days > 0, actual + actual / elapsed_days * remaining_days, actual)
+    at_risk = projected_total < annual_goal * (1 - at_risk_tolerance)
+
+    report = FirmReport(
+        year=year, as_of=as_of, user_ids=user_ids,
+        emails=np.array([g[3] for g in goals], dtype=object),
+        annual_goal=annual_goal, monthly_actual=monthly_actual, actual=actual,
+        target_to_date=target_to_date, utilization=utilization, pace=actual - target_to_date,
+        remaining_days=remaining_days, required_per_day=required_per_day,
+        projected_total=projected_total, at_risk=at_risk,
+    )
+    if forecast_paths:
+        _forecast(report, planned, daily_targets, positions, forecast_paths)
+    return report
@@ -0,0 +1,213 @@
+import datetime
+from calendar import monthrange
+import numpy as np
+from sqlalchemy import or_
+from .. import db
+from ..models import DailyLog
+from .analytics import load_log_arrays, pace
+from .plans import load_plan
+from .ranges import DAILY_GROUPS, load_range
+
+# Dashboard data as small, separately fetchable resources.
+# Each builder returns a JSON-ready dict, or None when the user has no plan for
+# the year, and reads only what it needs: the cached plan and at most one
+# indexed query of logs. Actuals count the planned days only, as the
+# dashboard's do, so they come from the logs rather than the rollups.
+
+
+def _logs_by_date(user_id, start, end):
+    return dict(db.session.query(DailyLog.date, DailyLog.hours).filter(
+        DailyLog.user_id == user_id,
+        DailyLog.date >= start,
+        DailyLog.date <= end
+    ).all())
+
+
+def _year_logs(user_id, years):
+    # (datetime64[D], float64) arrays of the logs in `years`, in one query
+    if not years:
+        return np.array([], dtype='datetime64[D]'), np.array([])
+    rows = db.session.query(DailyLog.date, DailyLog.hours).filter(
+        DailyLog.user_id == user_id,
+        or_(*(DailyLog.date.between(datetime.date(y, 1, 1), datetime.date(y, 12, 31)) for y in sorted(years)))
+    ).all()
+    return np.array([r[0] for r in rows], dtype='datetime64[D]'), np.array([r[1] for r in rows], dtype=np.float64)
+
+
+def _versioned_logs(user_id, start, end):
+    # {date: (hours, version)}; clients send the version back with edits (see batch.py)
+    return {d: (h, v) for d, h, v in db.session.query(DailyLog.date, DailyLog.hours, DailyLog.version).filter(
+        DailyLog.user_id == user_id,
+        DailyLog.date >= start,
+        DailyLog.date <= end
+    )}
+
+
+def log_versions(user_id, year, month):
+    # {ISO date: version} of the month's logs, for views that edit through POST /api/v1/logs
+    first = datetime.date(year, month, 1)
+    logs = _versioned_logs(user_id, first, datetime.date(year, month, monthrange(year, month)[1]))
+    return {d.isoformat(): v for d, (_, v) in logs.items()}
+
+
+def _day_status(day, target, logged, today):
+    # Same classes as the dashboard calendar
+    if target is None:
+        return 'nonwork'
+    if day == today:
+        return 'today'
+    if logged is None:
+        return 'no-log'
+    if logged >= target:
+        return 'on-track'
+    return 'partial' if logged > 0 else 'no-log'
+
+
+def summary(user_id, year, month):
+    cached = load_plan(user_id, year)
+    if not cached:
+        return None
+    ledger = cached['ledger'].with_actuals(*_year_logs(user_id, [year]))
+    month_actual = ledger.actual_total(ledger.month(month))
+    month_target = ledger.total(ledger.month(month))
+    year_actual = ledger.actual_total()
+    year_target = ledger.total()
+    return {
+        'year': year,
+        'month': month,
+        'annualGoal': cached['annual_goal'],
+        'monthlyTargets': cached['monthly_targets'],
+        'monthActual': month_actual,
+        'monthTarget': month_target,
+        'yearActual': year_actual,
+        'yearTarget': year_target,
+        'monthProgress': round((month_actual / month_target) * 100, 1) if month_target else 0,
+        'yearProgress': round((year_actual / year_target) * 100, 1) if year_target else 0,
+    }
+
+
+def month_calendar(user_id, year, month, today):
+    cached = load_plan(user_id, year)
+    if not cached:
+        return None
+    ledger = cached['ledger']
+    first = datetime.date(year, month, 1)
+    last = datetime.date(year, month, monthrange(year, month)[1])
+    logs = _versioned_logs(user_id, first, last)
+    days = []
+    for n in range(last.day):
+        day = first + datetime.timedelta(days=n)
+        target, (logged, version) = ledger.target_on(day), logs.get(day, (None, 0))
+        days.append({'date': day.isoformat(), 'target': target, 'logged': logged, 'version': version,
+                     'status': _day_status(day, target, logged, today)})
+    return {'year': year, 'month': month, 'days': days}
+
+
+def year_series(user_id, year):
+    # Planned days of the year with their targets, actuals and running totals
+    cached = load_plan(user_id, year)
+    if not cached:
+        return None
+    ledger = cached['ledger'].with_actuals(*load_log_arrays(user_id, datetime.date(year, 1, 1),
+                                                             datetime.date(year, 12, 31)))
+    planned = ledger.planned_mask()
+    dates = ledger.days()[planned]
+    targets = ledger.targets()[planned]
+    actual = ledger.actual[planned]
+    return {
+        'year': year,
+        'days': [str(d) for d in dates],
+        'targets': targets.tolist(),
+        'actual': actual.tolist(),
+        'cumTarget': np.cumsum(targets).tolist(),
+        'cumActual': np.cumsum(actual).tolist(),
+    }
+
+
+def recent_days(user_id, today, count=4):
+    # The last `count` days up to today, oldest first
+    cached = load_plan(user_id, today.year)
+    if not cached:
+        return None
+    ledger = cached['ledger']
+    first = today - datetime.timedelta(days=count - 1)
+    logs = _logs_by_date(user_id, first, today)
+    days = []
+    for n in range(count):
+        d = first + datetime.timedelta(days=n)
+        target = ledger.target_on(d)
+        if target is None:
+            target = 0
+        logged = logs.get(d, 0)
+        if d == today:
+            status = 'in-progress' if logged < target else 'success'
+            date_str = f"Today, {d.strftime('%b %d')}"
+        else:
+            status = 'success' if logged >= target else 'warning'
+            date_str = d.strftime('%A, %b %d')
+        days.append({'date': date_str, 'target': target, 'logged': logged, 'status': status})
+    return {'days': days}
+
+
+def date_range(user_id, start, end, group='month', fiscal_start_month=1, series=False):
+    # Totals of any range, e.g. several years or a fiscal year, per period of `group`;
+    # series adds the planned days with cumulative target and actual
+    plan = load_range(user_id, start, end, fiscal_start_month, daily=series or group in DAILY_GROUPS)
+    if not plan.plan_years:
+        return None
+    target, actual = float(plan.targets.sum()), float(plan.actual.sum())
+    data = {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'group': group,
+        'planYears': plan.plan_years,
+        'target': round(target, 2),
+        'actual': round(actual, 2),
+        'progress': round(actual / target * 100, 1) if target else 0,
+        'periods': plan.totals(group),
+    }
+    if series:
+        data['series'] = {
+            'days': [str(d) for d in plan.days[plan.planned]],
+            'cumTarget': np.cumsum(plan.targets[plan.planned]).tolist(),
+            'cumActual': np.cumsum(plan.actual[plan.planned]).tolist(),
+        }
+    return data
+
+
+def log_deltas(user_id, written, today, data_version):
+    # What a batch of log edits changed: the days as now stored, the totals of
+    # their months and years, and the pace of the current year. written is
+    # apply_edits()'s [(date, hours or None, version)].
+    years = {d.year for d, _, _ in written} | {today.year}
+    plans = {year: load_plan(user_id, year) for year in years}
+    logs = _year_logs(user_id, [year for year in years if plans[year]])
+    ledgers = {year: plans[year]['ledger'].with_actuals(*logs) if plans[year] else None for year in years}
+    days = []
+    for d, logged, version in written:
+        target = ledgers[d.year].target_on(d) if ledgers[d.year] else None
+        days.append({'date': d.isoformat(), 'target': target, 'logged': logged, 'version': version,
+                     'status': _day_status(d, target, logged, today)})
+    months = []
+    for year, month in sorted({(d.year, d.month) for d, _, _ in written}):
+        ledger = ledgers[year]
+        month_actual = ledger.actual_total(ledger.month(month)) if ledger else 0
+        month_target = ledger.total(ledger.month(month)) if ledger else 0
+        months.append({'year': year, 'month': month, 'monthActual': month_actual, 'monthTarget': month_target,
+                       'monthProgress': round((month_actual / month_target) * 100, 1) if month_target else 0})
+    totals = []
+    for year in sorted({d.year for d, _, _ in written}):
+        year_actual = ledgers[year].actual_total() if ledgers[year] else 0
+        year_target = ledgers[year].total() if ledgers[year] else 0
+        totals.append({'year': year, 'yearActual': year_actual, 'yearTarget': year_target,
+                       'yearProgress': round((year_actual / year_target) * 100, 1) if year_target else 0})
+    current = plans[today.year]
+    pace_data = None
+    if current:
+        ledger = ledgers[today.year]
+        year_actual, year_target = ledger.actual_total(), ledger.total()
+        days_left = ledger.planned_days(ledger.range(today, datetime.date(today.year, 12, 31)))
+        catchup_per_day, pace_status = pace(current['annual_goal'], year_target, year_actual, days_left, today)
+        pace_data = {'year': today.year, 'daysLeft': days_left, 'catchupPerDay': catchup_per_day,
+                     'paceStatus': pace_status}
+    return {'dataVersion': data_version, 'days': days, 'months': months, 'years': totals, 'pace': pace_data}
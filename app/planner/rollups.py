@@ -0,0 +1,309 @@
+import datetime
+from collections import defaultdict
+import numpy as np
+from sqlalchemy import bindparam, select, tuple_
+from .. import db
+from ..models import ActivityRollup, DailyLog, MonthlyRollup, User, WeekdayRollup
+
+# Incremental rollups of daily_log.
+# Every write to daily_log hands its (user_id, date, old_hours, new_hours)
+# changes to record_changes() inside the same transaction, which adds the
+# differences to the per-month and per-weekday totals (in SQL) and updates the
+# day's bits in the year's activity bitmaps (read and rewritten under a row
+# lock, so concurrent writers cannot drop each other's bits). Readers then get a user's year from a
+# couple of dozen rows instead of summing every log.
+# rebuild() and verify() recompute the rollups from the raw logs.
+
+YEAR_BITS = 366
+TOLERANCE = 1e-6  # Incremental float sums differ from a fresh sum by rounding only
+USER_BATCH = 500
+PARTS = ('month', 'weekday', 'activity')
+
+
+def _pack(bits):
+    return np.packbits(bits, bitorder='little').tobytes()
+
+
+def _unpack(blob):
+    return np.unpackbits(np.frombuffer(blob, dtype=np.uint8), count=YEAR_BITS, bitorder='little').astype(bool)
+
+
+class YearRollup:
+    """One user's year: hours and logged days per month and weekday, plus day-of-year bitmaps."""
+
+    __slots__ = ('year', 'month_hours', 'month_days', 'weekday_hours', 'weekday_days', 'logged', 'active')
+
+    def __init__(self, year):
+        self.year = year
+        self.month_hours = np.zeros(12)
+        self.month_days = np.zeros(12, dtype=np.int64)
+        self.weekday_hours = np.zeros(7)
+        self.weekday_days = np.zeros(7, dtype=np.int64)
+        self.logged = np.zeros(YEAR_BITS, dtype=bool)
+        self.active = np.zeros(YEAR_BITS, dtype=bool)
+
+    def total(self, through_month=12):
+        # Hours logged from January through `through_month`
+        return float(np.cumsum(self.month_hours[:through_month])[-1]) if through_month > 0 else 0.0
+
+    def weekday_order(self):
+        # Weekdays (0=Monday) in the order they were first logged in the year
+        first = datetime.date(self.year, 1, 1).weekday()
+        weekdays = (np.flatnonzero(self.logged) + first) % 7
+        present, first_seen = np.unique(weekdays, return_index=True)
+        return present[np.argsort(first_seen)]
+
+    def drift(self, other):
+        # Names of the fields that differ from `other`
+        fields = []
+        for name in ('month_hours', 'weekday_hours'):
+            if not np.allclose(getattr(self, name), getattr(other, name), rtol=0, atol=TOLERANCE):
+                fields.append(name)
+        for name in ('month_days', 'weekday_days', 'logged', 'active'):
+            if not np.array_equal(getattr(self, name), getattr(other, name)):
+                fields.append(name)
+        return fields
+
+
+def _load(user_ids, years=None, parts=PARTS):
+    # {(user_id, year): YearRollup} from the rollup tables of `parts`; the others stay empty
+    rollups = {}
+
+    def get(user_id, year):
+        key = (user_id, year)
+        if key not in rollups:
+            rollups[key] = YearRollup(year)
+        return rollups[key]
+
+    def query(*columns):
+        model = columns[0].class_
+        stmt = select(model.user_id, model.year, *columns).where(model.user_id.in_(user_ids))
+        if years is not None:
+            stmt = stmt.where(model.year.in_(years))
+        return db.session.execute(stmt)
+
+    if 'month' in parts:
+        for uid, year, month, hours, days in query(MonthlyRollup.month, MonthlyRollup.hours, MonthlyRollup.days):
+            rollup = get(uid, year)
+            rollup.month_hours[month - 1] = hours
+            rollup.month_days[month - 1] = days
+    if 'weekday' in parts:
+        for uid, year, weekday, hours, days in query(WeekdayRollup.weekday, WeekdayRollup.hours, WeekdayRollup.days):
+            rollup = get(uid, year)
+            rollup.weekday_hours[weekday] = hours
+            rollup.weekday_days[weekday] = days
+    if 'activity' in parts:
+        for uid, year, logged, active in query(ActivityRollup.logged_days, ActivityRollup.active_days):
+            rollup = get(uid, year)
+            rollup.logged = _unpack(logged)
+            rollup.active = _unpack(active)
+    return rollups
+
+
+def load_rollups(user_id, years, parts=PARTS):
+    """{year: YearRollup} for one user; years without logs get empty rollups.
+
+    parts limits loading to some of 'month', 'weekday' and 'activity', one query each.
+    """
+    years = sorted(set(years))
+    stored = _load([user_id], years, parts)
+    return {year: stored.get((user_id, year)) or YearRollup(year) for year in years}
+
+
+def _insert(table):
+    # Dialect INSERT with ON CONFLICT support, or None for the generic fallback
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert(table)
+
+
+def _add_totals(model, column, deltas):
+    # Add (hours, days) deltas to the rollup rows keyed by (user_id, year, column)
+    rows = [{'user_id': uid, 'year': year, column: key, 'hours': hours, 'days': days}
+            for (uid, year, key), (hours, days) in deltas.items()]
+    if not rows:
+        return
+    table = model.__table__
+    stmt = _insert(table)
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'year', column],
+            set_={'hours': table.c.hours + stmt.excluded.hours, 'days': table.c.days + stmt.excluded.days}
+        )
+        db.session.execute(stmt, rows)
+        return
+    for row in rows:
+        updated = db.session.execute(
+            table.update()
+            .where(table.c.user_id == row['user_id'], table.c.year == row['year'], table.c[column] == row[column])
+            .values(hours=table.c.hours + row['hours'], days=table.c.days + row['days'])
+        )
+        if not updated.rowcount:
+            db.session.execute(table.insert(), row)
+
+
+def _lock_bitmaps(keys):
+    # {(user_id, year): (logged, active)} of the stored bitmaps, locked until commit (FOR UPDATE where the
+    # database has it; SQLite writers are serialized anyway). Missing rows are created empty first, so
+    # concurrent first writes to a year lock the same row instead of both inserting.
+    table = ActivityRollup.__table__
+    empty = _pack(np.zeros(YEAR_BITS, dtype=bool))
+    stmt = _insert(table)
+    if stmt is not None:
+        db.session.execute(stmt.on_conflict_do_nothing(index_elements=['user_id', 'year']),
+                           [{'user_id': uid, 'year': year, 'logged_days': empty, 'active_days': empty}
+                            for uid, year in keys])
+
+    def read():
+        return {
+            (uid, year): (_unpack(logged), _unpack(active))
+            for uid, year, logged, active in db.session.execute(
+                select(table.c.user_id, table.c.year, table.c.logged_days, table.c.active_days)
+                .where(tuple_(table.c.user_id, table.c.year).in_(keys))
+                .order_by(table.c.user_id, table.c.year)  # One lock order for every writer
+                .with_for_update()
+            )
+        }
+
+    stored = read()
+    missing = [{'user_id': uid, 'year': year, 'logged_days': empty, 'active_days': empty}
+               for uid, year in keys if (uid, year) not in stored]
+    if missing:
+        db.session.execute(table.insert(), missing)
+        stored = read()
+    return stored
+
+
+def _set_bits(bits):
+    # bits: {(user_id, year): {day_of_year: (logged, active)}}
+    if not bits:
+        return
+    table = ActivityRollup.__table__
+    updates = []
+    for (uid, year), (logged, active) in _lock_bitmaps(sorted(bits)).items():
+        for day, (is_logged, is_active) in bits[(uid, year)].items():
+            logged[day] = is_logged
+            active[day] = is_active
+        updates.append({'b_user_id': uid, 'b_year': year, 'logged_days': _pack(logged), 'active_days': _pack(active)})
+    db.session.execute(
+        table.update().where(table.c.user_id == bindparam('b_user_id'), table.c.year == bindparam('b_year')),
+        updates
+    )
+
+
+def record_changes(changes):
+    """Apply daily_log changes to the rollups.
+
+    changes is an iterable of (user_id, date, old_hours, new_hours), where
+    old_hours/new_hours is None when the day had/has no log. Nothing is
+    committed: call this in the transaction that writes the logs.
+    """
+    months = defaultdict(lambda: [0.0, 0])
+    weekdays = defaultdict(lambda: [0.0, 0])
+    bits = defaultdict(dict)
+    for uid, date, old, new in changes:
+        hours = (new or 0) - (old or 0)
+        days = (new is not None) - (old is not None)
+        if hours or days:
+            for totals, key in ((months, (uid, date.year, date.month)), (weekdays, (uid, date.year, date.weekday()))):
+                totals[key][0] += hours
+                totals[key][1] += days
+        bits[(uid, date.year)][date.timetuple().tm_yday - 1] = (new is not None, bool(new))
+    _add_totals(MonthlyRollup, 'month', months)
+    _add_totals(WeekdayRollup, 'weekday', weekdays)
+    _set_bits(bits)
+
+
+def _from_logs(user_ids):
+    # {(user_id, year): YearRollup} recomputed from the raw logs
+    rows = db.session.execute(
+        select(DailyLog.user_id, DailyLog.date, DailyLog.hours)
+        .where(DailyLog.user_id.in_(user_ids))
+        .order_by(DailyLog.user_id, DailyLog.date)
+    ).all()
+    rollups = {}
+    if not rows:
+        return rollups
+    uids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    dates = np.array([r[1] for r in rows], dtype='datetime64[D]')
+    hours = np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows))
+    year_start = dates.astype('datetime64[Y]')
+    years = year_start.astype(np.int64) + 1970
+    months = (dates.astype('datetime64[M]') - year_start.astype('datetime64[M]')).astype(np.int64)
+    day_of_year = (dates - year_start.astype('datetime64[D]')).astype(np.int64)
+    weekdays = (dates.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    # Rows are sorted by (user_id, date), so every (user_id, year) is one contiguous slice
+    edges = np.flatnonzero((np.diff(uids) != 0) | (np.diff(years) != 0)) + 1
+    for lo, hi in zip(np.concatenate(([0], edges)), np.concatenate((edges, [len(rows)]))):
+        rollup = YearRollup(int(years[lo]))
+        rollup.month_hours = np.bincount(months[lo:hi], weights=hours[lo:hi], minlength=12)
+        rollup.month_days = np.bincount(months[lo:hi], minlength=12)
+        rollup.weekday_hours = np.bincount(weekdays[lo:hi], weights=hours[lo:hi], minlength=7)
+        rollup.weekday_days = np.bincount(weekdays[lo:hi], minlength=7)
+        rollup.logged[day_of_year[lo:hi]] = True
+        rollup.active[day_of_year[lo:hi]] = hours[lo:hi] > 0
+        rollups[(int(uids[lo]), rollup.year)] = rollup
+    return rollups
+
+
+def _write(rollups):
+    months, weekdays, activity = [], [], []
+    for (uid, year), rollup in rollups.items():
+        months.extend({'user_id': uid, 'year': year, 'month': int(m) + 1, 'hours': float(rollup.month_hours[m]),
+                       'days': int(rollup.month_days[m])} for m in np.flatnonzero(rollup.month_days))
+        weekdays.extend({'user_id': uid, 'year': year, 'weekday': int(w), 'hours': float(rollup.weekday_hours[w]),
+                         'days': int(rollup.weekday_days[w])} for w in np.flatnonzero(rollup.weekday_days))
+        activity.append({'user_id': uid, 'year': year, 'logged_days': _pack(rollup.logged),
+                         'active_days': _pack(rollup.active)})
+    for model, rows in ((MonthlyRollup, months), (WeekdayRollup, weekdays), (ActivityRollup, activity)):
+        if rows:
+            db.session.execute(model.__table__.insert(), rows)
+
+
+def _user_batches(user_ids):
+    if user_ids is None:
+        user_ids = [uid for (uid,) in db.session.execute(select(User.id).order_by(User.id))]
+    for i in range(0, len(user_ids), USER_BATCH):
+        yield list(user_ids[i:i + USER_BATCH])
+
+
+def _compare(expected, stored):
+    drift = []
+    for key in sorted(set(expected) | set(stored)):
+        year = key[1]
+        fields = (expected.get(key) or YearRollup(year)).drift(stored.get(key) or YearRollup(year))
+        drift.extend((key[0], year, field) for field in fields)
+    return drift
+
+
+def verify(user_ids=None):
+    """Compare the stored rollups with the raw logs.
+
+    Returns a list of (user_id, year, field) for every rollup field that has
+    drifted; empty when everything matches.
+    """
+    drift = []
+    for batch in _user_batches(user_ids):
+        drift.extend(_compare(_from_logs(batch), _load(batch)))
+    return drift
+
+
+def rebuild(user_ids=None):
+    """Recompute the rollups of user_ids (every user when None) from the raw logs.
+
+    Commits per batch of users and returns the drift that was corrected, as verify() reports it.
+    """
+    drift = []
+    for batch in _user_batches(user_ids):
+        expected = _from_logs(batch)
+        drift.extend(_compare(expected, _load(batch)))
+        for model in (MonthlyRollup, WeekdayRollup, ActivityRollup):
+            db.session.execute(model.__table__.delete().where(model.user_id.in_(batch)))
+        _write(expected)
+        db.session.commit()
+    return drift
@@ -0,0 +1,178 @@
+import datetime
+import math
+from sqlalchemy import bindparam, or_, select, update
+from .. import db
+from ..models import BillableHourGoal, Holiday, User, VacationDay
+from .engine import MONTHS
+from .versions import bump_data_version
+
+# Setup wizard saves as one diff.
+# The wizard posts the whole desired state: goal, monthly weights, calendar
+# subscription, the calendar holidays the user works, personal holidays and
+# vacation days. sync_setup() reads the stored rows once, works out the
+# difference and writes only that, in one transaction and with one bulk
+# statement per kind of change to each set of rows. Stored rows that are
+# no longer wanted are reused for wanted rows that are missing, so an edited
+# date is one update rather than a delete and an insert. When nothing
+# differs nothing is written and the data version stays where it was.
+
+
+class SetupState:
+    """What the wizard asks for.
+
+    worked maps the calendar holidays the user works to their names; only
+    the dates in worked_scope (the calendar year the form showed) are
+    synced. holidays maps personal holiday dates to names.
+    """
+
+    __slots__ = ('annual_goal', 'workload_weights', 'calendar_id', 'worked', 'worked_scope', 'holidays', 'vacations')
+
+    def __init__(self, annual_goal, workload_weights, calendar_id=None, worked=None, worked_scope=(),
+                 holidays=None, vacations=()):
+        self.annual_goal = annual_goal
+        self.workload_weights = workload_weights
+        self.calendar_id = calendar_id
+        self.worked = worked or {}
+        self.worked_scope = list(worked_scope)
+        self.holidays = holidays or {}
+        self.vacations = set(vacations)
+
+
+class SyncResult:
+    __slots__ = ('data_version', 'changes')
+
+    def __init__(self, data_version, changes):
+        self.data_version = data_version
+        self.changes = changes  # {table or setting: rows written}
+
+    @property
+    def changed(self):
+        return any(self.changes.values())
+
+
+def _date(value, field):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid {field} {value!r}.') from None
+
+
+def state_from_form(form, calendar_id, calendar_ids, calendar_days):
+    """SetupState from the wizard's form; raises ValueError with a message for the user.
+
+    calendar_id is the current subscription, calendar_ids the calendars that
+    may be chosen and calendar_days the CalendarYear the form listed.
+    """
+    try:
+        annual_goal = int(form.get('annual_goal'))
+    except (TypeError, ValueError):
+        raise ValueError('Invalid annual goal.') from None
+    weights = {}
+    for m in MONTHS:
+        try:
+            weights[m] = float(form.get(f'workload_{m}', 1.0))
+        except ValueError:
+            raise ValueError(f'Invalid workload for {m}.') from None
+        # NaN and infinity are not valid JSON for the workload_weights column, and would poison every plan
+        if not math.isfinite(weights[m]) or weights[m] < 0:
+            raise ValueError(f'Invalid workload for {m}.')
+    try:
+        chosen = int(form.get('holiday_calendar', calendar_id))
+    except ValueError:
+        chosen = calendar_id
+    worked = {d: name for d, name in zip(calendar_days.dates, calendar_days.names)
+              if form.get(f'work_{d.isoformat()}')}
+    # Each list is read once; the remove_* checkboxes index the rows as listed
+    holidays = {}
+    for i, (value, name) in enumerate(zip(form.getlist('holiday_dates'), form.getlist('holiday_names'))):
+        if not form.get(f'remove_holiday_{i}'):
+            holidays[_date(value, 'holiday date')] = name
+    if form.get('new_holiday_date') and form.get('new_holiday_name'):
+        holidays[_date(form['new_holiday_date'], 'holiday date')] = form['new_holiday_name']
+    vacations = {_date(value, 'vacation date') for i, value in enumerate(form.getlist('vacation_dates'))
+                 if not form.get(f'remove_vacation_{i}')}
+    if form.get('new_vacation_date'):
+        vacations.add(_date(form['new_vacation_date'], 'vacation date'))
+    return SetupState(annual_goal, weights, chosen if chosen in calendar_ids else calendar_id,
+                      worked, calendar_days.dates, holidays, vacations)
+
+
+def _diff(stored, desired):
+    # stored: [(id, date, value)]; desired: {date: value}.
+    # Returns (inserts [(date, value)], updates [(id, date, value)], deletes [id]).
+    kept, spare, updates = set(), [], []
+    for row_id, d, value in sorted(stored, key=lambda r: r[0]):
+        if d in desired and d not in kept:
+            kept.add(d)
+            if value != desired[d]:
+                updates.append((row_id, d, desired[d]))
+        else:
+            spare.append(row_id)
+    missing = sorted((d, v) for d, v in desired.items() if d not in kept)
+    reused = min(len(spare), len(missing))
+    updates += [(row_id, d, v) for row_id, (d, v) in zip(spare, missing)]
+    return missing[reused:], updates, spare[reused:]
+
+
+def _apply(model, diff, named, **insert_values):
+    # One executemany per kind of change; returns the rows written
+    inserts, updates, deletes = diff
+    table = model.__table__
+    if deletes:
+        db.session.execute(table.delete().where(table.c.id.in_(deletes)))
+    if updates:
+        values = {'date': bindparam('b_date'), **({'name': bindparam('b_name')} if named else {})}
+        db.session.execute(
+            table.update().where(table.c.id == bindparam('b_id')).values(**values),
+            [{'b_id': row_id, 'b_date': d, **({'b_name': v} if named else {})} for row_id, d, v in updates]
+        )
+    if inserts:
+        db.session.execute(table.insert(), [{'date': d, **({'name': v} if named else {}), **insert_values}
+                                            for d, v in inserts])
+    return len(inserts) + len(updates) + len(deletes)
+
+
+def sync_setup(user_id, year, state):
+    """Make the user's stored setup for `year` match `state` in one transaction; returns a SyncResult."""
+    goal = db.session.execute(
+        select(BillableHourGoal.id, BillableHourGoal.annual_goal, BillableHourGoal.workload_weights)
+        .where(BillableHourGoal.user_id == user_id, BillableHourGoal.year == year)
+    ).first()
+    calendar_id = db.session.execute(select(User.holiday_calendar_id).where(User.id == user_id)).scalar()
+    holidays = db.session.execute(
+        select(Holiday.id, Holiday.date, Holiday.name, Holiday.observed).where(
+            Holiday.user_id == user_id,
+            or_(Holiday.observed.is_(True), Holiday.date.in_(state.worked_scope)))
+    ).all()
+    vacations = db.session.execute(
+        select(VacationDay.id, VacationDay.date).where(VacationDay.user_id == user_id)
+    ).all()
+
+    changes = {'goal': 0, 'calendar': 0}
+    if goal is None:
+        db.session.execute(BillableHourGoal.__table__.insert(), {
+            'user_id': user_id, 'year': year, 'annual_goal': state.annual_goal,
+            'workload_weights': state.workload_weights})
+        changes['goal'] = 1
+    elif (goal.annual_goal, goal.workload_weights) != (state.annual_goal, state.workload_weights):
+        db.session.execute(update(BillableHourGoal).where(BillableHourGoal.id == goal.id).values(
+            annual_goal=state.annual_goal, workload_weights=state.workload_weights))
+        changes['goal'] = 1
+    if state.calendar_id is not None and state.calendar_id != calendar_id:
+        db.session.execute(update(User).where(User.id == user_id).values(holiday_calendar_id=state.calendar_id))
+        changes['calendar'] = 1
+    changes['holidays'] = _apply(Holiday, _diff(
+        [(h.id, h.date, h.name) for h in holidays if h.observed], state.holidays),
+        named=True, user_id=user_id, is_firm=False, observed=True)
+    changes['worked'] = _apply(Holiday, _diff(
+        [(h.id, h.date, h.name) for h in holidays if not h.observed], state.worked),
+        named=True, user_id=user_id, is_firm=False, observed=False)
+    changes['vacations'] = _apply(VacationDay, _diff(
+        [(v.id, v.date, None) for v in vacations], dict.fromkeys(state.vacations)),
+        named=False, user_id=user_id)
+
+    if any(changes.values()):
+        bump_data_version(user_id)
+    data_version = db.session.execute(select(User.data_version).where(User.id == user_id)).scalar()
+    db.session.commit()
+    return SyncResult(data_version, changes)
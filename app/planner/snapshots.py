@@ -0,0 +1,111 @@
+import datetime
+from sqlalchemy import select
+from .. import db
+from ..jobs import jobs
+from ..models import User
+from .analytics import dashboard_metrics, dashboard_range, load_log_arrays
+from .cache import PAYLOAD_FORMAT, make_backend
+from .forecast import year_forecast
+from .plans import load_plan
+from .resources import log_versions
+from .rollups import load_rollups
+from .trends import year_trends
+
+# Precomputed dashboard snapshots.
+# A snapshot is what dashboard() computes for a month view without a
+# comparison range: the plan's monthly targets, dashboard_metrics(), the
+# year's trends, the year-end forecast and the versions of the month's logs
+# that the calendar edits against. It is
+# stored with the user's data version and the day it was computed for, and
+# is stale once either moves on. Writes enqueue a recompute after they
+# commit (refresh()); the view uses a fresh snapshot and otherwise computes
+# inline and stores the result, so a missing or lagging worker only costs
+# the time it would have taken anyway.
+
+
+class SnapshotStore:
+    def __init__(self, app=None):
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Same kind of backend as the plan cache, but its own entries, so snapshots never evict plans
+        self.backend = make_backend(app.config)
+        app.extensions['dashboard_snapshots'] = self
+
+    def key(self, user_id, year, month):
+        return f'snapshot:{user_id}:{year}:{month}:f{PAYLOAD_FORMAT}'
+
+    def get(self, user_id, year, month, version, today):
+        snapshot = self.backend.get(self.key(user_id, year, month))
+        if snapshot is None or snapshot['version'] != version or snapshot['today'] != today:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return snapshot
+
+    def set(self, user_id, year, month, snapshot):
+        # A slow job must not replace a snapshot of newer data
+        key = self.key(user_id, year, month)
+        stored = self.backend.get(key)
+        if stored is not None and stored['today'] == snapshot['today'] and stored['version'] > snapshot['version']:
+            return
+        self.backend.set(key, snapshot)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None}
+
+
+snapshots = SnapshotStore()
+
+
+def compute_snapshot(user_id, year, month, today, version):
+    """The dashboard's plan and metrics for a month view, or None before setup.
+
+    `version` is the data version read before any of the data; the plans are
+    looked up under it too, so a snapshot never pairs a version with an older plan.
+    """
+    cached = load_plan(user_id, year, version)
+    if not cached:
+        return None
+    range_start, range_end = dashboard_range(today, year)
+    log_dates, log_hours = load_log_arrays(user_id, range_start, range_end)
+    rollups = load_rollups(user_id, {year, today.year})
+    metrics = dashboard_metrics(cached['ledger'], log_dates, log_hours, today, year, month, cached['annual_goal'],
+                                rollups=rollups)
+    return {'version': version, 'today': today, 'monthly_targets': cached['monthly_targets'], 'metrics': metrics,
+            'trends': year_trends(user_id, year, today, version), 'forecast': year_forecast(user_id, today, version=version),
+            'log_versions': log_versions(user_id, year, month)}
+
+
+def dashboard_snapshot(user_id, year, month, today, version):
+    """A fresh snapshot of the month view, computed inline when missing or stale."""
+    snapshot = snapshots.get(user_id, year, month, version, today)
+    if snapshot is None:
+        snapshot = compute_snapshot(user_id, year, month, today, version)
+        if snapshot is not None:
+            snapshots.set(user_id, year, month, snapshot)
+    return snapshot
+
+
+def recompute(user_id, year, month):
+    today = datetime.date.today()
+    version = db.session.execute(select(User.data_version).where(User.id == user_id)).scalar()
+    if version is None:
+        return
+    snapshot = compute_snapshot(user_id, year, month, today, version)
+    if snapshot is not None:
+        snapshots.set(user_id, year, month, snapshot)
+
+
+def refresh(user_id, *dates):
+    """Queue recomputes of the user's current month view and the months of `dates`; call after commit."""
+    today = datetime.date.today()
+    months = {(today.year, today.month)} | {(d.year, d.month) for d in dates}
+    for year, month in sorted(months):
+        jobs.enqueue(('dashboard', user_id, year, month), recompute, user_id, year, month)
@@ -0,0 +1,161 @@
+import datetime
+import numpy as np
+from .ranges import load_range
+
+# Trend statistics over the multi-year log history.
+# Rolling windows are calendar days ending on each day; for each window the
+# average per workday (hours logged Monday to Friday over the weekdays in the
+# window, as the dashboard's other averages count them) and the utilization
+# (hours logged against the planned target, on the days of years with a plan)
+# come from differences of prefix sums, so any window costs one subtraction
+# per day whatever its width.
+# Exponentially weighted averages run over the workdays, with
+# alpha = 2 / (span + 1), and carry over to the weekend days after them.
+# The history is read from before the first day reported, across year
+# boundaries, so the first values of a year already cover whole windows.
+
+DEFAULT_WINDOWS = (7, 30, 90)
+DEFAULT_SPANS = (10, 30)
+MAX_WINDOW = 366
+MAX_SPAN = 250
+MAX_SERIES = 8
+_EWMA_SCALE = 1e4  # Largest weight ratio inside one EWMA block
+
+
+def lookback(windows, spans):
+    # Days of history before the first reported day: the widest window, and
+    # three spans of workdays, after which a span's starting value weighs under 5%
+    return max([w - 1 for w in windows] + [-(-3 * s * 7 // 5) for s in spans] + [0])
+
+
+def prefix_sums(values):
+    """P with P[i] the sum of values[:i], so values[a:b] sums to P[b] - P[a]."""
+    return np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+
+
+def window_sums(prefix, window, first=0):
+    # Sum of the `window` values ending on each position from `first` on, clipped at the start
+    ends = np.arange(first + 1, len(prefix))
+    return prefix[ends] - prefix[np.maximum(ends - window, 0)]
+
+
+def ewma(values, span, initial=0.0):
+    """Exponentially weighted average after each value.
+
+    y[k] = (1 - alpha) * y[k-1] + alpha * values[k], computed in blocks of
+    closed-form cumulative sums. Within a block the weights grow by at most
+    _EWMA_SCALE, which keeps the rounding error near 1e-12 of the values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    alpha = 2 / (span + 1)
+    decay = 1 - alpha
+    if decay == 0:
+        return values.copy()
+    out = np.empty(len(values))
+    block = max(int(np.log(_EWMA_SCALE) / -np.log(decay)), 1)
+    powers = decay ** np.arange(block + 1)
+    level = initial
+    for lo in range(0, len(values), block):
+        chunk = values[lo:lo + block]
+        k = len(chunk)
+        # y[j] = decay^(j+1) * level + alpha * sum(decay^(j-i) * x[i] for i <= j)
+        out[lo:lo + k] = powers[1:k + 1] * level + alpha * powers[:k] * np.cumsum(chunk / powers[:k])
+        level = out[lo + k - 1]
+    return out
+
+
+def _round(values):
+    # Two decimals; adding 0.0 turns the -0.0 of rounded residues into 0.0
+    return (np.round(values, 2) + 0.0).tolist()
+
+
+def _utilization(hours, target, planned):
+    # Percent of target, None for windows without a planned day
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = np.round(hours / target * 100, 1) + 0.0
+    return [p if n else None for p, n in zip(pct.tolist(), planned.tolist())]
+
+
+def _check(values, name, limit):
+    values = sorted(set(values))
+    if not values or len(values) > MAX_SERIES:
+        raise ValueError(f'between 1 and {MAX_SERIES} {name}s')
+    if values[0] < 1 or values[-1] > limit:
+        raise ValueError(f'{name}s must be from 1 to {limit}')
+    return values
+
+
+def trend_stats(user_id, start, end, windows=DEFAULT_WINDOWS, spans=DEFAULT_SPANS, series=False, version=None):
+    """Rolling and exponentially weighted trends from start to end, or None without any plan.
+
+    'latest' holds the values on `end`; series adds them for every day.
+    Raises ValueError for bad windows, spans or ranges.
+    """
+    windows = _check(windows, 'window', MAX_WINDOW)
+    spans = _check(spans, 'span', MAX_SPAN)
+    if end < start:
+        raise ValueError('end must not be before start')
+    history = start - datetime.timedelta(days=lookback(windows, spans))
+    plan = load_range(user_id, history, end, version=version)
+    if not plan.plan_years:
+        return None
+    first = (start - history).days
+    weekdays = np.is_busday(plan.days)
+    workday_hours = prefix_sums(np.where(weekdays, plan.actual, 0))
+    workday_count = prefix_sums(weekdays)
+    hours = prefix_sums(plan.actual)
+    plan_days = np.isin(plan.days.astype('datetime64[Y]').astype(np.int64) + 1970, plan.plan_years)
+    plan_hours = prefix_sums(np.where(plan_days, plan.actual, 0))
+    target = prefix_sums(np.where(plan.planned, plan.targets, 0))
+    planned_count = prefix_sums(plan.planned)
+
+    # (window, avg per workday, hours, hours in plan years, target, planned days) per day;
+    # counts are exact in float64
+    rolling = []
+    for window in windows:
+        count = window_sums(workday_count, window, first)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg = np.where(count > 0, window_sums(workday_hours, window, first) / count, 0)
+        rolling.append((window, avg, window_sums(hours, window, first), window_sums(plan_hours, window, first),
+                        window_sums(target, window, first), window_sums(planned_count, window, first)))
+
+    # Workday EWMAs; each day takes the value of the last workday up to it, 0 before the first
+    last_workday = (np.cumsum(weekdays) - 1)[first:]
+    averages = []
+    for span in spans:
+        values = np.append(ewma(plan.actual[weekdays], span), 0.0)  # Index -1 reads the 0
+        averages.append((span, values[last_workday]))
+
+    data = {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'windows': windows,
+        'spans': spans,
+        'latest': {
+            'rolling': [{
+                'window': window,
+                'avgPerWorkday': _round(avg[-1]),
+                'hours': _round(window_hours[-1]),
+                'target': _round(window_target[-1]),
+                'utilization': _utilization(window_plan_hours[-1:], window_target[-1:], planned[-1:])[0],
+            } for window, avg, window_hours, window_plan_hours, window_target, planned in rolling],
+            'ewma': [{'span': span, 'value': _round(values[-1])} for span, values in averages],
+        },
+    }
+    if series:
+        data['series'] = {
+            'days': [str(d) for d in plan.days[first:]],
+            'rolling': [{'window': window, 'avgPerWorkday': _round(avg),
+                         'utilization': _utilization(window_plan_hours, window_target, planned)}
+                        for window, avg, _, window_plan_hours, window_target, planned in rolling],
+            'ewma': [{'span': span, 'values': _round(values)} for span, values in averages],
+        }
+    return data
+
+
+def year_trends(user_id, year, today, version=None):
+    # The dashboard's trends: `year` through today while it is running
+    end = datetime.date(year, 12, 31)
+    if year == today.year:
+        end = today
+    return trend_stats(user_id, datetime.date(year, 1, 1), end, series=True, version=version)
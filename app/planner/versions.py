@@ -0,0 +1,41 @@
+import datetime
+from flask import has_request_context
+from flask_login import current_user
+from sqlalchemy import update
+from .. import db
+from ..database import primary_reads
+from ..models import User
+
+# Per-user data versions.
+# Every write to a user's logs, goal, holidays or vacation days bumps
+# user.data_version inside the writing transaction, so a version number
+# identifies one state of everything the user's dashboards are computed from.
+
+
+def bump_data_version(user_id):
+    """Mark the user's data as changed; commits with the caller's transaction."""
+    bump_data_versions(User.id == user_id)
+
+
+def bump_data_versions(*where):
+    """Mark the data of every user matching `where` as changed, in one UPDATE; commits with the caller's transaction."""
+    db.session.execute(
+        update(User).where(*where).values(
+            data_version=User.data_version + 1,
+            data_updated_at=datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None, microsecond=0)
+        )
+    )
+
+
+def data_version(user_id):
+    """The user's data version, or None for an unknown user.
+
+    current_user's is reused, so a request looks plans up under the version
+    its ETag carries, without another query. Otherwise the User is read from
+    the primary, or from the session when it is already there.
+    """
+    if has_request_context() and current_user.is_authenticated and current_user.id == user_id:
+        return current_user.data_version
+    with primary_reads():
+        user = db.session.get(User, user_id)
+    return user.data_version if user is not None else None
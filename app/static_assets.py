@@ -0,0 +1,179 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from flask import abort, request, send_file
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip variants are built
+    brotli = None
+
+# Serving of the React production build.
+# The build directory is indexed once at startup: every file's mtime,
+# content hash and any precompressed .br/.gz sibling, with content-hashed
+# files from asset-manifest.json marked immutable. Requests are answered from
+# the index without touching the filesystem until the file is sent.
+
+MANIFEST = 'asset-manifest.json'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))  # In order of preference
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8,}\.')
+IMMUTABLE_MAX_AGE = 31536000  # One year
+COMPRESSIBLE = ('.js', '.css', '.html', '.json', '.map', '.svg', '.txt')
+
+
+class Asset:
+    __slots__ = ('path', 'mimetype', 'etag', 'mtime', 'immutable', 'variants')
+
+    def __init__(self, path, immutable):
+        self.path = path
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        with open(path, 'rb') as f:
+            self.etag = hashlib.md5(f.read()).hexdigest()
+        self.mtime = os.path.getmtime(path)
+        self.immutable = immutable
+        # encoding -> path of a precompressed copy, only when it is newer than the file
+        self.variants = {
+            encoding: path + suffix for encoding, suffix in ENCODINGS
+            if os.path.isfile(path + suffix) and os.path.getmtime(path + suffix) >= self.mtime
+        }
+
+
+class StaticAssets:
+    def __init__(self, app=None):
+        self.directory = None
+        self.assets = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FRONTEND_BUILD_DIR', os.path.join(app.root_path, 'static', 'frontend'))
+        self.directory = os.path.abspath(app.config['FRONTEND_BUILD_DIR'])
+        self.scan()
+        app.extensions['static_assets'] = self
+
+    def manifest_paths(self):
+        # Build-relative paths listed in asset-manifest.json
+        try:
+            with open(os.path.join(self.directory, MANIFEST)) as f:
+                files = json.load(f).get('files', {})
+        except (OSError, ValueError):
+            return set()
+        return {path.lstrip('/') for path in files.values()}
+
+    def scan(self):
+        """(Re)build the in-memory index of the build directory."""
+        listed = self.manifest_paths()
+        assets = {}
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+                    continue
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, self.directory).replace(os.sep, '/')
+                assets[rel] = Asset(path, immutable=rel in listed and bool(HASHED_NAME.search(name)))
+        self.assets = assets
+        return assets
+
+    def __contains__(self, rel):
+        return rel in self.assets
+
+    def send(self, rel):
+        """Response for a build-relative path, in the best encoding the client accepts."""
+        asset = self.assets.get(rel)
+        if asset is None:
+            abort(404)
+        path, encoding = asset.path, None
+        for candidate, _ in ENCODINGS:
+            if candidate in asset.variants and request.accept_encodings[candidate]:
+                path, encoding = asset.variants[candidate], candidate
+                break
+        # max_age=None makes send_file answer with no-cache, so unhashed files are always revalidated
+        response = send_file(path, mimetype=asset.mimetype, conditional=True,
+                             etag=asset.etag + (f'-{encoding}' if encoding else ''),
+                             last_modified=asset.mtime, max_age=IMMUTABLE_MAX_AGE if asset.immutable else None)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if asset.variants:
+            response.vary.add('Accept-Encoding')
+        if asset.immutable:
+            response.cache_control.immutable = True
+        return response
+
+    def precompress(self):
+        """Write .gz (and .br when brotli is installed) copies of compressible files.
+
+        Returns the number of files written and rescans the index.
+        """
+        written = 0
+        for asset in self.assets.values():
+            if not asset.path.endswith(COMPRESSIBLE):
+                continue
+            with open(asset.path, 'rb') as f:
+                data = f.read()
+            outputs = {'.gz': lambda: gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                outputs['.br'] = lambda: brotli.compress(data, quality=11)
+            for suffix, compress in outputs.items():
+                with open(asset.path + suffix, 'wb') as f:
+                    f.write(compress())
+                written += 1
+        self.scan()
+        return written
+
+    def nginx_config(self, upstream='127.0.0.1:5000', url_prefix='/static/frontend', brotli_static=False):
+        """nginx server block that serves the build directly and proxies everything else to Flask."""
+        # Directories holding content-hashed files; a bundler writes only hashed names there
+        immutable_dirs = sorted({rel.rsplit('/', 1)[0] for rel, a in self.assets.items() if a.immutable and '/' in rel})
+        lines = [
+            '# Generated by `flask assets nginx-config`; regenerate after each frontend build.',
+            'upstream billable_hours_app {',
+            f'    server {upstream};',
+            '}',
+            '',
+            'server {',
+            '    listen 80;',
+            '',
+        ]
+        for directory in immutable_dirs:
+            lines += [
+                '    # Content-hashed build output: cache forever',
+                f'    location {url_prefix}/{directory}/ {{',
+                f'        alias {os.path.join(self.directory, directory)}/;',
+                '        gzip_static on;',
+            ]
+            if brotli_static:
+                lines.append('        brotli_static on;')
+            lines += [
+                '        add_header Cache-Control "public, max-age=%d, immutable";' % IMMUTABLE_MAX_AGE,
+                '        access_log off;',
+                '    }',
+                '',
+            ]
+        lines += [
+            '    # Other build files must be revalidated',
+            f'    location {url_prefix}/ {{',
+            f'        alias {self.directory}/;',
+            '        gzip_static on;',
+        ]
+        if brotli_static:
+            lines.append('        brotli_static on;')
+        lines += [
+            '        add_header Cache-Control "no-cache";',
+            '    }',
+            '',
+            '    location / {',
+            '        proxy_pass http://billable_hours_app;',
+            '        proxy_set_header Host $host;',
+            '        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;',
+            '        proxy_set_header X-Forwarded-Proto $scheme;',
+            '    }',
+            '}',
+            '',
+        ]
+        return '\n'.join(lines)
+
+
+static_assets = StaticAssets()
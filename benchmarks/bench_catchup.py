@@ -0,0 +1,132 @@
+"""Benchmark and property checks for the catch-up plan optimizer.
+
+Checks thousands of random constraint sets: every feasible plan sums to
+exactly hours_needed (to the hundredth), respects each day's cap, never
+schedules blackout days or disallowed weekends and stays inside the horizon;
+the minimum-peak plan never peaks above the earliest-finish plan, which never
+finishes later. Then times the optimizer against the original greedy loop
+over one- and five-year horizons.
+
+    python benchmarks/bench_catchup.py [cases]
+"""
+import datetime
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.planner.catchup import MAX_HORIZON_DAYS, UNITS, suggest_catchup_plans  # noqa: E402
+
+BUDGET_MS = 10  # Per call at the five-year horizon
+
+
+def legacy_catchup_plans(hours_needed, max_workday_hours, weekend_policy, today):
+    # The original suggest_catchup_plans: one greedy fill, repeated three times
+    last_day = datetime.date(today.year, 12, 31)
+    days = [today + datetime.timedelta(days=i) for i in range((last_day - today).days + 1)]
+    plans = []
+    for _ in range(3):
+        plan = []
+        hours_left = hours_needed
+        d_idx = 0
+        while hours_left > 0 and d_idx < len(days):
+            d = days[d_idx]
+            if d.weekday() < 5:
+                assign = min(hours_left, max_workday_hours)
+            elif weekend_policy['allow']:
+                assign = min(hours_left, weekend_policy['max_hours'])
+            else:
+                d_idx += 1
+                continue
+            plan.append({'date': d, 'hours': assign})
+            hours_left -= assign
+            d_idx += 1
+        plans.append(plan)
+    return plans
+
+
+def random_case(rng):
+    start = datetime.date(2024, 1, 1) + datetime.timedelta(days=rng.randrange(1500))
+    horizon = rng.choice([1, 7, 30, 120, 365, 3 * 365, MAX_HORIZON_DAYS - 1])
+    finish_by = start + datetime.timedelta(days=rng.randrange(horizon))
+    span = (finish_by - start).days + 1
+    blackouts = [start + datetime.timedelta(days=rng.randrange(span)) for _ in range(rng.randrange(0, 30))]
+    day_caps = {start + datetime.timedelta(days=rng.randrange(span)): round(rng.uniform(0, 12), 2)
+                for _ in range(rng.randrange(0, 5))}
+    return {
+        'hours_needed': round(rng.choice([0, 0.01, 1, 7.77, 50, 333.33, 2000, 20000]) * rng.uniform(0.5, 1.5), 2),
+        'max_workday_hours': round(rng.choice([0, 0.5, 4, 8, 9.5, 12]), 2),
+        'weekend_policy': {'allow': rng.random() < 0.5, 'max_hours': round(rng.choice([0, 2, 4.25]), 2)},
+        'start': start,
+        'finish_by': finish_by,
+        'blackout_dates': blackouts,
+        'day_caps': day_caps,
+    }
+
+
+def check(case, plans):
+    needed = round(case['hours_needed'] * UNITS)
+    blackout = {d.isoformat() for d in case['blackout_dates']}
+    caps = {d.isoformat(): c for d, c in case['day_caps'].items()}
+    weekend = case['weekend_policy']
+    by_label = {p['label']: p for p in plans}
+    for plan in plans:
+        total = sum(round(day['hours'] * UNITS) for day in plan['plan'])
+        assert total == round(plan['total_hours'] * UNITS), (case, plan['label'])
+        assert plan['feasible'] == (total == needed), (case, plan['label'])
+        if plan['feasible']:
+            assert total == needed, (case, plan['label'], total, needed)
+        else:
+            assert total < needed
+        for day in plan['plan']:
+            date = datetime.date.fromisoformat(day['date'])
+            assert case['start'] <= date <= case['finish_by'], (case, day)
+            assert day['date'] not in blackout, (case, day)
+            assert day['hours'] > 0
+            if day['date'] in caps:
+                cap = caps[day['date']]
+            elif date.weekday() < 5:
+                cap = case['max_workday_hours']
+            else:
+                cap = weekend['max_hours'] if weekend['allow'] else 0
+            assert day['hours'] <= cap + 1e-9, (case, day, cap)
+    # Every strategy places the same hours; the trade-off is peak against finish date
+    assert len({round(p['total_hours'] * UNITS) for p in plans}) <= 1, case
+    if 'Gentle' in by_label:
+        assert by_label['Gentle']['peak_hours'] <= by_label['Aggressive']['peak_hours'], case
+        assert by_label['Aggressive']['end_date'] <= by_label['Gentle']['end_date'], case
+        assert by_label['Aggressive']['end_date'] <= by_label['Moderate']['end_date'] <= by_label['Gentle']['end_date'] \
+            or not by_label['Moderate']['feasible'], case
+
+
+def main():
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rng = random.Random(0)
+    feasible = 0
+    for _ in range(cases):
+        case = random_case(rng)
+        plans = suggest_catchup_plans(**case)
+        check(case, plans)
+        feasible += bool(plans) and plans[0]['feasible']
+    print(f'properties: {cases} random constraint sets pass ({feasible} feasible)')
+
+    start = datetime.date(2026, 1, 5)
+    weekend = {'allow': True, 'max_hours': 4}
+    number = 50
+    legacy = min(timeit.repeat(lambda: legacy_catchup_plans(400, 9, weekend, start), number=number, repeat=3)) / number
+    print(f'  legacy, rest of year:   {legacy * 1e3:7.2f} ms')
+    timings = {}
+    for label, finish_by in (('rest of year', datetime.date(2026, 12, 31)),
+                             ('five years', start + datetime.timedelta(days=MAX_HORIZON_DAYS - 1))):
+        holidays = [start + datetime.timedelta(days=d) for d in range(0, MAX_HORIZON_DAYS, 17)]
+        call = lambda: suggest_catchup_plans(400, 9, weekend, start, finish_by, holidays)  # noqa: E731
+        timings[label] = min(timeit.repeat(call, number=number, repeat=3)) / number
+        print(f'  optimizer, {label + ":":13} {timings[label] * 1e3:7.2f} ms')
+    if timings['five years'] * 1e3 > BUDGET_MS:
+        sys.exit(f'five-year horizon over budget: {timings["five years"] * 1e3:.2f} ms > {BUDGET_MS} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""Benchmark for the dashboard analytics kernel.
+
+Runs the original per-day dashboard analytics and dashboard_metrics() over a
+multi-year log history, checks that they agree, with and without rollups and
+with hours logged on weekends and a holiday, and times both.
+
+    python benchmarks/bench_dashboard_analytics.py [years]
+"""
+import datetime
+import os
+import random
+import sys
+import timeit
+from collections import Counter
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.planner.analytics import dashboard_metrics, dashboard_range  # noqa: E402
+from app.planner.engine import MONTHS, compute_year_plan  # noqa: E402
+from app.planner.ledger import YearLedger  # noqa: E402
+from app.planner.rollups import YearRollup  # noqa: E402
+
+
+def legacy_metrics(plan, all_logs, today, year, month, annual_goal, compare_start, compare_end):
+    # The analytics section of the original dashboard() view
+    logs_by_date = {d: h for d, h in all_logs.items() if d.year == year}
+    daily_plan = {d: h for d, h in plan.items() if d.month == month and d.year == year}
+    month_actual = sum(logs_by_date.get(d, 0) for d in daily_plan)
+    month_target = sum(daily_plan.values())
+    year_dates = list(plan.keys())
+    year_actual = sum(logs_by_date.get(d, 0) for d in year_dates)
+    year_target = sum(plan.values())
+    days_left = len([d for d in year_dates if d >= today])
+    hours_left = max(annual_goal - year_actual, 0)
+    catchup_per_day = round(hours_left / days_left, 2) if days_left > 0 else 0
+    first_day = datetime.date(year, month, 1)
+    last_day = datetime.date(year, month + 1, 1) - datetime.timedelta(days=1) if month < 12 else datetime.date(year, 12, 31)
+    month_days = [(first_day + datetime.timedelta(days=n)) for n in range((last_day - first_day).days + 1)]
+    month_logs = [logs_by_date.get(d, 0) for d in month_days]
+    month_targets = [daily_plan.get(d, 0) for d in month_days]
+    month_cum_actual, month_cum_target, cum_a, cum_t = [], [], 0, 0
+    for a, t in zip(month_logs, month_targets):
+        cum_a += a
+        cum_t += t
+        month_cum_actual.append(cum_a)
+        month_cum_target.append(cum_t)
+    year_days = sorted([d for d in plan.keys() if d.year == year])
+    year_logs = [logs_by_date.get(d, 0) for d in year_days]
+    year_targets = [plan.get(d, 0) for d in year_days]
+    year_cum_actual, year_cum_target, cum_a, cum_t = [], [], 0, 0
+    for a, t in zip(year_logs, year_targets):
+        cum_a += a
+        cum_t += t
+        year_cum_actual.append(cum_a)
+        year_cum_target.append(cum_t)
+    weekday_hours = Counter()
+    for d, h in logs_by_date.items():
+        weekday_hours[d.strftime('%A')] += h
+    weekday_labels = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    weekday_data = [weekday_hours.get(day, 0) for day in weekday_labels]
+    most_productive_day = max(weekday_hours, key=weekday_hours.get) if weekday_hours else None
+    streak = max_streak = 0
+    for d in sorted(year_days):
+        if logs_by_date.get(d, 0) > 0:
+            streak += 1
+            max_streak = max(max_streak, streak)
+        else:
+            streak = 0
+    cmp_dates = [compare_start + datetime.timedelta(days=i) for i in range((compare_end - compare_start).days + 1)]
+    cmp_logs = {d: h for d, h in all_logs.items() if compare_start <= d <= compare_end}
+    cmp_month_logs = [cmp_logs.get(d, 0) for d in cmp_dates]
+    cmp_month_targets = [plan.get(d, 0) for d in cmp_dates]
+
+    def avg_billable(logs, days):
+        if not days:
+            return 0
+        workdays = [d for d in days if d.weekday() < 5]
+        if not workdays:
+            return 0
+        return sum([logs.get(d, 0) for d in workdays]) / len(workdays)
+
+    primary_avg = avg_billable(dict(zip(month_days, month_logs)), month_days)
+    cmp_avg = avg_billable(dict(zip(cmp_dates, cmp_month_logs)), cmp_dates) if cmp_dates else None
+    last14 = [today - datetime.timedelta(days=i) for i in range(14)][::-1]
+    last30 = [today - datetime.timedelta(days=i) for i in range(30)][::-1]
+    avg_14 = avg_billable(all_logs, last14)
+    avg_30 = avg_billable(all_logs, last30)
+    ytd_days = [datetime.date(today.year, 1, 1) + datetime.timedelta(days=i) for i in range((today - datetime.date(today.year, 1, 1)).days + 1)]
+    avg_ytd = avg_billable(all_logs, ytd_days)
+    actual_ytd = sum([all_logs.get(d, 0) for d in ytd_days])
+    end = datetime.date(today.year, 12, 31)
+    remaining_days = [d for d in [today + datetime.timedelta(days=i) for i in range((end - today).days + 1)] if d.weekday() < 5]
+    req_avg = (max(annual_goal - actual_ytd, 0) / len(remaining_days)) if remaining_days else 0
+    total_workdays = [d for d in [datetime.date(today.year, 1, 1) + datetime.timedelta(days=i) for i in range((end - datetime.date(today.year, 1, 1)).days + 1)] if d.weekday() < 5]
+    projected_total = (avg_ytd * len(total_workdays)) if avg_ytd else actual_ytd
+    expected_as_of_today = sum([plan.get(d, 0) for d in ytd_days])
+    avg_day_target = (annual_goal / len(total_workdays)) if total_workdays else 0
+    days_ahead_behind = ((actual_ytd - expected_as_of_today) / avg_day_target) if avg_day_target else 0
+    return {
+        'month_actual': month_actual, 'month_target': month_target, 'year_actual': year_actual,
+        'year_target': year_target, 'catchup_per_day': catchup_per_day, 'month_logs': month_logs,
+        'month_cum_actual': month_cum_actual, 'month_cum_target': month_cum_target,
+        'year_cum_actual': year_cum_actual, 'year_cum_target': year_cum_target,
+        'weekday_data': weekday_data, 'most_productive_day': most_productive_day, 'streak': max_streak,
+        'cmp_month_logs': cmp_month_logs, 'cmp_month_targets': cmp_month_targets,
+        'primary_avg': primary_avg, 'cmp_avg': cmp_avg, 'avg_14': avg_14, 'avg_30': avg_30,
+        'avg_ytd': avg_ytd, 'actual_ytd': actual_ytd, 'req_avg': req_avg,
+        'projected_total': projected_total, 'days_ahead_behind': days_ahead_behind,
+    }
+
+
+def synthetic_history(years, today, seed=0):
+    rng = random.Random(seed)
+    logs = {}
+    d = datetime.date(today.year - years + 1, 1, 1)
+    while d <= today:
+        if d.weekday() < 5 and rng.random() < 0.92:
+            logs[d] = round(rng.uniform(3, 11), 1)
+        elif rng.random() < 0.1:
+            logs[d] = round(rng.uniform(0, 4), 1)
+        d += datetime.timedelta(days=1)
+    return logs
+
+
+def year_rollups(all_logs, years):
+    # {year: YearRollup} as record_changes() would leave them for these logs
+    rollups = {year: YearRollup(year) for year in years}
+    for d, h in sorted(all_logs.items()):
+        if d.year in rollups:
+            rollup, i = rollups[d.year], d.timetuple().tm_yday - 1
+            rollup.month_hours[d.month - 1] += h
+            rollup.month_days[d.month - 1] += 1
+            rollup.weekday_hours[d.weekday()] += h
+            rollup.weekday_days[d.weekday()] += 1
+            rollup.logged[i] = True
+            rollup.active[i] = h > 0
+    return rollups
+
+
+def main():
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    today = datetime.date.today()
+    goal = SimpleNamespace(year=today.year, annual_goal=1900)
+    # A holiday early in the year, so it is past and logged whatever today is; the history logs some weekends too
+    holiday = np.busday_offset(np.datetime64(f'{today.year}-01-02'), 0, roll='forward').item()
+    holidays = [SimpleNamespace(date=holiday)]
+    ledger = YearLedger.from_year_plan(compute_year_plan(goal.year, goal.annual_goal, {m: 1.0 for m in MONTHS},
+                                                         holidays, []))
+    plan = ledger.as_dict()
+    all_logs = synthetic_history(years, today)
+    all_logs[holiday] = 6.5
+    compare_start, compare_end = datetime.date(today.year - 1, 1, 1), datetime.date(today.year - 1, 3, 31)
+    start, end = dashboard_range(today, today.year, compare_start, compare_end)
+    # The view queries only the dashboard range; the legacy view loaded every log
+    in_range = sorted((d, h) for d, h in all_logs.items() if start <= d <= end)
+    log_dates = np.array([d for d, _ in in_range], dtype='datetime64[D]')
+    log_hours = np.array([h for _, h in in_range])
+    args = (today, today.year, today.month, goal.annual_goal, compare_start, compare_end)
+
+    expected = legacy_metrics(plan, all_logs, *args)
+    rollups = year_rollups(all_logs, {today.year})
+    for rollup_arg in (None, rollups):
+        actual = dashboard_metrics(ledger, log_dates, log_hours, *args, rollups=rollup_arg)
+        for key, value in expected.items():
+            assert np.allclose(np.array(actual[key], dtype=float), np.array(value, dtype=float)) if key != 'most_productive_day' else actual[key] == value, (key, rollup_arg is not None)
+    # The API's month and year actuals, from the ledger with the year's logs
+    year_ledger = ledger.with_actuals(log_dates, log_hours)
+    assert year_ledger.actual_total(year_ledger.month(today.month)) == expected['month_actual']
+    assert year_ledger.actual_total() == expected['year_actual']
+    unplanned = sum(h for d, h in all_logs.items() if d.year == today.year and d <= today and d not in plan)
+    print(f'parity: {len(expected)} metrics match over {len(all_logs)} logs ({years} years), with and without rollups; '
+          f'{unplanned:.1f} hours logged on weekends and holidays left out of the actuals')
+
+    number = 20
+    legacy = min(timeit.repeat(lambda: legacy_metrics(plan, all_logs, *args), number=number, repeat=3)) / number
+    kernel = min(timeit.repeat(lambda: dashboard_metrics(ledger, log_dates, log_hours, *args), number=number, repeat=3)) / number
+    print(f'  legacy: {legacy * 1e3:7.2f} ms')
+    print(f'  kernel: {kernel * 1e3:7.2f} ms  ({legacy / kernel:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
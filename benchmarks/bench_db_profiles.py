@@ -0,0 +1,110 @@
+"""Concurrent write/read throughput for each database engine profile.
+
+For every profile, builds a synthetic firm in a fresh database, then runs
+writer threads that log hours through the dashboard form next to reader
+threads that fetch the dashboard JSON, each thread as its own logged-in
+user, and reports operations per second, errors and p95 latency. SQLite
+profiles run against a temporary file; set BENCH_POSTGRES_URL to an empty
+PostgreSQL database to include the postgresql profile (its tables are
+dropped afterwards).
+
+    python benchmarks/bench_db_profiles.py [seconds] [writers] [readers]
+"""
+import datetime
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import User  # noqa: E402
+from synthetic import PASSWORD, populate  # noqa: E402
+
+
+def make_app(profile, url):
+    os.environ['DATABASE_URL'] = url
+    os.environ['DB_PROFILE'] = profile
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+def worker(app, email, deadline, results, write, seed):
+    rng = random.Random(seed)
+    client = app.test_client()
+    client.post('/auth/login', data={'email': email, 'password': PASSWORD})
+    today = datetime.date.today()
+    latencies, errors = [], 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            if write:
+                day = today - datetime.timedelta(days=rng.randrange(60))
+                response = client.post('/planner/', data={'log_date': day.isoformat(),
+                                                          'log_hours': str(round(rng.uniform(1, 10), 1))})
+                ok = response.status_code == 302
+            else:
+                ok = client.get('/planner/api/dashboard').status_code == 200
+        except Exception:  # Lock timeouts and the like count as failed operations
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - started)
+        else:
+            errors += 1
+    results.append((write, latencies, errors))
+
+
+def p95(values):
+    return sorted(values)[int(len(values) * 0.95)] * 1e3 if values else float('nan')
+
+
+def run(profile, url, seconds, writers, readers):
+    app = make_app(profile, url)
+    with app.app_context():
+        db.create_all()
+        user_ids = populate(users=writers + readers, years=1)
+        emails = [db.session.get(User, uid).email for uid in user_ids]
+        database = db.engine.dialect.name
+        if database == 'sqlite':
+            database += f" ({db.session.execute(db.text('PRAGMA journal_mode')).scalar()})"
+    results = []
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=worker, args=(app, email, deadline, results, i < writers, i))
+               for i, email in enumerate(emails)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if not url.startswith('sqlite'):
+        with app.app_context():
+            db.drop_all()
+    row = {'profile': profile, 'database': database}
+    for write, label in ((True, 'write'), (False, 'read')):
+        latencies = [x for w, lat, _ in results if w == write for x in lat]
+        row[label] = (len(latencies) / seconds, sum(e for w, _, e in results if w == write), p95(latencies))
+    return row
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    writers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    readers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    workdir = tempfile.mkdtemp(prefix='bht-profiles-')
+    targets = [(profile, f'sqlite:///{os.path.join(workdir, profile + ".sqlite3")}') for profile in ('default', 'sqlite')]
+    if os.environ.get('BENCH_POSTGRES_URL'):
+        targets += [('default', os.environ['BENCH_POSTGRES_URL']), ('postgresql', os.environ['BENCH_POSTGRES_URL'])]
+    print(f'{writers} writers and {readers} readers for {seconds:g} s per profile')
+    print(f'{"profile":12}{"database":16}{"writes/s":>10}{"errors":>8}{"p95 ms":>9}{"reads/s":>10}{"errors":>8}{"p95 ms":>9}')
+    for profile, url in targets:
+        row = run(profile, url, seconds, writers, readers)
+        (writes, write_errors, write_p95), (reads, read_errors, read_p95) = row['write'], row['read']
+        print(f'{profile:12}{row["database"]:16}{writes:10.1f}{write_errors:8d}{write_p95:9.1f}'
+              f'{reads:10.1f}{read_errors:8d}{read_p95:9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark for the firm-wide report.
+
+Populates SQLite with synthetic users (default 5,000) and 3 years of logs,
+then times build_firm_report() and the paginated /planner/api/reports/firm
+endpoint against a latency budget. A sample of users is checked against the
+single-user plan engine, with actuals summed over the planned days' logs.
+
+    python benchmarks/bench_firm_report.py [users] [years]
+"""
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import BillableHourGoal, DailyLog, User, VacationDay  # noqa: E402
+from app.planner.calendars import user_holiday_mask  # noqa: E402
+from app.planner.plans import generate_plan  # noqa: E402
+from app.planner.reporting import build_firm_report  # noqa: E402
+from synthetic import PASSWORD, populate  # noqa: E402
+
+LATENCY_BUDGET = 2.0  # seconds for the full report at 5,000 users
+
+
+def check_sample(report, sample=20):
+    for i in np.linspace(0, len(report) - 1, sample).astype(int):
+        uid = int(report.user_ids[i])
+        goal = BillableHourGoal.query.filter_by(user_id=uid, year=report.year).first()
+        plan, _ = generate_plan(goal, (), VacationDay.query.filter_by(user_id=uid).all(), goal.workload_weights,
+                                user_holiday_mask(uid, report.year))
+        expected = sum(h for d, h in plan.items() if d <= report.as_of)
+        assert abs(expected - report.target_to_date[i]) < 0.01 * len(plan), (uid, expected, report.target_to_date[i])
+        logs = DailyLog.query.filter(DailyLog.user_id == uid, DailyLog.date >= datetime.date(report.year, 1, 1),
+                                     DailyLog.date <= report.as_of)
+        # Hours on weekends, holidays and vacation days are not part of the report's actuals
+        expected = sum(log.hours for log in logs if log.date in plan)
+        assert abs(expected - report.actual[i]) < 1e-6, (uid, expected, report.actual[i])
+        assert abs(report.monthly_actual[i].sum() - report.actual[i]) < 1e-6, uid
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    years = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.sqlite3")}'
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        user_ids = populate(users=users, years=years)
+        print(f'populated {len(user_ids)} users x {years} years in {time.perf_counter() - start:.1f}s')
+        admin = db.session.get(User, user_ids[0])
+        app.config['FIRM_ADMINS'] = [admin.email]
+
+        year = datetime.date.today().year
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            report = build_firm_report(year)
+            timings.append(time.perf_counter() - start)
+        check_sample(report)
+        print(f'build_firm_report: {min(timings) * 1e3:.0f} ms for {len(report)} users '
+              f'({report.summary()["at_risk"]} at risk)')
+
+    client = app.test_client()
+    client.post('/auth/login', data={'email': admin.email, 'password': PASSWORD})
+    start = time.perf_counter()
+    response = client.get(f'/planner/api/reports/firm?year={year}&sort=utilization&per_page=100')
+    api = time.perf_counter() - start
+    assert response.status_code == 200, response.status_code
+    print(f'/planner/api/reports/firm: {api * 1e3:.0f} ms (budget {LATENCY_BUDGET * 1e3:.0f} ms)')
+    if users >= 5000 and api > LATENCY_BUDGET:
+        sys.exit(f'over latency budget: {api:.2f}s > {LATENCY_BUDGET:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Monte Carlo year-end forecast: accuracy and speed.
+
+Checks the simulated totals against their exact mean and variance, and the
+goal date against a per-path loop. Then times 10,000 paths for one user with
+a whole year, half a year and a month left, and a firm-sized batch.
+
+    python benchmarks/bench_forecast.py [users]
+"""
+import os
+import sys
+import time
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.planner.forecast import DEFAULT_PATHS, FIRM_PATHS, forecast, simulate  # noqa: E402
+
+BUDGET_MS = 50  # 10,000 paths for one user, so the forecast can sit on the dashboard
+
+
+def history(rng, days):
+    # Hours over target: mostly near plan, some short days and skipped ones
+    return np.where(rng.random(days) < 0.1, 0.0, np.round(rng.normal(1.0, 0.25, days).clip(0, 2), 2))
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rng = np.random.default_rng(0)
+    ratios = history(rng, 180)
+    targets = np.round(rng.choice([6.5, 7.2, 8.1], 120), 2)
+
+    # Totals: the sum over days of target x a uniformly drawn ratio
+    result = forecast([900.0], [1800.0], [ratios], [targets], 50000, np.random.default_rng(1))
+    totals, _ = simulate(targets[None, :].astype(np.float32), ratios[None, :].astype(np.float32),
+                         np.array([len(ratios)]), np.array([900.0]), 50000, np.random.default_rng(1))
+    mean = (targets * ratios.mean()).sum()
+    std = np.sqrt((targets ** 2).sum() * ratios.var())
+    assert abs(totals.mean() - mean) < 4 * std / np.sqrt(50000), (totals.mean(), mean)
+    assert abs(totals.std() / std - 1) < 0.02, (totals.std(), std)
+    assert result.p10[0] < 900 + mean < result.p90[0]
+
+    # Goal days against a loop over each path's draws, replayed from the same seed
+    need = 0.6 * mean
+    paths = 200
+    _, reach = simulate(targets[None, :].astype(np.float32), ratios[None, :].astype(np.float32),
+                        np.array([len(ratios)]), np.array([need]), paths, np.random.default_rng(2))
+    bits = np.frombuffer(np.random.default_rng(2).bytes(2 * len(targets) * paths), dtype=np.uint16)
+    draws = ratios.astype(np.float32)[(bits.astype(np.int64) * len(ratios)) >> 16].reshape(len(targets), paths)
+    hours = draws * targets.astype(np.float32)[:, None]
+    for path in range(paths):
+        running, day = 0.0, len(targets)
+        for d in range(len(targets)):
+            running += float(hours[d, path])
+            if running >= need:
+                day = d
+                break
+        assert reach[0, path] == day, (path, reach[0, path], day)
+    print(f'accuracy: totals mean {totals.mean():.1f} (exact {mean:.1f}) and spread match, goal days match a per-path loop')
+
+    for days in (250, 125, 22):
+        remaining = [np.full(days, 7.2)]
+        elapsed = min(timeit.repeat(lambda: forecast([0.0], [1800.0], [ratios], remaining, DEFAULT_PATHS, rng),
+                                    number=5, repeat=3)) / 5
+        print(f'  {DEFAULT_PATHS} paths, {days:3d} days left: {elapsed * 1e3:6.2f} ms')
+        if days == 250 and elapsed * 1e3 > BUDGET_MS:
+            sys.exit(f'one forecast took {elapsed * 1e3:.1f} ms (budget {BUDGET_MS} ms)')
+
+    histories = [history(rng, int(n)) for n in rng.integers(5, 200, users)]
+    remaining = [np.full(int(n), 7.2) for n in rng.integers(100, 110, users)]
+    start = time.perf_counter()
+    batch = forecast(np.full(users, 700.0), np.full(users, 1800.0), histories, remaining, FIRM_PATHS, rng)
+    elapsed = time.perf_counter() - start
+    print(f'  batch: {users} users x {FIRM_PATHS} paths in {elapsed * 1e3:.0f} ms '
+          f'({elapsed / users * 1e3:.2f} ms per user, median probability {np.median(batch.probability):.2f})')
+
+
+if __name__ == '__main__':
+    main()
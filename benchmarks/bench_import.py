@@ -0,0 +1,88 @@
+"""Benchmark for the bulk time-entry import.
+
+Writes a synthetic 100k-row CSV export (several matters per day) and imports
+it into a fresh SQLite database with import_logs(). For comparison it also
+times the old one-SELECT-and-commit-per-entry path on a sample of rows.
+
+    python benchmarks/bench_import.py [rows]
+"""
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import DailyLog, User  # noqa: E402
+from app.planner.imports import import_logs  # noqa: E402
+
+
+def write_export(path, rows, seed=0):
+    rng = random.Random(seed)
+    day = datetime.date(1990, 1, 1)
+    written = 0
+    with open(path, 'w') as f:
+        f.write('date,hours,matter\n')
+        while written < rows:
+            for matter in range(rng.randint(1, 6)):
+                f.write(f'{day.isoformat()},{rng.uniform(0.1, 3):.1f},M-{matter:04d}\n')
+                written += 1
+                if written == rows:
+                    break
+            day += datetime.timedelta(days=1)
+
+
+def legacy_import(user_id, path, limit):
+    # The dashboard POST branch, once per entry
+    with open(path) as f:
+        next(f)
+        for line, _ in zip(f, range(limit)):
+            date_str, hours, _matter = line.rstrip('\n').split(',')
+            date = datetime.date.fromisoformat(date_str)
+            log = DailyLog.query.filter_by(user_id=user_id, date=date).first()
+            if log:
+                log.hours = float(hours)
+            else:
+                db.session.add(DailyLog(user_id=user_id, date=date, hours=float(hours)))
+            db.session.commit()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.sqlite3")}'
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User(email='bench@example.com', password_hash='x')
+        legacy_user = User(email='legacy@example.com', password_hash='x')
+        db.session.add_all([user, legacy_user])
+        db.session.commit()
+
+        path = os.path.join(tmp, 'export.csv')
+        write_export(path, rows)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        with open(path, 'rb') as f:
+            result = import_logs(user.id, f, 'csv')
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert result.error_count == 0 and result.rows_imported == rows, result.as_dict()
+        print(f'import_logs: {rows} rows -> {result.days_written} days in {elapsed:.2f}s '
+              f'({rows / elapsed:,.0f} rows/s, peak {peak / 2**20:.1f} MiB)')
+
+        sample = 1000
+        start = time.perf_counter()
+        legacy_import(legacy_user.id, path, sample)
+        legacy = (time.perf_counter() - start) / sample
+        print(f'per-entry ORM path: {1 / legacy:,.0f} rows/s (est. {legacy * rows:.0f}s for {rows} rows)')
+
+
+if __name__ == '__main__':
+    main()
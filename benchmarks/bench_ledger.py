@@ -0,0 +1,74 @@
+"""YearLedger against the {date: hours} plan dict it replaces in the plan cache.
+
+Checks that the ledger reproduces the dict exactly for random goals, weights
+and vacations, then compares memory, pickled size (what the Redis backend
+stores) and the lookups the dashboard and API make.
+
+    python benchmarks/bench_ledger.py
+"""
+import datetime
+import os
+import pickle
+import random
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.planner.engine import MONTHS, compute_year_plan  # noqa: E402
+from app.planner.ledger import YearLedger  # noqa: E402
+
+
+def random_plan(rng, year):
+    weights = {m: rng.choice([0, 0.8, 1.0, 1.0, 1.2, 1.5]) for m in MONTHS}
+    vacations = [datetime.date(year, 1, 1) + datetime.timedelta(days=d) for d in rng.sample(range(365), 20)]
+    return compute_year_plan(year, rng.choice([1200, 1600, 1800, 2000, 2400]), weights, [], vacations)
+
+
+def allocated(build):
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def main():
+    rng = random.Random(0)
+    for _ in range(300):
+        year_plan = random_plan(rng, rng.randrange(2020, 2030))
+        ledger = YearLedger.from_year_plan(year_plan)
+        plan = year_plan.as_dict()
+        restored = pickle.loads(pickle.dumps(ledger))
+        assert restored.as_dict() == plan == ledger.as_dict()
+        for month in range(1, 13):
+            assert ledger.total(ledger.month(month)) == sum(h for d, h in plan.items() if d.month == month)
+        assert ledger.total() == sum(plan.values())
+        day = datetime.date(year_plan.year, 1, 1) + datetime.timedelta(days=rng.randrange(365))
+        assert ledger.target_on(day) == plan.get(day)
+    print('parity: 300 random plans identical, totals equal')
+
+    year_plan = random_plan(random.Random(1), datetime.date.today().year)
+    plan, plan_bytes = allocated(year_plan.as_dict)
+    ledger, ledger_bytes = allocated(lambda: YearLedger.from_year_plan(year_plan))
+    print(f'  memory:   dict {plan_bytes:7d} B   ledger {ledger_bytes:7d} B')
+    print(f'  pickled:  dict {len(pickle.dumps(plan)):7d} B   ledger {len(pickle.dumps(ledger)):7d} B')
+
+    day = datetime.date(year_plan.year, 6, 12)
+    data = ledger.to_bytes()
+    cases = [
+        ('day lookup', lambda: plan.get(day), lambda: ledger.target_on(day)),
+        ('month total', lambda: sum(h for d, h in plan.items() if d.month == 6), lambda: ledger.total(ledger.month(6))),
+        ('year total', lambda: sum(plan.values()), lambda: ledger.total()),
+        ('unpickle', lambda: pickle.loads(pickle.dumps(plan)), lambda: YearLedger.from_bytes(data)),
+    ]
+    number = 2000
+    for label, old, new in cases:
+        before = min(timeit.repeat(old, number=number, repeat=5)) / number * 1e6
+        after = min(timeit.repeat(new, number=number, repeat=5)) / number * 1e6
+        print(f'  {label:12} dict {before:8.2f} us   ledger {after:8.2f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Microbenchmark for the plan engine.
+
+Compares the numpy-based generate_plan against the original per-day loop
+implementation and checks that both return identical plans before timing.
+
+    python benchmarks/bench_plan_engine.py
+"""
+import datetime
+import os
+import random
+import sys
+import timeit
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.planner.engine import MONTHS  # noqa: E402
+from app.planner.plans import generate_plan  # noqa: E402
+
+
+def legacy_get_working_days(year, holidays, vacation_days):
+    start = datetime.date(year, 1, 1)
+    end = datetime.date(year, 12, 31)
+    day_count = (end - start).days + 1
+    holidays_set = set(h.date for h in holidays)
+    vacation_set = set(v.date for v in vacation_days)
+    working_days = []
+    for n in range(day_count):
+        d = start + datetime.timedelta(days=n)
+        if d.weekday() >= 5:
+            continue
+        if d in holidays_set or d in vacation_set:
+            continue
+        working_days.append(d)
+    return working_days
+
+
+def legacy_generate_plan(goal, holidays, vacation_days, workload_weights):
+    working_days = legacy_get_working_days(goal.year, holidays, vacation_days)
+    month_working_days = {m: [] for m in MONTHS}
+    for d in working_days:
+        month_working_days[MONTHS[d.month - 1]].append(d)
+    total_weighted_days = 0
+    weighted_days_per_month = {}
+    for m in MONTHS:
+        weight = workload_weights.get(m, 1.0)
+        count = len(month_working_days[m])
+        weighted_days_per_month[m] = count * weight
+        total_weighted_days += count * weight
+    plan = {}
+    monthly_targets = {}
+    for m in MONTHS:
+        if weighted_days_per_month[m] == 0:
+            monthly_targets[m] = 0
+            continue
+        month_goal = (weighted_days_per_month[m] / total_weighted_days) * goal.annual_goal
+        daily_target = month_goal / len(month_working_days[m]) if month_working_days[m] else 0
+        if daily_target > 10:
+            daily_target = 10
+        for d in month_working_days[m]:
+            plan[d] = round(daily_target, 2)
+        monthly_targets[m] = round(month_goal, 1)
+    return plan, monthly_targets
+
+
+def random_inputs(rng):
+    year = rng.randint(2020, 2030)
+    goal = SimpleNamespace(year=year, annual_goal=rng.choice([0, 1200, 1800, 2100, 3000, 5000]))
+    start = datetime.date(year, 1, 1)
+    holidays = [SimpleNamespace(date=start + datetime.timedelta(days=rng.randint(0, 364))) for _ in range(rng.randint(0, 15))]
+    vacation_days = [SimpleNamespace(date=start + datetime.timedelta(days=rng.randint(0, 364))) for _ in range(rng.randint(0, 30))]
+    weights = {m: rng.choice([0, 0.5, 1, 1.0, 1.25, 1.5]) for m in MONTHS if rng.random() < 0.8}
+    return goal, holidays, vacation_days, weights
+
+
+def check_parity(cases=500, seed=0):
+    rng = random.Random(seed)
+    for _ in range(cases):
+        goal, holidays, vacation_days, weights = random_inputs(rng)
+        expected = legacy_generate_plan(goal, holidays, vacation_days, weights)
+        actual = generate_plan(goal, holidays, vacation_days, weights)
+        assert actual == expected, (goal, weights)
+    return cases
+
+
+def main():
+    cases = check_parity()
+    print(f'parity: {cases} random plans identical')
+    goal, holidays, vacation_days, weights = random_inputs(random.Random(1))
+    number = 200
+    for label, fn in (('legacy', legacy_generate_plan), ('engine', generate_plan)):
+        best = min(timeit.repeat(lambda: fn(goal, holidays, vacation_days, weights), number=number, repeat=5))
+        print(f'{label:>8}: {best / number * 1e6:8.1f} us/plan')
+
+
+if __name__ == '__main__':
+    main()
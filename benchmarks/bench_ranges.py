@@ -0,0 +1,139 @@
+"""Benchmark and parity check for multi-year and fiscal-year ranges.
+
+Builds a synthetic user with three years of goals and logs, then checks
+random ranges (including fiscal years and every grouping) against sums over
+the single-year plans and the raw logs, and monthly actuals (rollups plus the
+partial edge months) against daily ones, also on a database that had logs
+before the rollup migration ran. Times warm one-month and
+three-year ranges grouped by month: joining cached year segments and reading
+whole months from the rollups should keep the three-year range within a
+small multiple of the month.
+
+    python benchmarks/bench_ranges.py [cases]
+"""
+import datetime
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+import sqlalchemy as sa
+from flask_migrate import upgrade
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import DailyLog  # noqa: E402
+from app.planner.plans import load_plan  # noqa: E402
+from app.planner.rollups import verify  # noqa: E402
+from app.planner.ranges import DAILY_GROUPS, GROUPS, fiscal_year_range, load_range  # noqa: E402
+from synthetic import populate  # noqa: E402
+
+MAX_RATIO = 3.0  # Three-year range against one month, both with warm plan caches
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+PRE_ROLLUPS = '8d41b6a0e2f7'  # Last revision without the rollup tables
+
+
+def expected_totals(user_id, start, end):
+    target = 0.0
+    for year in range(start.year, end.year + 1):
+        cached = load_plan(user_id, year)
+        if cached:
+            target += sum(h for d, h in cached['ledger'].as_dict().items() if start <= d <= end)
+    actual = sum(h for (h,) in db.session.query(DailyLog.hours).filter(
+        DailyLog.user_id == user_id, DailyLog.date >= start, DailyLog.date <= end))
+    return target, actual
+
+
+def check(user_id, start, end, fiscal_start_month):
+    plan = load_range(user_id, start, end, fiscal_start_month)
+    target, actual = expected_totals(user_id, start, end)
+    assert abs(plan.targets.sum() - target) < 1e-6, (start, end, plan.targets.sum(), target)
+    assert abs(plan.actual.sum() - actual) < 1e-6, (start, end, plan.actual.sum(), actual)
+    for group in GROUPS:
+        periods = plan.totals(group)
+        assert periods[0]['start'] == start.isoformat() and periods[-1]['end'] == end.isoformat(), group
+        assert abs(sum(p['target'] for p in periods) - target) < 0.01 * len(periods) + 1e-6, group
+        assert sum(p['plannedDays'] for p in periods) == int(plan.planned.sum()), group
+        for before, after in zip(periods, periods[1:]):
+            gap = datetime.date.fromisoformat(after['start']) - datetime.date.fromisoformat(before['end'])
+            assert gap == datetime.timedelta(days=1), (group, before, after)
+    monthly = load_range(user_id, start, end, fiscal_start_month, daily=False)
+    for group in GROUPS:
+        if group not in DAILY_GROUPS:
+            assert monthly.totals(group) == plan.totals(group), (start, end, group)
+
+
+def check_backfill(cases):
+    # Logs written before the rollup tables existed must be in them after the upgrade,
+    # or whole months read 0 by month while the same range by day has the hours
+    url = os.environ.get('DATABASE_URL')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tempfile.mkdtemp(), "backfill.sqlite3")}'
+    app = create_app()
+    if url is None:
+        del os.environ['DATABASE_URL']
+    else:
+        os.environ['DATABASE_URL'] = url
+    with app.app_context():
+        upgrade(MIGRATIONS, PRE_ROLLUPS)
+        users = sa.table('user', sa.column('id'), sa.column('email'), sa.column('password_hash'))
+        logs = sa.table('daily_log', sa.column('user_id'), sa.column('date'), sa.column('hours'))
+        db.session.execute(users.insert(), [{'id': uid, 'email': f'backfill{uid}@bench.example', 'password_hash': ''}
+                                            for uid in (1, 2)])
+        rng = random.Random(1)
+        first = datetime.date(datetime.date.today().year - 2, 1, 1)
+        days = [first + datetime.timedelta(days=n) for n in range(3 * 365)]
+        db.session.execute(logs.insert(), [{'user_id': uid, 'date': day, 'hours': rng.choice([0.0, 2.5, 6.0, 8.0])}
+                                           for uid in (1, 2) for day in days if rng.random() < 0.6])
+        db.session.commit()
+        upgrade(MIGRATIONS)
+        assert verify() == [], 'rollups drifted from the logs right after the migration'
+        for _ in range(cases):
+            start = rng.choice(days)
+            end = min(start + datetime.timedelta(days=rng.randrange(400)), days[-1])
+            for uid in (1, 2):
+                plan, monthly = load_range(uid, start, end), load_range(uid, start, end, daily=False)
+                assert abs(monthly.actual.sum() - plan.actual.sum()) < 1e-6, (uid, start, end)
+                assert monthly.totals('month') == plan.totals('month'), (uid, start, end)
+    print(f'backfill: {cases} ranges on a database upgraded past the rollup migration match the raw logs')
+
+
+def main():
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    check_backfill(cases // 10)
+    os.environ.setdefault('DATABASE_URL', 'sqlite://')
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        today = datetime.date.today()
+        (user_id,) = populate(users=1, years=3, end=today)
+        first = datetime.date(today.year - 3, 7, 1)  # Reaches into a year without a goal
+        span = (datetime.date(today.year, 12, 31) - first).days
+        rng = random.Random(0)
+        for _ in range(cases):
+            start = first + datetime.timedelta(days=rng.randrange(span))
+            end = start + datetime.timedelta(days=rng.randrange(min(span - (start - first).days, 3 * 366)))
+            check(user_id, start, end, rng.choice([1, 4, 7, 10]))
+        for start_month in (1, 7):
+            start, end = fiscal_year_range(today.year, start_month)
+            check(user_id, start, end, start_month)
+            assert len(load_range(user_id, start, end, start_month).totals('fiscal_year')) == 1
+        print(f'parity: {cases} random ranges and fiscal years match the single-year plans and raw logs')
+
+        month = (datetime.date(today.year, today.month, 1), today)
+        three_years = (datetime.date(today.year - 2, 1, 1), datetime.date(today.year, 12, 31))
+        timings = {}
+        for label, (start, end) in (('one month', month), ('three years', three_years)):
+            load_range(user_id, start, end)  # Warm the plan cache
+            call = lambda: load_range(user_id, start, end, daily=False).totals('month')  # noqa: E731
+            timings[label] = min(timeit.repeat(call, number=50, repeat=3)) / 50
+            print(f'  {label + ":":13} {timings[label] * 1e3:6.2f} ms')
+        ratio = timings['three years'] / timings['one month']
+        print(f'  ratio: {ratio:.1f}x (limit {MAX_RATIO}x)')
+        if ratio > MAX_RATIO:
+            sys.exit(f'three-year range costs {ratio:.1f}x a month view')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Rolling windows and EWMAs from prefix sums against direct computation.
+
+Checks window_sums() against a sum over each window and ewma() against the
+recurrence for ten years of random daily hours, then times every window width
+both ways: the prefix-sum cost should stay flat as the window grows.
+
+    python benchmarks/bench_trends.py [years]
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.planner.trends import ewma, prefix_sums, window_sums  # noqa: E402
+
+WINDOWS = (7, 30, 90, 365)
+
+
+def direct_window_sums(values, window):
+    return np.array([values[max(i - window + 1, 0):i + 1].sum() for i in range(len(values))])
+
+
+def direct_ewma(values, span):
+    alpha = 2 / (span + 1)
+    out, level = [], 0.0
+    for value in values.tolist():
+        level = (1 - alpha) * level + alpha * value
+        out.append(level)
+    return np.array(out)
+
+
+def main():
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    rng = np.random.default_rng(0)
+    values = np.round(rng.uniform(0, 11, 365 * years) * (rng.random(365 * years) < 0.8), 1)
+    prefix = prefix_sums(values)
+    for window in WINDOWS:
+        assert np.allclose(window_sums(prefix, window), direct_window_sums(values, window), rtol=0, atol=1e-8), window
+    for span in (1, 10, 30, 250):
+        assert np.allclose(ewma(values, span), direct_ewma(values, span), rtol=0, atol=1e-9), span
+    print(f'parity: windows {WINDOWS} and EWMAs match over {len(values)} days')
+
+    number = 20
+    for window in WINDOWS:
+        direct = min(timeit.repeat(lambda: np.convolve(values, np.ones(window))[:len(values)],
+                                   number=number, repeat=3)) / number
+        prefix_time = min(timeit.repeat(lambda: window_sums(prefix_sums(values), window),
+                                        number=number, repeat=3)) / number
+        print(f'  {window:3d}-day window   convolve {direct * 1e3:6.3f} ms   prefix sums {prefix_time * 1e3:6.3f} ms')
+    loop = min(timeit.repeat(lambda: direct_ewma(values, 30), number=number, repeat=3)) / number
+    blocked = min(timeit.repeat(lambda: ewma(values, 30), number=number, repeat=3)) / number
+    print(f'  EWMA span 30     loop     {loop * 1e3:6.3f} ms   blocked     {blocked * 1e3:6.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
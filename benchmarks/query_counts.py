@@ -0,0 +1,79 @@
+"""Count the SQL statements behind the dashboard's hot JSON endpoints.
+
+Logs in a synthetic user, warms the plan cache with one request, then counts
+every statement the engine executes for each endpoint, in both login identity
+modes. Exits non-zero when a session-mode count exceeds its budget.
+
+    python benchmarks/query_counts.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import User  # noqa: E402
+from synthetic import PASSWORD, populate  # noqa: E402
+
+# Statements per warm request in session identity mode: the data version
+# behind the ETag, then the resource's own reads
+BUDGETS = {
+    '/planner/api/dashboard': 3,
+    '/api/v1/summary': 2,
+    '/api/v1/recent': 2,
+    '/planner/api/cache_stats': 0,  # No data reads: loading current_user is all that is left
+}
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.statements = []
+        event.listen(engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+def count(client, counter, url):
+    client.get(url)  # Warm the plan cache
+    counter.statements.clear()
+    response = client.get(url)
+    assert response.status_code == 200, (url, response.status_code)
+    return list(counter.statements)
+
+
+def main():
+    os.environ.setdefault('DATABASE_URL', 'sqlite://')
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['FIRM_ADMINS'] = []
+    with app.app_context():
+        db.create_all()
+        populate(users=1, years=1)
+        email = db.session.query(User.email).scalar()
+        app.config['FIRM_ADMINS'] = [email]  # cache_stats is admin-only
+        db.session.commit()
+        counter = StatementCounter(db.engine)
+    # Requests run outside that context, so each one loads current_user afresh as in production
+    failures = 0
+    for mode in ('database', 'session'):
+        app.config['LOGIN_IDENTITY'] = mode
+        client = app.test_client()
+        client.post('/auth/login', data={'email': email, 'password': PASSWORD})
+        for url, budget in BUDGETS.items():
+            statements = count(client, counter, url)
+            over = mode == 'session' and len(statements) > budget
+            failures += over
+            print(f"[{'FAIL' if over else 'ok'}] {mode:8} {url}: {len(statements)} statements"
+                  + (f' (budget {budget})' if mode == 'session' else ''))
+            if over or '-v' in sys.argv:
+                for statement in statements:
+                    print('    ' + ' '.join(statement.split())[:160])
+    if failures:
+        sys.exit(f'{failures} endpoint(s) over their statement budget')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Check that the dashboard's per-user queries use the (user_id, date) indexes.
+
+Runs EXPLAIN QUERY PLAN against an in-memory SQLite database, checks that
+each query searches the index it was given, and prints the same statements
+compiled for PostgreSQL. When DATABASE_URL points at a PostgreSQL server,
+EXPLAIN (FORMAT JSON) must show an Index Scan or Index Only Scan on that
+index instead.
+
+    python benchmarks/query_plans.py
+"""
+import datetime
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import UniqueConstraint, func, text  # noqa: E402
+from sqlalchemy.dialects import postgresql  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import DailyLog, Holiday, MonthlyRollup, VacationDay  # noqa: E402
+
+
+def dashboard_queries():
+    # label: (query, the index it must use); SQLite names the index of a unique constraint sqlite_autoindex_<table>_N
+    start, end = datetime.date(2026, 1, 1), datetime.date(2026, 12, 31)
+    return {
+        'daily_log range': (db.session.query(DailyLog.date, DailyLog.hours).filter(
+            DailyLog.user_id == 1, DailyLog.date >= start, DailyLog.date <= end), 'uq_daily_log_user_date'),
+        'daily_log upsert lookup': (DailyLog.query.filter_by(user_id=1, date=start), 'uq_daily_log_user_date'),
+        'holiday by user': (Holiday.query.filter_by(user_id=1), 'ix_holiday_user_date'),
+        'vacation_day by user': (VacationDay.query.filter_by(user_id=1), 'ix_vacation_day_user_date'),
+        'firm month totals': (db.session.query(DailyLog.user_id, func.sum(DailyLog.hours))
+                              .filter(DailyLog.date >= start, DailyLog.date <= datetime.date(2026, 1, 31))
+                              .group_by(DailyLog.user_id), 'ix_daily_log_date_user_hours'),
+        'monthly_rollup by user and year': (MonthlyRollup.query.filter_by(user_id=1, year=2026),
+                                            'uq_monthly_rollup_user_year_month'),
+    }
+
+
+def sqlite_index_names(name):
+    # The names SQLite may report for the index or unique constraint `name`: a unique
+    # constraint's index is an unnamed sqlite_autoindex_<table>_N over the same columns
+    for table in db.metadata.tables.values():
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name == name:
+                columns = [c.name for c in constraint.columns]
+                for row in db.session.execute(text(f"PRAGMA index_list('{table.name}')")):
+                    if [r[2] for r in db.session.execute(text(f"PRAGMA index_info('{row[1]}')"))] == columns:
+                        return {name, row[1]}
+    return {name}
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from _plan_nodes(child)
+
+
+def explain(query, dialect_name):
+    """(plan as one line, names of the indexes it scans)."""
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    if dialect_name == 'sqlite':
+        details = [row[-1] for row in db.session.execute(text('EXPLAIN QUERY PLAN ' + sql))]
+        indexes = {m.group(1) for d in details for m in [re.search(r'USING (?:COVERING )?INDEX (\S+)', d)] if m}
+        return ' / '.join(details), indexes
+    # Tiny tables would otherwise always be scanned sequentially, or through a bitmap
+    db.session.execute(text('SET enable_seqscan = off'))
+    db.session.execute(text('SET enable_bitmapscan = off'))
+    plan = db.session.execute(text('EXPLAIN (FORMAT JSON) ' + sql)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = list(_plan_nodes(plan[0]['Plan']))
+    indexes = {n['Index Name'] for n in nodes if n['Node Type'] in ('Index Scan', 'Index Only Scan')}
+    summary = ' / '.join(n['Node Type'] + (f" using {n['Index Name']}" if 'Index Name' in n else '') for n in nodes)
+    return summary, indexes
+
+
+def main():
+    os.environ.setdefault('DATABASE_URL', 'sqlite://')
+    app = create_app()
+    failures = 0
+    with app.app_context():
+        db.create_all()
+        dialect_name = db.engine.dialect.name
+        for label, (query, index) in dashboard_queries().items():
+            plan, indexes = explain(query, dialect_name)
+            expected = sqlite_index_names(index) if dialect_name == 'sqlite' else {index}
+            uses_index = bool(indexes & expected)
+            failures += not uses_index
+            print(f"[{'ok' if uses_index else 'FAIL'}] {dialect_name} {label}: {plan}")
+            if not uses_index:
+                print(f'       expected a scan of {index}')
+            if dialect_name != 'postgresql':
+                pg_sql = query.statement.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True})
+                print(f'       postgresql: EXPLAIN {" ".join(str(pg_sql).split())}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
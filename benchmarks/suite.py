@@ -0,0 +1,297 @@
+"""Benchmark suite: the plan engine, dashboard view, JSON API and catch-up endpoint.
+
+Builds a deterministic synthetic firm (see synthetic.py) in a fresh SQLite
+database, logs in as one of its users and times each case. Results are
+written as JSON; given a baseline file from an earlier run at the same
+scale, any case whose best time grew by more than --threshold is reported
+and the run exits non-zero, so CI can keep the baseline from the main
+branch and compare every change against it.
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --baseline results.json --threshold 0.25
+    python benchmarks/suite.py --users 500 --years 5 --only api.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import sqlalchemy  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import BillableHourGoal, Holiday, User, VacationDay  # noqa: E402
+from app.planner.calendars import user_holiday_mask  # noqa: E402
+from app.planner.cache import plan_cache  # noqa: E402
+from app.planner.catchup import suggest_catchup_plans  # noqa: E402
+from app.planner.engine import compute_year_plan  # noqa: E402
+from app.planner.plans import load_plan  # noqa: E402
+from app.planner.reporting import build_firm_report  # noqa: E402
+from app.planner.snapshots import snapshots  # noqa: E402
+from app.planner.versions import data_version  # noqa: E402
+from synthetic import PASSWORD, populate  # noqa: E402
+
+FORMAT = 1
+# Cases faster than this are compared on absolute time too, so timer noise on
+# a few microseconds does not read as a regression
+NOISE_FLOOR_MS = 0.05
+
+
+class Case:
+    """A named timing: call() is timed `number` times per sample; reset() runs untimed before each call."""
+
+    def __init__(self, name, call, reset=None, number=20):
+        self.name = name
+        self.call = call
+        self.reset = reset
+        self.number = number
+
+    def run(self, repeat):
+        self.call()  # Warm up
+        samples = []
+        for _ in range(repeat):
+            elapsed = 0.0
+            for _ in range(self.number):
+                if self.reset:
+                    self.reset()
+                started = time.perf_counter()
+                self.call()
+                elapsed += time.perf_counter() - started
+            samples.append(elapsed / self.number * 1e3)
+        return {
+            'min_ms': round(min(samples), 4),
+            'median_ms': round(statistics.median(samples), 4),
+            'number': self.number,
+            'repeat': repeat,
+        }
+
+
+def get(client, url, status=200):
+    def call():
+        response = client.get(url)
+        assert response.status_code == status, (url, response.status_code)
+    return call
+
+
+def post_json(client, url, payload):
+    def call():
+        response = client.post(url, json=payload)
+        assert response.status_code == 200, (url, response.status_code)
+    return call
+
+
+def log_batch(client, year, month, count=10):
+    # Rewrites the first `count` days of the month, sending back the versions the last save returned
+    versions = {d['date']: d['version'] for d in client.get(f'/api/v1/calendar/{year}/{month}').get_json()['days'][:count]}
+
+    def call():
+        entries = [{'date': d, 'hours': 7.5, 'version': v} for d, v in versions.items()]
+        response = client.post('/api/v1/logs', json={'entries': entries})
+        assert response.status_code == 200, ('/api/v1/logs', response.status_code)
+        versions.update((d['date'], d['version']) for d in response.get_json()['days'])
+    return call
+
+
+def setup_form(user_id, year):
+    # The setup wizard's form as its page would post it back unchanged
+    goal = BillableHourGoal.query.filter_by(user_id=user_id, year=year).one()
+    holidays = Holiday.query.filter_by(user_id=user_id, observed=True).order_by(Holiday.date).all()
+    worked = Holiday.query.filter_by(user_id=user_id, observed=False).all()
+    vacations = VacationDay.query.filter_by(user_id=user_id).all()
+    return {
+        'annual_goal': str(goal.annual_goal),
+        **{f'workload_{m}': str(w) for m, w in goal.workload_weights.items()},
+        **{f'work_{h.date.isoformat()}': 'on' for h in worked},
+        'holiday_dates': [h.date.isoformat() for h in holidays],
+        'holiday_names': [h.name for h in holidays],
+        'vacation_dates': [v.date.isoformat() for v in vacations],
+    }
+
+
+def setup_save(client, form, day):
+    # Saves the wizard, adding the vacation day `day` on one call and dropping it again on the next
+    state = {'add': True}
+
+    def call():
+        data = {**form, 'new_vacation_date': day.isoformat()} if state['add'] else form
+        state['add'] = not state['add']
+        response = client.post('/planner/setup', data=data)
+        assert response.status_code == 302, ('/planner/setup', response.status_code)
+    return call
+
+
+def post_form(client, url, data, status=302):
+    def call():
+        response = client.post(url, data=data)
+        assert response.status_code == status, (url, response.status_code)
+    return call
+
+
+def in_context(app, fn):
+    def call():
+        with app.app_context():
+            fn()
+    return call
+
+
+def build_cases(app, client, user_id, today):
+    year = today.year
+    with app.app_context():
+        goal = BillableHourGoal.query.filter_by(user_id=user_id, year=year).one()
+        annual_goal, weights = goal.annual_goal, goal.workload_weights
+        vacations = VacationDay.query.filter_by(user_id=user_id).all()
+        holiday_mask = user_holiday_mask(user_id, year)
+        form = setup_form(user_id, year)
+        taken = {v.date for v in vacations}
+        spare_day = next(d for d in (datetime.date(year, 12, 31) - datetime.timedelta(days=n) for n in range(366))
+                         if d not in taken)
+
+    def invalidate():
+        with app.app_context():
+            plan_cache.backend.delete(plan_cache.key(user_id, year, data_version(user_id)))
+
+    def invalidate_dashboard():
+        invalidate()
+        snapshots.backend.delete(snapshots.key(user_id, year, today.month))
+
+    catchup_payload = {'hours_needed': 120, 'max_workday_hours': 9,
+                       'weekend_policy': {'allow': True, 'max_hours': 3}}
+    three_years = f'start={year - 2}-01-01&end={year}-12-31'
+    return [
+        # Plan engine, without the database
+        Case('engine.compute_year_plan',
+             lambda: compute_year_plan(year, annual_goal, weights, (), vacations, holiday_mask), number=200),
+        Case('engine.catchup', lambda: suggest_catchup_plans(
+            120, 9, {'allow': True, 'max_hours': 3}, today, datetime.date(year, 12, 31)), number=50),
+        # Plans through the cache
+        Case('plan.load_warm', in_context(app, lambda: load_plan(user_id, year)), number=200),
+        Case('plan.load_cold', in_context(app, lambda: load_plan(user_id, year)), reset=invalidate, number=50),
+        # Views and endpoints, through the test client with a logged-in session
+        Case('view.dashboard', get(client, '/planner/')),
+        Case('view.dashboard_cold', get(client, '/planner/'), reset=invalidate_dashboard),
+        Case('view.dashboard_compare', get(client, f'/planner/?compare_start={year - 1}-01-01&compare_end={year - 1}-03-31')),
+        Case('view.dashboard_range', get(client, f'/planner/?start_date={year - 1}-01-01&end_date={year}-12-31')),
+        Case('api.dashboard', get(client, '/planner/api/dashboard')),
+        Case('api.summary', get(client, '/api/v1/summary')),
+        Case('api.calendar', get(client, f'/api/v1/calendar/{year}/{today.month}')),
+        Case('api.series', get(client, f'/api/v1/series/{year}')),
+        Case('api.recent', get(client, '/api/v1/recent')),
+        Case('api.range', get(client, f'/api/v1/range?{three_years}&group=quarter')),
+        Case('api.range_daily', get(client, f'/api/v1/range?{three_years}&group=week&series=1')),
+        Case('api.compare', get(client, f'/api/v1/compare?period=custom,{year - 2}-01-01,{year - 2}-12-31&series=1')),
+        Case('api.trends', get(client, '/api/v1/trends?series=1')),
+        Case('api.forecast', get(client, '/api/v1/forecast')),
+        Case('api.catchup', post_json(client, '/planner/catchup_plans', catchup_payload)),
+        Case('api.log_batch', log_batch(client, year, today.month)),
+        Case('view.setup_noop', post_form(client, '/planner/setup', form)),
+        Case('view.setup_save', setup_save(client, form, spare_day)),
+        Case('api.firm_report', get(client, f'/planner/api/reports/firm?year={year}'), number=3),
+        Case('api.firm_forecast', get(client, f'/planner/api/reports/firm?year={year}&forecast=1'), number=3),
+    ]
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Lines describing each case against the baseline, and the names that regressed."""
+    lines, regressions = [], []
+    for name, result in results['cases'].items():
+        before = baseline['cases'].get(name)
+        if before is None:
+            lines.append(f'  {name:28} {result["min_ms"]:10.3f} ms   (new)')
+            continue
+        ratio = result['min_ms'] / before['min_ms'] if before['min_ms'] else float('inf')
+        regressed = ratio > 1 + threshold and result['min_ms'] - before['min_ms'] > NOISE_FLOOR_MS
+        if regressed:
+            regressions.append(name)
+        lines.append(f'  {name:28} {result["min_ms"]:10.3f} ms   {before["min_ms"]:10.3f} ms   {ratio:5.2f}x'
+                     + ('   REGRESSION' if regressed else ''))
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--holidays', type=int, default=10, help='firm holidays per year')
+    parser.add_argument('--vacations', type=int, default=15, help='vacation days per user and year')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', default='', help='run the cases whose name starts with this prefix')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='results JSON of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown, 0.25 = 25%%')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        scale = {k: baseline['scale'].get(k) for k in ('users', 'years', 'seed', 'holidays', 'vacations')}
+        if scale != {k: getattr(args, k) for k in scale}:
+            sys.exit(f'baseline was recorded at another scale: {scale}')
+
+    # Always a fresh database: the generator must never write into a real one
+    workdir = tempfile.mkdtemp(prefix='bht-bench-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.sqlite3")}'
+    app = create_app()
+    app.config['TESTING'] = True
+    today = datetime.date.today()
+    started = time.perf_counter()
+    with app.app_context():
+        db.create_all()
+        user_ids = populate(users=args.users, years=args.years, end=today, seed=args.seed,
+                            holidays_per_year=args.holidays, vacations_per_year=args.vacations)
+        email = db.session.get(User, user_ids[0]).email
+    print(f'populated {args.users} users x {args.years} years in {time.perf_counter() - started:.1f} s')
+    app.config['FIRM_ADMINS'] = [email]
+    client = app.test_client()
+    client.post('/auth/login', data={'email': email, 'password': PASSWORD})
+
+    results = {
+        'format': FORMAT,
+        'recorded_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'scale': {k: getattr(args, k) for k in ('users', 'years', 'seed', 'holidays', 'vacations')},
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'sqlalchemy': sqlalchemy.__version__,
+            'machine': platform.machine(),
+        },
+        'cases': {},
+    }
+    for case in build_cases(app, client, user_ids[0], today):
+        if case.name.startswith(args.only):
+            result = results['cases'][case.name] = case.run(args.repeat)
+            print(f'  {case.name:28} {result["min_ms"]:10.3f} ms  (median {result["median_ms"]:.3f})')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f'wrote {args.output}')
+    if baseline:
+        print(f'against {args.baseline} (revision {baseline.get("revision")}, threshold {args.threshold:.0%}):')
+        lines, regressions = compare(results, baseline, args.threshold)
+        print('\n'.join(lines))
+        if regressions:
+            sys.exit(f'{len(regressions)} case(s) regressed: {", ".join(regressions)}')
+
+
+if __name__ == '__main__':
+    main()
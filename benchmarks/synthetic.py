@@ -0,0 +1,90 @@
+"""Deterministic synthetic firm data for benchmarks.
+
+populate() fills the database of the current app context with users, goals,
+a shared holiday calendar with personal overrides, vacations and years of
+daily logs using executemany inserts, so firm-sized datasets build in
+seconds, then builds the logs' rollups. The same seed always produces the
+same rows.
+"""
+import datetime
+import random
+
+from sqlalchemy import update
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import BillableHourGoal, DailyLog, Holiday, HolidayCalendar, User, VacationDay
+from app.planner.engine import MONTHS
+from app.planner.rollups import rebuild
+
+BATCH = 50_000
+PASSWORD = 'benchmark'
+
+
+def _insert(table, rows):
+    for i in range(0, len(rows), BATCH):
+        db.session.execute(table.insert(), rows[i:i + BATCH])
+
+
+def populate(users=100, years=3, end=None, seed=0, holidays_per_year=10, vacations_per_year=15):
+    """Create `users` users with goals and logs for the `years` years ending at `end`.
+
+    Returns the list of created user ids.
+    """
+    rng = random.Random(seed)
+    end = end or datetime.date.today()
+    first_year = end.year - years + 1
+    # All benchmark users share one password hash; hashing per user would dominate setup time
+    password_hash = generate_password_hash(PASSWORD)
+    _insert(User.__table__, [
+        {'email': f'user{i:05d}@bench.example', 'password_hash': password_hash} for i in range(users)
+    ])
+    db.session.flush()
+    user_ids = [uid for (uid,) in db.session.query(User.id).filter(User.email.like('%@bench.example')).order_by(User.id)]
+
+    goals, holidays, vacations, rules = [], [], [], []
+    for year in range(first_year, end.year + 1):
+        year_start = datetime.date(year, 1, 1)
+        # Firm holidays shared by everyone in a given year, as one-off dates of a shared calendar
+        firm_days = [year_start + datetime.timedelta(days=offset)
+                     for offset in sorted(rng.sample(range(365), holidays_per_year))]
+        rules += [{'name': 'Firm holiday', 'date': day.isoformat()} for day in firm_days]
+        for uid in user_ids:
+            weights = {m: rng.choice([0.8, 1.0, 1.0, 1.2]) for m in MONTHS}
+            goals.append({'user_id': uid, 'year': year, 'annual_goal': rng.choice([1600, 1800, 1900, 2000, 2200]),
+                          'workload_weights': weights})
+            # Personal overrides: a day off of their own, and now and then a firm holiday worked
+            holidays.append({'user_id': uid, 'date': year_start + datetime.timedelta(days=rng.randrange(365)),
+                             'name': 'Personal holiday', 'is_firm': False, 'observed': True})
+            if rng.random() < 0.2:
+                holidays.append({'user_id': uid, 'date': rng.choice(firm_days), 'name': 'Firm holiday',
+                                 'is_firm': True, 'observed': False})
+            for offset in rng.sample(range(365), vacations_per_year):
+                vacations.append({'user_id': uid, 'date': year_start + datetime.timedelta(days=offset)})
+    calendar = HolidayCalendar(name=f'Benchmark firm {seed}', rules=rules)
+    db.session.add(calendar)
+    db.session.flush()
+    db.session.execute(update(User).where(User.id.in_(user_ids)).values(holiday_calendar_id=calendar.id))
+    _insert(BillableHourGoal.__table__, goals)
+    _insert(Holiday.__table__, holidays)
+    _insert(VacationDay.__table__, vacations)
+
+    logs = []
+    start = datetime.date(first_year, 1, 1)
+    span = (end - start).days + 1
+    all_days = [start + datetime.timedelta(days=n) for n in range(span)]
+    for uid in user_ids:
+        diligence = rng.uniform(0.7, 1.1)
+        for day in all_days:
+            if day.weekday() < 5:
+                if rng.random() < 0.9:
+                    logs.append({'user_id': uid, 'date': day, 'hours': round(rng.gauss(7.5 * diligence, 1.5) % 12, 1)})
+            elif rng.random() < 0.08:
+                logs.append({'user_id': uid, 'date': day, 'hours': round(rng.uniform(1, 4), 1)})
+        if len(logs) >= BATCH:
+            _insert(DailyLog.__table__, logs)
+            logs = []
+    _insert(DailyLog.__table__, logs)
+    db.session.commit()
+    rebuild(user_ids)
+    return user_ids
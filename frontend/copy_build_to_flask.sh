@@ -12,3 +12,6 @@ fi
 mkdir -p "$FLASK_STATIC_DIR"
 cp -r "$FRONTEND_BUILD_DIR"/* "$FLASK_STATIC_DIR"/
 echo "Copied React build to Flask static/frontend directory."
+
+# Build the .gz/.br variants served to clients that accept them
+(cd "$(dirname "$0")/.." && flask --app run.py assets precompress) || echo "Run 'flask assets precompress' to build compressed variants."
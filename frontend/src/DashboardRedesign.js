@@ -19,15 +19,16 @@ const DashboardRedesign = () => {
 
   useEffect(() => {
     setLoading(true);
-    fetch('/planner/api/dashboard', { credentials: 'include' })
-      .then(res => {
-        if (!res.ok) throw new Error('Failed to fetch dashboard data');
-        return res.json();
-      })
-      .then(data => {
+    // The browser revalidates these with If-None-Match, so unchanged data comes back as a 304
+    const getJson = url => fetch(url, { credentials: 'include' }).then(res => {
+      if (!res.ok) throw new Error('Failed to fetch dashboard data');
+      return res.json();
+    });
+    Promise.all([getJson('/api/v1/summary'), getJson('/api/v1/recent')])
+      .then(([data, recent]) => {
         setYearProgress(data.yearProgress);
         setMonthProgress(data.monthProgress);
-        setRecentDays(data.recentDays || []);
+        setRecentDays(recent.days || []);
         setAnnualGoal(data.annualGoal);
         setMonthActual(data.monthActual);
         setMonthTarget(data.monthTarget);
@@ -0,0 +1,108 @@
+"""Add monthly, weekday and activity rollups of daily_log
+
+They are filled from the existing logs here, as `flask rollups rebuild`
+would; from then on every log write keeps them current.
+
+Revision ID: 3f6a9c2d7b15
+Revises: 8d41b6a0e2f7
+Create Date: 2026-10-18 16:40:12.873301
+
+"""
+from itertools import groupby
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6a9c2d7b15'
+down_revision = '8d41b6a0e2f7'
+branch_labels = None
+depends_on = None
+
+YEAR_BITS = 366
+BATCH = 1000
+
+
+def _backfill_totals(conn, log):
+    # Hours and logged days per (user, year, month) and (user, year, weekday), one INSERT ... SELECT each
+    year = sa.cast(sa.extract('year', log.c.date), sa.Integer)
+    month = sa.cast(sa.extract('month', log.c.date), sa.Integer)
+    weekday = sa.cast((sa.extract('dow', log.c.date) + 6) % 7, sa.Integer)  # dow counts from Sunday; 0 = Monday here
+    for name, column, key in (('monthly_rollup', 'month', month), ('weekday_rollup', 'weekday', weekday)):
+        columns = ['user_id', 'year', column, 'hours', 'days']
+        rollup = sa.table(name, *(sa.column(c) for c in columns))
+        conn.execute(rollup.insert().from_select(columns, sa.select(
+            log.c.user_id, year, key, sa.func.sum(log.c.hours), sa.func.count()
+        ).group_by(log.c.user_id, year, key)))
+
+
+def _backfill_bitmaps(conn, log):
+    # Day-of-year bitmaps of logged and non-zero days, one row per (user, year), from the logs in order
+    activity = sa.table('activity_rollup', sa.column('user_id', sa.Integer), sa.column('year', sa.Integer),
+                        sa.column('logged_days', sa.LargeBinary), sa.column('active_days', sa.LargeBinary))
+    logs = conn.execution_options(stream_results=True).execute(
+        sa.select(log.c.user_id, log.c.date, log.c.hours).order_by(log.c.user_id, log.c.date))
+    rows = []
+    for (uid, year), group in groupby(logs, key=lambda r: (r[0], r[1].year)):
+        logged = np.zeros(YEAR_BITS, dtype=bool)
+        active = np.zeros(YEAR_BITS, dtype=bool)
+        for _, date, hours in group:
+            day = date.timetuple().tm_yday - 1
+            logged[day] = True
+            active[day] = hours > 0
+        rows.append({'user_id': uid, 'year': year,
+                     'logged_days': np.packbits(logged, bitorder='little').tobytes(),
+                     'active_days': np.packbits(active, bitorder='little').tobytes()})
+        if len(rows) == BATCH:
+            conn.execute(activity.insert(), rows)
+            rows = []
+    if rows:
+        conn.execute(activity.insert(), rows)
+
+
+def upgrade():
+    op.create_table('monthly_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('hours', sa.Float(), nullable=False),
+    sa.Column('days', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'year', 'month', name='uq_monthly_rollup_user_year_month')
+    )
+    op.create_table('weekday_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('weekday', sa.Integer(), nullable=False),
+    sa.Column('hours', sa.Float(), nullable=False),
+    sa.Column('days', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'year', 'weekday', name='uq_weekday_rollup_user_year_weekday')
+    )
+    op.create_table('activity_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('logged_days', sa.LargeBinary(), nullable=False),
+    sa.Column('active_days', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'year', name='uq_activity_rollup_user_year')
+    )
+
+    conn = op.get_bind()
+    log = sa.table('daily_log', sa.column('user_id', sa.Integer), sa.column('date', sa.Date),
+                   sa.column('hours', sa.Float))
+    _backfill_totals(conn, log)
+    _backfill_bitmaps(conn, log)
+
+
+def downgrade():
+    op.drop_table('activity_rollup')
+    op.drop_table('weekday_rollup')
+    op.drop_table('monthly_rollup')
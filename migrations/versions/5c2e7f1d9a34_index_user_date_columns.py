@@ -0,0 +1,38 @@
+"""Index (user_id, date) columns and make daily_log unique per user and day
+
+Revision ID: 5c2e7f1d9a34
+Revises: a9961e10fbb8
+Create Date: 2026-10-18 09:12:31.504117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2e7f1d9a34'
+down_revision = 'a9961e10fbb8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Collapse duplicate (user_id, date) logs before adding the constraint.
+    # The dashboard showed the most recently inserted row for a day, so keep that one.
+    op.execute(
+        'DELETE FROM daily_log WHERE id NOT IN ('
+        'SELECT keep_id FROM (SELECT MAX(id) AS keep_id FROM daily_log GROUP BY user_id, date) AS keep)'
+    )
+    # batch mode so SQLite can add the constraint by recreating the table
+    with op.batch_alter_table('daily_log', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_daily_log_user_date', ['user_id', 'date'])
+
+    op.create_index('ix_holiday_user_date', 'holiday', ['user_id', 'date'], unique=False)
+    op.create_index('ix_vacation_day_user_date', 'vacation_day', ['user_id', 'date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_vacation_day_user_date', table_name='vacation_day')
+    op.drop_index('ix_holiday_user_date', table_name='holiday')
+    with op.batch_alter_table('daily_log', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_daily_log_user_date', type_='unique')
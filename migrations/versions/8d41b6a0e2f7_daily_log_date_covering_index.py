@@ -0,0 +1,24 @@
+"""Covering (date, user_id, hours) index on daily_log for firm-wide reports
+
+Revision ID: 8d41b6a0e2f7
+Revises: 5c2e7f1d9a34
+Create Date: 2026-10-18 14:02:47.218690
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41b6a0e2f7'
+down_revision = '5c2e7f1d9a34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_daily_log_date_user_hours', 'daily_log', ['date', 'user_id', 'hours'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_daily_log_date_user_hours', table_name='daily_log')
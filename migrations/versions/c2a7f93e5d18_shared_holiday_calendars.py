@@ -0,0 +1,116 @@
+"""Shared holiday calendars; holiday rows become per-user overrides
+
+Creates the US Federal calendar and subscribes every user that has firm
+holiday rows to it. The per-user copies of the 2025 federal holidays the
+setup wizard used to insert are deleted; a federal holiday missing from a
+user's copies is kept as an override the user works (observed = false).
+Firm rows on other dates stay as personal holidays.
+
+Revision ID: c2a7f93e5d18
+Revises: e4c18a7f2b93
+Create Date: 2026-10-18 20:31:07.264519
+
+"""
+import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2a7f93e5d18'
+down_revision = 'e4c18a7f2b93'
+branch_labels = None
+depends_on = None
+
+CALENDAR = 'US Federal'
+RULES = [
+    {'name': "New Year's Day", 'month': 1, 'day': 1, 'observed': True},
+    {'name': 'Martin Luther King Jr. Day', 'month': 1, 'weekday': 0, 'nth': 3},
+    {'name': "Presidents' Day", 'month': 2, 'weekday': 0, 'nth': 3},
+    {'name': 'Memorial Day', 'month': 5, 'weekday': 0, 'nth': -1},
+    {'name': 'Independence Day', 'month': 7, 'day': 4, 'observed': True},
+    {'name': 'Labor Day', 'month': 9, 'weekday': 0, 'nth': 1},
+    {'name': 'Columbus Day', 'month': 10, 'weekday': 0, 'nth': 2},
+    {'name': 'Veterans Day', 'month': 11, 'day': 11, 'observed': True},
+    {'name': 'Thanksgiving Day', 'month': 11, 'weekday': 3, 'nth': 4},
+    {'name': 'Christmas Day', 'month': 12, 'day': 25, 'observed': True},
+]
+# The list the setup wizard copied for every user; the rules above give exactly these dates in 2025
+LEGACY_HOLIDAYS = {
+    datetime.date(2025, 1, 1): "New Year's Day",
+    datetime.date(2025, 1, 20): 'Martin Luther King Jr. Day',
+    datetime.date(2025, 2, 17): "Presidents' Day",
+    datetime.date(2025, 5, 26): 'Memorial Day',
+    datetime.date(2025, 7, 4): 'Independence Day',
+    datetime.date(2025, 9, 1): 'Labor Day',
+    datetime.date(2025, 10, 13): 'Columbus Day',
+    datetime.date(2025, 11, 11): 'Veterans Day',
+    datetime.date(2025, 11, 27): 'Thanksgiving Day',
+    datetime.date(2025, 12, 25): 'Christmas Day',
+}
+
+calendar_table = sa.table('holiday_calendar', sa.column('id', sa.Integer), sa.column('name', sa.String),
+                          sa.column('rules', sa.JSON), sa.column('version', sa.Integer))
+user_table = sa.table('user', sa.column('id', sa.Integer), sa.column('holiday_calendar_id', sa.Integer))
+holiday_table = sa.table('holiday', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                         sa.column('date', sa.Date), sa.column('name', sa.String),
+                         sa.column('is_firm', sa.Boolean), sa.column('observed', sa.Boolean))
+
+
+def upgrade():
+    op.create_table('holiday_calendar',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.Column('rules', sa.JSON(), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('holiday_calendar_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_user_holiday_calendar_id', 'holiday_calendar', ['holiday_calendar_id'], ['id'])
+    with op.batch_alter_table('holiday', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('observed', sa.Boolean(), server_default=sa.true(), nullable=False))
+
+    conn = op.get_bind()
+    calendar_id = conn.execute(
+        calendar_table.insert().values(name=CALENDAR, rules=RULES, version=0).returning(calendar_table.c.id)
+    ).scalar()
+    copied = {}  # user_id -> legacy dates present
+    legacy_ids = []
+    for holiday_id, user_id, date in conn.execute(
+            sa.select(holiday_table.c.id, holiday_table.c.user_id, holiday_table.c.date)
+            .where(holiday_table.c.is_firm.is_(True))):
+        present = copied.setdefault(user_id, set())
+        if date in LEGACY_HOLIDAYS:
+            present.add(date)
+            legacy_ids.append(holiday_id)
+    if not copied:
+        return
+    conn.execute(holiday_table.delete().where(holiday_table.c.id.in_(legacy_ids)))
+    conn.execute(user_table.update().where(user_table.c.id.in_(list(copied))).values(holiday_calendar_id=calendar_id))
+    worked = [{'user_id': user_id, 'date': date, 'name': name, 'is_firm': True, 'observed': False}
+              for user_id, present in copied.items()
+              for date, name in LEGACY_HOLIDAYS.items() if date not in present]
+    if worked:
+        conn.execute(holiday_table.insert(), worked)
+
+
+def downgrade():
+    conn = op.get_bind()
+    subscribed = [uid for (uid,) in conn.execute(
+        sa.select(user_table.c.id).where(user_table.c.holiday_calendar_id.isnot(None)))]
+    worked = {(uid, date) for uid, date in conn.execute(
+        sa.select(holiday_table.c.user_id, holiday_table.c.date).where(holiday_table.c.observed.is_(False)))}
+    conn.execute(holiday_table.delete().where(holiday_table.c.observed.is_(False)))
+    copies = [{'user_id': uid, 'date': date, 'name': name, 'is_firm': True, 'observed': True}
+              for uid in subscribed for date, name in LEGACY_HOLIDAYS.items() if (uid, date) not in worked]
+    if copies:
+        conn.execute(holiday_table.insert(), copies)
+
+    with op.batch_alter_table('holiday', schema=None) as batch_op:
+        batch_op.drop_column('observed')
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_user_holiday_calendar_id', type_='foreignkey')
+        batch_op.drop_column('holiday_calendar_id')
+    op.drop_table('holiday_calendar')
@@ -0,0 +1,28 @@
+"""Add a row version to daily_log
+
+Existing logs start at version 1.
+
+Revision ID: d81b4e6c3fa2
+Revises: c2a7f93e5d18
+Create Date: 2026-10-18 21:40:12.604318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81b4e6c3fa2'
+down_revision = 'c2a7f93e5d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('daily_log', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('daily_log', schema=None) as batch_op:
+        batch_op.drop_column('version')
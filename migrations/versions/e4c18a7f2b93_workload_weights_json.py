@@ -0,0 +1,69 @@
+"""Store billable_hour_goal.workload_weights as JSON instead of a pickle
+
+Existing pickled {month: weight} dicts are converted in place.
+
+Revision ID: e4c18a7f2b93
+Revises: b7e3d52a8c61
+Create Date: 2026-10-18 19:12:40.518227
+
+"""
+import pickle
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4c18a7f2b93'
+down_revision = 'b7e3d52a8c61'
+branch_labels = None
+depends_on = None
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June',
+          'July', 'August', 'September', 'October', 'November', 'December']
+
+
+def _normalize(weights):
+    # {month: float} for all twelve months; unreadable or missing values become the default 1.0
+    weights = weights if isinstance(weights, dict) else {}
+    return {m: float(weights.get(m, 1.0)) for m in MONTHS}
+
+
+def upgrade():
+    with op.batch_alter_table('billable_hour_goal', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('workload_weights_json', sa.JSON(), nullable=True))
+
+    conn = op.get_bind()
+    goal = sa.table('billable_hour_goal', sa.column('id', sa.Integer),
+                    sa.column('workload_weights', sa.LargeBinary), sa.column('workload_weights_json', sa.JSON))
+    rows = []
+    for goal_id, raw in conn.execute(sa.select(goal.c.id, goal.c.workload_weights)):
+        try:
+            weights = pickle.loads(raw) if raw is not None else None
+        except Exception:
+            weights = None
+        rows.append({'b_id': goal_id, 'workload_weights_json': _normalize(weights)})
+    if rows:
+        conn.execute(goal.update().where(goal.c.id == sa.bindparam('b_id')), rows)
+
+    with op.batch_alter_table('billable_hour_goal', schema=None) as batch_op:
+        batch_op.drop_column('workload_weights')
+        batch_op.alter_column('workload_weights_json', new_column_name='workload_weights',
+                              existing_type=sa.JSON(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('billable_hour_goal', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('workload_weights_pickle', sa.LargeBinary(), nullable=True))
+
+    conn = op.get_bind()
+    goal = sa.table('billable_hour_goal', sa.column('id', sa.Integer),
+                    sa.column('workload_weights', sa.JSON), sa.column('workload_weights_pickle', sa.LargeBinary))
+    rows = [{'b_id': goal_id, 'workload_weights_pickle': pickle.dumps(_normalize(weights))}
+            for goal_id, weights in conn.execute(sa.select(goal.c.id, goal.c.workload_weights))]
+    if rows:
+        conn.execute(goal.update().where(goal.c.id == sa.bindparam('b_id')), rows)
+
+    with op.batch_alter_table('billable_hour_goal', schema=None) as batch_op:
+        batch_op.drop_column('workload_weights')
+        batch_op.alter_column('workload_weights_pickle', new_column_name='workload_weights',
+                              existing_type=sa.LargeBinary(), nullable=False)